@@ -30,6 +30,7 @@
 __author__ = u'Utumno'
 
 import errno
+import math
 import re
 import time
 from collections import defaultdict, OrderedDict
@@ -477,16 +478,19 @@ def _fix_load_order(self, lord, fix_lo):
         if fix_lo.lo_added:
             # Append new plugins to load order
             index_first_esp = self._index_of_first_esp(lord)
+            added_masters = []
             for mod in fix_lo.lo_added:
                 if in_mblock(cached_minfs[mod]):
                     if not mod == master_name:
-                        lord.insert(index_first_esp, mod)
+                        added_masters.append(mod)
                     else:
                         lord.insert(0, master_name)
                         bolt.deprint(u'%s inserted to Load order' %
                                      master_name)
-                    index_first_esp += 1
+                        index_first_esp += 1
                 else: lord.append(mod)
+            # insert them at once at the end of the masters block
+            lord[index_first_esp:index_first_esp] = added_masters
         # end textfile get
         fix_lo.lo_duplicates = self._check_for_duplicates(lord)
         lo_order_changed |= self._order_fixed(lord)
@@ -571,16 +575,17 @@ def _index_of_first_esp(self, lord):
     @staticmethod
     def _check_for_duplicates(plugins_list):
         """:type plugins_list: list[bolt.Path]"""
-        mods, duplicates, j = set(), set(), 0
+        mods, duplicates, unique = set(), set(), []
         mods_add = mods.add
         duplicates_add = duplicates.add
-        for i, mod in enumerate(plugins_list[:]):
+        unique_append = unique.append
+        for mod in plugins_list:
             if mod in mods:
-                del plugins_list[i - j]
-                j += 1
                 duplicates_add(mod)
             else:
                 mods_add(mod)
+                unique_append(mod)
+        if duplicates: plugins_list[:] = unique
         return duplicates
 
     # INITIALIZATION ----------------------------------------------------------
@@ -809,8 +814,11 @@ def get_free_time(self, start_time, end_time=None):
     def __calculate_mtime_order(self, mods=None): # excludes corrupt mods
         # sort case insensitive (for time conflicts)
         mods = sorted(self.mod_infos if mods is None else mods)
-        mods.sort(key=lambda x: self.mod_infos[x].mtime)
-        mods.sort(key=lambda x: not self.in_master_block(self.mod_infos[x]))
+        cached_minfs, in_mblock = self.mod_infos, self.in_master_block
+        def _mblock_mtime(x):
+            minf = cached_minfs[x]
+            return not in_mblock(minf), minf.mtime
+        mods.sort(key=_mblock_mtime)
         return mods
 
     def _backup_active_plugins(self):
@@ -830,32 +838,55 @@ def _fetch_active_plugins(self):
     def _persist_load_order(self, lord, active):
         assert set(self.mod_infos) == set(lord) # (lord must be valid)
         if len(lord) == 0: return
-        current = self.__calculate_mtime_order()
-        # break conflicts
-        older = self.mod_infos[current[0]].mtime # initialize to game master
-        for i, mod in enumerate(current[1:]):
-            info = self.mod_infos[mod]
-            if info.mtime == older: break
-            older = info.mtime
-        else: mod = i = None # define i to avoid warning below
-        if mod is not None: # respace this and next mods in 60 sec intervals
-            for mod in current[i + 1:]:
-                info = self.mod_infos[mod]
-                older += 60.0
-                info.setmtime(older)
-        restamp = []
-        for ordered, mod in izip(lord, current):
-            if ordered == mod: continue
-            restamp.append((ordered, self.mod_infos[mod].mtime))
-        for ordered, mtime in restamp:
-            self.mod_infos[ordered].setmtime(mtime)
+        for mod, mtime in self._get_restamps(lord):
+            self.mod_infos[mod].setmtime(mtime)
         # rebuild our cache
         self._rebuild_mtimes_cache()
 
+    def _get_restamps(self, lord):
+        """Return the (mod, mtime) pairs of the mods that must be restamped
+        so that their mtimes strictly increase in lord order - touching as
+        few files as possible. The mods whose mtimes form the longest
+        strictly increasing run in lord keep them, the rest are spread in the
+        gaps between those, at most _restamp_step seconds apart. Where a gap
+        is too narrow it is widened by restamping the mods after it too."""
+        mtimes = [self.mod_infos[mod].mtime for mod in lord]
+        kept = bolt.longest_increasing(mtimes)
+        restamps = []
+        lower = None # the mtime of the last mod kept
+        run_start = 0 # the first mod not kept after it
+        for i, mtime in enumerate(mtimes):
+            if i not in kept: continue
+            if run_start < i:
+                times = self._spread_mtimes(lower, mtime, i - run_start)
+                if times is None: # gap too narrow, restamp this one too
+                    kept.discard(i)
+                    continue
+                restamps.extend(izip(lord[run_start:i], times))
+            lower, run_start = mtime, i + 1
+        if run_start < len(lord): # after the last mod kept, always fits
+            restamps.extend(izip(lord[run_start:], self._spread_mtimes(
+                lower, None, len(lord) - run_start)))
+        return restamps
+
+    _restamp_step = 60
+    def _spread_mtimes(self, lower, upper, count):
+        """Return count whole second mtimes strictly between lower and upper
+        (None if unbounded), at most _restamp_step seconds apart, or None if
+        they don't fit."""
+        step = self._restamp_step
+        if lower is None: # before the first mod kept
+            lower = (upper or time.time()) - step * (count + 1)
+        low = int(math.floor(lower))
+        if upper is not None:
+            step = min(step, (int(math.ceil(upper)) - low) // (count + 1))
+            if step < 1: return None
+        return [float(low + step * (j + 1)) for j in xrange(count)]
+
     def _rebuild_mtimes_cache(self):
         self._mtime_mods.clear()
         for mod, info in self.mod_infos.iteritems():
-            self._mtime_mods[int(info.mtime)] |= {mod}
+            self._mtime_mods[int(info.mtime)].add(mod)
 
     def _persist_active_plugins(self, active, lord):
         self._write_plugins_txt(active, active)
@@ -954,34 +985,24 @@ def _fetch_load_order(self, cached_load_order, cached_active):
         _acti, lo = self._parse_modfile(self.loadorder_txt_path)
         # handle desync with plugins txt
         if cached_active is not None:
-            cached_active_copy = cached_active[:]
-            cached_active_set = set(cached_active)
-            active_in_lo = [x for x in lo if x in cached_active_set]
-            w = {x: i for i, x in enumerate(lo)}
-            while active_in_lo:
-                # Use list(), we may modify cached_active_copy and active_in_lo
-                for i, (ordered, current) in list(enumerate(
-                        izip(cached_active_copy, active_in_lo))):
-                    if ordered != current:
-                        if ordered not in lo:
-                            # Mod is in plugins.txt, but not in loadorder.txt;
-                            # just drop it from the copy for now, we'll check
-                            # if it's really missing in _fix_active_plugins
-                            cached_active_copy.remove(ordered)
-                            break
-                        for j, x in enumerate(active_in_lo[i:]):
-                            if x == ordered: break
-                            # x should be above ordered
-                            to = w[ordered] + 1 + j
-                            # make room
-                            w = {x: (i if i < to else i + 1) for x, i in
-                                 w.iteritems()}
-                            w[x] = to # bubble them up !
-                        active_in_lo.remove(ordered)
-                        cached_active_copy = cached_active_copy[i + 1:]
-                        active_in_lo = active_in_lo[i:]
-                        break
-                else: break
+            # Walk the active mods in plugins.txt order - a mod loading after
+            # all the ones before it stays put and anchors the ones that
+            # follow it in plugins.txt but load before it in loadorder.txt,
+            # which are moved right below it, in plugins.txt order
+            lo_index = {x: i for i, x in enumerate(lo)}
+            w = {x: (i, 0) for x, i in lo_index.iteritems()}
+            anchor = below = -1
+            for ordered in cached_active:
+                dex = lo_index.get(ordered)
+                # Mod is in plugins.txt, but not in loadorder.txt; just skip
+                # it for now, we'll check if it's really missing in
+                # _fix_active_plugins
+                if dex is None: continue
+                if dex > anchor:
+                    anchor, below = dex, 0
+                else: # move it below the anchor and the ones moved so far
+                    below += 1
+                    w[ordered] = (anchor, below)
             fetched_lo = lo[:]
             lo.sort(key=w.get)
             if lo != fetched_lo:
@@ -2160,12 +2160,11 @@ def SetFile(self, fileName=u'SAME'):
         self._set_player_info_label()
         self.gCoSaves.label_text = self.coSaves
         self.uilist.SetFileInfo(self.saveInfo)
-        # Picture - lazily loaded since it takes up so much memory
+        # Picture - lazily loaded since it takes up so much memory. Show the
+        # thumbnail, which is cached along with the header
         if self.saveInfo:
-            if not self.saveInfo.header.image_loaded:
-                self.saveInfo.header.read_save_header(load_image=True)
             new_save_screen = ImageWrapper.from_bitstream(
-                *self.saveInfo.header.image_parameters)
+                *self.saveInfo.header.thumbnail_parameters)
         else:
             new_save_screen = None # reset to default
         self.picture.set_bitmap(new_save_screen)
@@ -3209,6 +3208,21 @@ def _refresh_installers_if_needed(self, canCancel, fullRefresh,
         do_refresh = self.listData.refreshTracked()
         refreshui |= do_refresh and self.listData.refreshInstallersStatus()
         if refreshui: self.uiList.RefreshUI(focus_list=False)
+        if self.listData.edited_links: self._warn_edited_links()
+
+    def _warn_edited_links(self):
+        edited_links = self.listData.edited_links
+        m = [_(u'Edited Linked Files'),
+             _(u'The following files in the %s folder were changed while '
+               u'linked to the files of the projects that installed them, '
+               u'so the project files were changed too. The links have been '
+               u'replaced with copies: ') % bush.game.mods_dir]
+        m.extend(u'%s (%s)' % (path, u', '.join(projects))
+                 for path, projects in sorted(edited_links.iteritems()))
+        edited_links.clear()
+        ListBoxes.display_dialog(
+            self, _(u'Warnings'), _(u'The following warnings were found:'),
+            [m], liststyle=u'list', canCancel=False)
 
     def __extractOmods(self):
         with balt.Progress(_(u'Extracting OMODs...'),
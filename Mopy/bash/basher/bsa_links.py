@@ -23,11 +23,13 @@
 """Menu items for the _item_ menu of the BSAs tab - their window attribute
 points to BashFrame.bsaList singleton."""
 
-from .. import archives, bass, balt
+from .. import archives, bass, balt, bosh
 from ..balt import ItemLink, Progress
 from ..bolt import GPath, SubProgress
+from ..exception import BSAError
 
-__all__ = [u'BSA_ExtractToProject', u'BSA_ListContents']
+__all__ = [u'BSA_ExtractToProject', u'BSA_ListContents',
+           u'BSA_ListOverridden', u'BSA_TextureReport']
 
 class BSA_ExtractToProject(ItemLink):
     """Extracts one or more BSAs into projects."""
@@ -102,3 +104,55 @@ def Execute(self):
         full_text += u'\n[/spoiler]'
         balt.copyToClipboard(full_text)
         self._showLog(full_text, _(u'BSA Contents'))
+
+class BSA_ListOverridden(ItemLink):
+    """Lists the assets of one or more active BSAs that the game loads from
+    loose files or higher loading BSAs instead."""
+    _text = _(u'List Overridden Assets...')
+    _help = _(u'Lists the assets of each selected BSA that are overridden by '
+              u'loose files or other BSAs and copies it to the clipboard.')
+
+    def Execute(self):
+        # Use the Data dir files BAIN tracks if it has scanned them
+        iPanel = self.Frame.iPanel
+        loose_files = iPanel and iPanel.listData.data_sizeCrcDate or None
+        with balt.BusyCursor():
+            asset_index = bosh.bsaInfos.get_asset_index(loose_files)
+        full_text = u'=== %s:' % _(u'Overridden BSA Assets')
+        full_text += u'\n[spoiler]'
+        for bsa_inf in self.iselected_infos():
+            full_text += u'\n\n* %s:\n' % bsa_inf.abs_path.tail
+            if bsa_inf in asset_index.bsa_errors:
+                full_text += _(u'Could not be parsed.')
+                continue
+            overridden = asset_index.overridden(bsa_inf)
+            full_text += u'\n'.join(u'%s -> %s' % (a, overridden[a]) for a
+                                    in sorted(overridden))
+        full_text += u'\n[/spoiler]'
+        balt.copyToClipboard(full_text)
+        self._showLog(full_text, _(u'Overridden BSA Assets'))
+
+class BSA_TextureReport(ItemLink):
+    """Reports the formats, dimensions and estimated VRAM use of the textures
+    in one or more BSAs."""
+    _text = _(u'Texture Report...')
+    _help = _(u'Reads the headers of the textures in each selected BSA and '
+              u'reports their formats, sizes and estimated VRAM use.')
+
+    def Execute(self):
+        dds_files = bosh.dds_files
+        report = dds_files.TextureReport()
+        selected_bsas = list(self.iselected_infos())
+        with Progress(_(u'Texture Report')) as prog:
+            prog.setFull(len(selected_bsas))
+            for i, bsa_inf in enumerate(selected_bsas):
+                prog(i, bsa_inf.abs_path.stail)
+                try:
+                    bsa_textures = dds_files.scan_bsa_textures(bsa_inf)
+                except (BSAError, EnvironmentError) as e:
+                    bsa_textures = [dds_files.DDSHeaderInfo.failed(
+                        bsa_inf.abs_path.stail, e)]
+                report.add_package(bsa_inf.abs_path.stail, bsa_textures)
+        report_txt = report.render()
+        balt.copyToClipboard(report_txt)
+        self._showLog(report_txt, _(u'Texture Report'), fixedFont=True)
@@ -300,6 +300,7 @@
     u'bash.installers.fastStart': True,
     u'bash.installers.autoRefreshBethsoft': False,
     u'bash.installers.autoRefreshProjects': True,
+    u'bash.installers.linkProjects': False,
     u'bash.installers.removeEmptyDirs': True,
     u'bash.installers.skipScreenshots': False,
     u'bash.installers.skipScriptSources': False,
@@ -44,7 +44,7 @@
     UIList_Rename, UIList_Hide
 from ..belt import InstallerWizard, generateTweakLines
 from ..bolt import GPath, SubProgress, LogFile, round_size, text_wrap
-from ..exception import CancelError, SkipError, StateError
+from ..exception import BSAError, CancelError, SkipError, StateError
 from ..gui import BusyCursor
 
 __all__ = [u'Installer_Open', u'Installer_Duplicate',
@@ -67,7 +67,8 @@
            u'Installer_Subs_ToggleSelection',
            u'Installer_Subs_ListSubPackages', u'Installer_OpenNexus',
            u'Installer_ExportAchlist', u'Installer_Espm_JumpToMod',
-           u'Installer_Fomod', u'Installer_InstallSmart']
+           u'Installer_Fomod', u'Installer_InstallSmart',
+           u'InstallerProject_PackAssets', u'Installer_TextureReport']
 
 #------------------------------------------------------------------------------
 # Installer Links -------------------------------------------------------------
@@ -602,6 +603,54 @@ def Execute(self):
         self._showLog(source_list_txt, title=_(u'Package Structure'),
                       fixedFont=False)
 
+class Installer_TextureReport(_InstallerLink):
+    """Reports the formats, dimensions and estimated VRAM use of the textures
+    of the selected installers, including the ones in their BSAs."""
+    _text = _(u'Texture Report...')
+    _help = _(u'Reads the headers of the textures of the selected installers '
+              u'(the installed ones for archives) and reports their formats, '
+              u'sizes and estimated VRAM use.')
+
+    def _enable(self):
+        return any(not self.idata[i].is_marker() for i in self.selected)
+
+    def Execute(self):
+        dds_files = bosh.dds_files
+        bsa_ext = bush.game.Bsa.bsa_extension
+        bsa_type = bosh.bsa_files.get_bsa_type(bush.game.fsName)
+        report = dds_files.TextureReport()
+        installers = [(n, i) for n, i in self.idata.sorted_pairs(
+            self.selected) if not i.is_marker()]
+        with balt.Progress(_(u'Texture Report'),
+                           u'\n' + u' ' * 60) as progress:
+            progress.setFull(len(installers))
+            for i, (name, installer) in enumerate(installers):
+                progress(i, name.s)
+                if installer.is_project():
+                    root_dir = self.idata.store_dir.join(name)
+                    files = installer.src_sizeCrcDate
+                else: # only archives' files that are installed can be read
+                    root_dir = bass.dirs[u'mods']
+                    files = [f for f in installer.ci_dest_sizeCrc
+                             if f in self.idata.data_sizeCrcDate]
+                report.add_package(name.s, dds_files.scan_loose_textures(
+                    root_dir.s, [f for f in files if
+                                 f.lower().endswith(u'.dds')]))
+                for bsa_path in (f for f in files if
+                                 f.lower().endswith(bsa_ext)):
+                    bsa_name = u'%s - %s' % (name, bsa_path)
+                    try:
+                        bsa_textures = dds_files.scan_bsa_textures(
+                            bsa_type(root_dir.join(bsa_path)))
+                    except (BSAError, EnvironmentError) as e:
+                        bsa_textures = [dds_files.DDSHeaderInfo.failed(
+                            bsa_path, e)]
+                    report.add_package(bsa_name, bsa_textures)
+        report_txt = report.render()
+        balt.copyToClipboard(report_txt)
+        self._showLog(report_txt, title=_(u'Texture Report'),
+                      fixedFont=True)
+
 class Installer_ExportAchlist(OneItemLink, _InstallerLink):
     """Write an achlist file with all the destinations files for this
     installer in this configuration."""
@@ -1193,6 +1242,83 @@ class InstallerProject_ReleasePack(InstallerProject_Pack):
         u'Pack project to an archive for release. Ignores dev files/folders')
     release = True
 
+#------------------------------------------------------------------------------
+class InstallerProject_PackAssets(AppendableLink, _SingleProject):
+    """Pack the assets of a project into a BSA/BA2, in a new project."""
+    _text = dialogTitle = _(u'Pack Assets to %s...') % \
+        bush.game.Bsa.bsa_extension[1:].upper()
+    _help = _(u'Create a new project with the assets of the selected project '
+              u'packed into a %s') % bush.game.Bsa.bsa_extension
+    # Top level folders whose files the games can load from archives
+    _packable_dirs = {u'distantlod', u'fonts', u'grass', u'interface',
+                      u'lodsettings', u'lsdata', u'materials', u'menus',
+                      u'meshes', u'music', u'scripts', u'seq', u'shaders',
+                      u'shadersfx', u'sound', u'strings', u'textures',
+                      u'trees', u'vis'}
+
+    @staticmethod
+    def _bsa_type(): return bosh.bsa_files.get_bsa_type(bush.game.fsName)
+
+    def _append(self, window): return self._bsa_type().can_pack()
+
+    @balt.conversation
+    def Execute(self):
+        bsa_ext = bush.game.Bsa.bsa_extension
+        is_ba2 = bsa_ext == u'.ba2' # we only write general BA2s
+        project_dir = self.idata.store_dir.join(self._selected_item)
+        packed, loose, plugins = {}, {}, []
+        for dest, src in self._selected_info.refreshDataSizeCrc(
+                ).iteritems():
+            dest_split = dest.lower().split(os.sep, 1)
+            if len(dest_split) > 1 and dest_split[0] in self._packable_dirs \
+                    and not (is_ba2 and dest_split[1].endswith(u'.dds')):
+                packed[dest.replace(os.sep, u'\\')] = project_dir.join(src).s
+            else:
+                loose[dest] = src
+                if len(dest_split) == 1 and GPath(
+                        dest).cext in bush.game.espm_extensions:
+                    plugins.append(dest)
+        if not packed:
+            self._showWarning(_(u'%s has no files that can be packed into '
+                                u'an archive.') % self._selected_item)
+            return
+        # Archives named after a plugin get loaded along with it
+        archive_root = (GPath(sorted(plugins)[0]).sbody if plugins
+                        else self._selected_item.s)
+        archive_name = self._askText(
+            _(u'Pack the assets of %s to:') % self._selected_item,
+            title=self.dialogTitle, default=archive_root + (
+                u' - Main' if is_ba2 else u'') + bsa_ext)
+        if not archive_name: return
+        archive_name = GPath(archive_name).tail
+        if archive_name.cext != bsa_ext:
+            archive_name = GPath(archive_name.s + bsa_ext)
+        packed_project = GPath(u'%s - Packed' % self._selected_item.s)
+        packed_dir = self.idata.store_dir.join(packed_project)
+        if packed_dir.exists():
+            if not self._askYes(_(u'%s already exists. Overwrite it?') %
+                    packed_project, title=self.dialogTitle, default=False):
+                return
+            packed_dir.rmtree(safety=u'Installers')
+        with balt.Progress(self.dialogTitle, u'\n' + u' ' * 60) as progress:
+            progress(0, _(u'Copying files...'))
+            for dest, src in loose.iteritems():
+                project_dir.join(src).copyTo(packed_dir.join(dest))
+            packed_dir.makedirs()
+            try:
+                self._bsa_type().pack_archive(
+                    packed_dir.join(archive_name).s, packed,
+                    progress=SubProgress(progress, 0.1, 0.9))
+            except (BSAError, EnvironmentError) as e:
+                packed_dir.rmtree(safety=u'Installers')
+                self._showError(_(u'Could not pack %s:') % archive_name +
+                                u'\n%s' % e)
+                return
+            self.idata.refresh_installer(packed_project, is_project=True,
+                progress=SubProgress(progress, 0.9, 0.99),
+                install_order=self._selected_info.order + 1, do_refresh=True)
+        self.window.RefreshUI(detail_item=packed_project)
+
 #------------------------------------------------------------------------------
 class _InstallerConverter_Link(_InstallerLink):
 
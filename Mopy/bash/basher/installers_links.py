@@ -29,6 +29,7 @@
 from .. import bass, bosh, balt, bush, load_order
 from ..balt import BoolLink, AppendableLink, ItemLink, ListBoxes, \
     EnabledLink
+from ..gui import BusyCursor
 
 __all__ = [u'Installers_SortActive', u'Installers_SortProjects',
            u'Installers_RefreshData', u'Installers_AddMarker',
@@ -45,7 +46,8 @@
            u'Installers_ConflictsReportShowsLower',
            u'Installers_ConflictsReportShowBSAConflicts',
            u'Installers_WizardOverlay', u'Installers_GlobalSkips',
-           u'Installers_GlobalRedirects', u'Installers_FullRefresh']
+           u'Installers_GlobalRedirects', u'Installers_FullRefresh',
+           u'Installers_ExportInstallersDat', u'Installers_LinkProjects']
 
 #------------------------------------------------------------------------------
 # Installers Links ------------------------------------------------------------
@@ -215,6 +217,19 @@ def Execute(self):
         finally:
             self.iPanel.RefreshUIMods(*ui_refresh)
 
+class Installers_ExportInstallersDat(Installers_Link):
+    """Export the installers data in the format older versions use."""
+    _text = _(u'Export Installers.dat')
+    _help = _(u'Writes the installers data to Installers.dat, so that it can '
+              u'be loaded by older versions of Wrye Bash.')
+
+    @balt.conversation
+    def Execute(self):
+        with BusyCursor():
+            self.idata.export_pickle()
+        self._showOk(_(u'Exported the installers data to %s') %
+                     self.idata.bash_dir.join(u'Installers.dat'))
+
 class _AInstallers_Refresh(AppendableLink, Installers_Link):
     """Refreshes all Installers data."""
     _full_refresh = False
@@ -328,6 +343,17 @@ class Installers_AutoRefreshProjects(BoolLink):
     _help = _(u'Toggles whether or not Wrye Bash will automatically detect '
               u'changes to projects in the installers directory.')
 
+class Installers_LinkProjects(BoolLink):
+    """Toggle linkProjects setting."""
+    _text = _(u'Link Projects on Install')
+    _bl_key = u'bash.installers.linkProjects'
+    _help = _(u'Install the files of projects as hardlinks to the project '
+              u'files, instead of copying them. Saves time and disk space - '
+              u'but WARNING: editing such a file in place, in the %s folder '
+              u'or in the project, changes both. Edited files are replaced '
+              u'with copies, with a warning, on the next refresh.'
+              ) % bush.game.mods_dir
+
 class Installers_ApplyEmbeddedBCFs(ItemLink):
     """Automatically apply Embedded BCFs to archives that have one."""
     _text = _(u'Apply Embedded BCFs')
@@ -222,6 +222,7 @@ def InitInstallerLinks():
     if bEnableWizard:
         InstallersList.column_links.append(Installers_AutoWizard())
     InstallersList.column_links.append(Installers_AutoRefreshProjects())
+    InstallersList.column_links.append(Installers_LinkProjects())
     InstallersList.column_links.append(Installers_AutoRefreshBethsoft())
     InstallersList.column_links.append(Installers_BsaRedirection())
     InstallersList.column_links.append(Installers_RemoveEmptyDirs())
@@ -280,8 +281,10 @@ def InitInstallerLinks():
             packageMenu.links.append(Installer_ExportAchlist())
         packageMenu.links.append(InstallerProject_Pack())
         packageMenu.links.append(InstallerProject_ReleasePack())
+        packageMenu.links.append(InstallerProject_PackAssets())
         packageMenu.links.append(SeparatorLink())
         packageMenu.links.append(Installer_ListStructure())
+        packageMenu.links.append(Installer_TextureReport())
         packageMenu.links.append(Installer_SyncFromData())
         packageMenu.links.append(InstallerArchive_Unpack())
         packageMenu.links.append(Installer_CopyConflicts())
@@ -335,6 +338,7 @@ def InitInstallerLinks():
     edit_menu.append(SeparatorLink())
     edit_menu.append(Installers_RefreshData())
     edit_menu.append(Installers_FullRefresh())
+    edit_menu.append(Installers_ExportInstallersDat())
     # View Menu
     view_menu = InstallersList.global_links[_(u'View')]
     view_menu.append(SortByMenu(
@@ -353,6 +357,7 @@ def InitInstallerLinks():
     if bEnableWizard:
         settings_menu.append(Installers_AutoWizard())
     settings_menu.append(Installers_AutoRefreshProjects())
+    settings_menu.append(Installers_LinkProjects())
     settings_menu.append(SeparatorLink())
     settings_menu.append(Installers_ConflictsReportShowBSAConflicts())
     settings_menu.append(Installers_ConflictsReportShowsInactive())
@@ -692,6 +697,7 @@ def InitSaveLinks():
     SaveList.context_links.append(Save_LoadMasters())
     SaveList.context_links.append(File_ListMasters())
     SaveList.context_links.append(Save_DiffMasters())
+    SaveList.context_links.append(Save_RemapMasters())
     if bush.game.Ess.canEditMore:
         SaveList.context_links.append(Save_Stats())
     SaveList.context_links.append(Save_StatObse())
@@ -776,6 +782,8 @@ def InitBSALinks():
     BSAList.context_links.append(file_menu)
     BSAList.context_links.append(BSA_ExtractToProject())
     BSAList.context_links.append(BSA_ListContents())
+    BSAList.context_links.append(BSA_ListOverridden())
+    BSAList.context_links.append(BSA_TextureReport())
     # BSAList: Global Links
     # File Menu
     file_menu = BSAList.global_links[_(u'File')]
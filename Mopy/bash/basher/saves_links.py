@@ -47,7 +47,7 @@
            u'Save_EditCreatedEnchantmentCosts', u'Save_ImportFace',
            u'Save_EditCreated', u'Save_ReweighPotions', u'Save_UpdateNPCLevels',
            u'Save_ExportScreenshot', u'Save_Unbloat', u'Save_RepairAbomb',
-           u'Save_RepairHair', u'Save_StatPluggy']
+           u'Save_RepairHair', u'Save_StatPluggy', u'Save_RemapMasters']
 
 #------------------------------------------------------------------------------
 # Saves Links -----------------------------------------------------------------
@@ -342,6 +342,36 @@ def Execute(self):
                 message += u'\n* '.join(x.s for x in load_order.get_ordered(added))
             self._showWryeLog(message, title=_(u'Diff Masters'))
 
+#------------------------------------------------------------------------------
+class Save_RemapMasters(EnabledLink):
+    """Applies the plugin renames Bash recorded to the masters of the
+    selected saves."""
+    _text = _(u'Apply Master Renames...')
+    _help = _(u'Rename the masters of the selected saves and their cosaves '
+              u'to the new names of plugins renamed in Bash')
+
+    def _enable(self): return bool(bass.settings[u'bash.mods.renames'])
+
+    def Execute(self):
+        renames = bass.settings[u'bash.mods.renames']
+        message = [_(u'Rename these masters in the selected saves?')]
+        message.extend(u'  %s -> %s' % (old, new) for old, new in
+                       sorted(renames.iteritems()))
+        if not self._askYes(u'\n'.join(message), _(u'Apply Master Renames')):
+            return
+        with balt.Progress(_(u'Apply Master Renames')) as progress:
+            remapped, errors, (elapsed, read_bytes) = \
+                bosh.saveInfos.remap_masters(renames, self.selected, progress)
+        message = _(u'Updated %d of %d saves in %.1f seconds (%.1f MB/s).') % (
+            len(remapped), len(self.selected), elapsed,
+            read_bytes / 1048576 / (elapsed or 1))
+        if errors:
+            message += u'\n\n' + _(u'Failed to update:') + u'\n' + \
+                       u'\n'.join(u'  %s: %s' % x for x in sorted(
+                           errors.iteritems()))
+        self._showOk(message, _(u'Apply Master Renames'))
+        self.window.RefreshUI(redraw=remapped)
+
 #------------------------------------------------------------------------------
 class Save_Rename(UIList_Rename):
     """Renames Save File."""
@@ -831,6 +861,12 @@ def Execute(self):
         if nullRefCount:
             message.append(u'  ' + _(u'Null Ref Objects:') +
                            u' %u' % nullRefCount)
+        message.extend([u'', _(u'Largest change record types:')])
+        rec_type_map = bush.game.save_rec_types
+        for rec_kind, (count_, kind_size) in saveFile.bloat.largest_kinds(5):
+            message.append(u'  %s: %u (%u kb)' % (
+                rec_type_map.get(rec_kind, u'%s' % rec_kind), count_,
+                kind_size // 1024))
         message.extend([u'', _(
             u'WARNING: This is a risky procedure that may corrupt your '
             u'savegame!  Use only if necessary!')])
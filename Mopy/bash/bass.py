@@ -80,12 +80,18 @@ def rmTempDir():
         deprint(u'Failed to remove %s' % _tempDir, traceback=True)
     _tempDir = None
 
-def newTempDir():
+def newTempDir(temp_parent=None):
     """Generate a new temporary directory name, set it as the current Temp
-    Dir."""
+    Dir. If temp_parent is given, create the directory in there - raises
+    OSError if that fails."""
     global _tempDir
-    from .bolt import Path
-    _tempDir = Path.tempDir()
+    from .bolt import Path, GPath
+    if temp_parent is None:
+        _tempDir = Path.tempDir()
+    else:
+        import tempfile
+        _tempDir = GPath(tempfile.mkdtemp(prefix=u'WryeBash_',
+                                          dir=temp_parent.s))
     return _tempDir
 
 def get_ini_option(ini_parser, option_key, section_key=u'General'):
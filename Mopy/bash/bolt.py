@@ -25,12 +25,14 @@
 #--Standard
 from __future__ import division, print_function
 
+import bisect
 import cPickle as pickle  # PY3
 import codecs
 import collections
 import copy
 import datetime
 import errno
+import multiprocessing
 import os
 import re
 import shutil
@@ -41,11 +43,13 @@
 import sys
 import tempfile
 import textwrap
+import threading
 import traceback
 from binascii import crc32
 from functools import partial
 from itertools import chain, izip
 from keyword import iskeyword
+from multiprocessing.pool import ThreadPool
 from operator import attrgetter
 from urllib import quote
 
@@ -1745,6 +1749,29 @@ def winNewLines(inString):
     """Converts unix newlines to windows newlines."""
     return reUnixNewLine.sub(u'\r\n',inString)
 
+def longest_increasing(seq, key=None):
+    """Return the set of the positions in seq of a longest strictly
+    increasing subsequence of its items - O(n log n). Items whose key is None
+    are skipped."""
+    tails, tail_pos, prev_pos = [], [], [None] * len(seq)
+    for pos, item in enumerate(seq):
+        if key is not None:
+            item = key(item)
+            if item is None: continue
+        length = bisect.bisect_left(tails, item)
+        if length == len(tails):
+            tails.append(item)
+            tail_pos.append(pos)
+        else:
+            tails[length], tail_pos[length] = item, pos
+        prev_pos[pos] = tail_pos[length - 1] if length else None
+    run = set()
+    pos = tail_pos[-1] if tail_pos else None
+    while pos is not None:
+        run.add(pos)
+        pos = prev_pos[pos]
+    return run
+
 # Log/Progress ----------------------------------------------------------------
 #------------------------------------------------------------------------------
 class Log(object):
@@ -1870,6 +1897,77 @@ def __call__(self,state,message=u''):
         self.parent(self.baseFrom+self.scale*state/self.full,message)
         self.state = state
 
+#------------------------------------------------------------------------------
+class ThreadProgress(Progress):
+    """Progress that worker threads may report to. Calls from the thread
+    that created it are passed on to the wrapped progress right away, calls
+    from other threads only record the latest state and message, which
+    pump() - called on the creating thread - passes on."""
+    def __init__(self, progress, full=1.0):
+        Progress.__init__(self, full)
+        self._progress = progress
+        self._owner = threading.current_thread()
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def _do_progress(self, state, message):
+        if threading.current_thread() is self._owner:
+            self._progress(state, message)
+        else:
+            with self._lock:
+                self._pending = (state, message)
+
+    def pump(self):
+        """Pass the latest state reported by a worker thread on, if any."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self._progress(*pending)
+
+#------------------------------------------------------------------------------
+# Worker pools - use those for I/O bound work (external processes, disk
+# access), anything CPU bound will just fight over the GIL
+def worker_count(max_workers=8):
+    """Return the number of worker threads to use for a pool, bounded by
+    max_workers."""
+    try:
+        return max(1, min(max_workers, multiprocessing.cpu_count()))
+    except NotImplementedError:
+        return 1
+
+def imap_ordered(func, iterable, max_workers=8, poll=None,
+                 poll_interval=0.1):
+    """Yield func(item) for each item in iterable, in order, evaluating func
+    over a bounded pool of worker threads. Results are consumed by the calling
+    thread, so it's safe to report progress and to update shared state
+    while iterating. func must not touch the GUI. If the caller stops
+    iterating early the remaining work is abandoned. If given, poll is
+    called on the calling thread with the index of the item whose result is
+    awaited, every poll_interval seconds while waiting for it - use it to
+    forward a ThreadProgress."""
+    items = list(iterable)
+    workers = min(len(items), worker_count(max_workers))
+    if workers < 2:
+        for item in items:
+            yield func(item)
+        return
+    pool = ThreadPool(workers)
+    try:
+        results = pool.imap(func, items)
+        for index in xrange(len(items)):
+            while True:
+                try:
+                    result = results.next(
+                        None if poll is None else poll_interval)
+                    break
+                except multiprocessing.TimeoutError:
+                    poll(index)
+            if poll is not None: poll(index) # report the last of it
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
 #------------------------------------------------------------------------------
 def readCString(ins, file_path):
     """Read null terminated string, dropping the final null byte."""
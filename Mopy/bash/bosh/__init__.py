@@ -1101,6 +1101,7 @@ def listErrors(self):
 from .save_headers import get_save_header_type, SaveFileHeader
 from .cosaves import PluggyCosave, xSECosave
 from . import cosaves
+from ._saves_cache import SaveHeadersCache
 
 class SaveInfo(FileInfo):
     cosave_types = () # cosave types for this game - set once in SaveInfos
@@ -1132,11 +1133,25 @@ def getStatus(self):
             return -10
 
     def readHeader(self):
-        """Read header from file and set self.header attribute."""
-        try:
-            self.header = get_save_header_type(bush.game.fsName)(self.abs_path)
-        except SaveHeaderError as e:
-            raise SaveFileError, (self.name, e.message), sys.exc_info()[2]
+        """Read header from file and set self.header attribute - or from the
+        headers cache, if the save did not change since it was cached."""
+        header_type = get_save_header_type(bush.game.fsName)
+        cached = saveInfos.headers_cache.get(self)
+        if cached is not None:
+            try:
+                self.header = header_type.from_cache(self.abs_path, cached)
+            except (TypeError, ValueError, AttributeError, KeyError,
+                    IndexError):
+                deprint(u'Bad cached header for %s' % self.name,
+                        traceback=True)
+                saveInfos.headers_cache.discard(self)
+                cached = None
+        if cached is None:
+            try:
+                self.header = header_type(self.abs_path)
+            except SaveHeaderError as e:
+                raise SaveFileError, (self.name, e.message), sys.exc_info()[2]
+            saveInfos.headers_cache.put(self)
         self._reset_masters()
 
     def do_update(self, raise_on_error=False):
@@ -1184,6 +1199,24 @@ def write_masters(self):
                 co_file.remap_plugins(master_map)
                 co_file.write_cosave_safe()
 
+    def remap_masters(self, master_renames):
+        """Rename the masters of this save - and of its cosaves - that are
+        keys of master_renames to the corresponding values, keeping the
+        modification time of the save. Return False without opening the save
+        if none of its masters (as read from its header) is renamed."""
+        old_masters = self.header.masters
+        if not any(m in master_renames for m in old_masters): return False
+        prev_mtime = self.mtime
+        self.header.masters = [master_renames.get(m, m) for m in old_masters]
+        try:
+            self.write_masters()
+        except (FileError, SaveHeaderError, OSError, IOError):
+            # if the save was replaced, refreshing it will reread its header
+            self.header.masters = old_masters
+            raise
+        self.setmtime(prev_mtime)
+        return True
+
     def get_cosave_tags(self):
         """Return strings expressing whether cosaves exist and are correct.
         Correct means not in more that 10 seconds difference from the save."""
@@ -1507,22 +1540,19 @@ def refresh(self, refresh_infos=True, booting=False):
         _added = set()
         _updated = set()
         newNames = self._names()
-        for new in newNames: #--Might have '.ghost' lopped off.
-            oldInfo = self.get(new) # None if new was in corrupted or new one
-            try:
-                if oldInfo is not None:
-                    if oldInfo.do_update(): # will reread the header
-                        _updated.add(new)
-                else: # added or known corrupted, get a new info
-                    self.new_info(new, _in_refresh=True,
-                                  notify_bain=not booting)
-                    _added.add(new)
-            except FileError as e: # old still corrupted, or new(ly) corrupted
+        for new, oldInfo, result in self._refresh_infos(sorted(newNames),
+                                                        booting):
+            if isinstance(result, FileError):
+                # old still corrupted, or new(ly) corrupted
                 if not new in self.corrupted \
-                        or self.corrupted[new] != e.message:
-                    deprint(u'Failed to load %s: %s' % (new, e.message)) #, traceback=True)
-                    self.corrupted[new] = e.message
+                        or self.corrupted[new] != result.message:
+                    deprint(u'Failed to load %s: %s' % (new, result.message)) #, traceback=True)
+                    self.corrupted[new] = result.message
                 self.pop(new, None)
+            elif oldInfo is None:
+                _added.add(new)
+            elif result:
+                _updated.add(new)
         _deleted_ = oldNames - newNames
         self.delete_refresh(_deleted_, None, check_existence=False,
                             _in_refresh=True)
@@ -1532,6 +1562,23 @@ def refresh(self, refresh_infos=True, booting=False):
         if not change: return change
         return _added, _updated, _deleted_
 
+    def _refresh_infos(self, names, booting):
+        """Refresh the infos of names, creating the ones of new or known
+        corrupted files. Yield each name along with its old info (None if
+        there was none) and the result - whether the old info changed, the
+        new info or the FileError raised while reading the file."""
+        for new in names: #--Might have '.ghost' lopped off.
+            oldInfo = self.get(new) # None if new was in corrupted or new one
+            try:
+                if oldInfo is not None:
+                    result = oldInfo.do_update() # will reread the header
+                else: # added or known corrupted, get a new info
+                    result = self.new_info(new, _in_refresh=True,
+                                           notify_bain=not booting)
+            except FileError as e:
+                result = e
+            yield new, oldInfo, result
+
     def delete_refresh(self, deleted_keys, paths_to_keys, check_existence,
                        _in_refresh=False):
         """Special case for the saves, inis, mods and bsas.
@@ -2983,6 +3030,7 @@ def _recalc_dependents(self):
 class SaveInfos(FileInfos):
     """SaveInfo collection. Represents save directory and related info."""
     _bain_notify = False
+    headers_cache = None # type: SaveHeadersCache
 
     def _setLocalSaveFromIni(self):
         """Read the current save profile from the oblivion.ini file and set
@@ -3024,9 +3072,91 @@ def rightFileType(cls, fileName):
     @property
     def bash_dir(self): return self.store_dir.join(u'Bash')
 
+    def _initDB(self, dir_):
+        # each save profile has its own headers cache
+        if self.headers_cache is not None: self.save_headers_cache()
+        super(SaveInfos, self)._initDB(dir_)
+        self.headers_cache = SaveHeadersCache(
+            self.bash_dir.join(u'Save Headers.dat'))
+
     def refresh(self, refresh_infos=True, booting=False):
         if not booting: self._refreshLocalSave() # otherwise we just did this
-        return refresh_infos and FileInfos.refresh(self, booting=booting)
+        change = refresh_infos and FileInfos.refresh(self, booting=booting)
+        if change: self.save_headers_cache()
+        return change
+
+    def _refresh_infos(self, names, booting):
+        """Reading the save headers - and the master lists of the cosaves -
+        is I/O bound, so it runs over a bounded pool of worker threads. The
+        new infos are added here, on the main thread, in the order of
+        names."""
+        self.headers_cache.load() # not from the workers
+        names_infos = [(n, self.get(n)) for n in names]
+        def _refresh(name_info):
+            new, oldInfo = name_info
+            try:
+                if oldInfo is not None:
+                    return oldInfo.do_update()
+                return self.factory(self.store_dir.join(new), load_cache=True)
+            except FileError as e:
+                return e
+        for (new, oldInfo), result in izip(names_infos, bolt.imap_ordered(
+                _refresh, names_infos)):
+            if oldInfo is None and not isinstance(result, FileError):
+                self[new] = result
+                self.corrupted.pop(new, None)
+            yield new, oldInfo, result
+
+    def save(self):
+        super(SaveInfos, self).save()
+        self.save_headers_cache()
+
+    def save_headers_cache(self):
+        """Cache the thumbnails created since the headers were cached, drop
+        the headers of deleted saves and write the cache if it changed."""
+        headers_cache = self.headers_cache
+        for save_info in self.itervalues():
+            if save_info.header.has_thumbnail:
+                headers_cache.put(save_info) # no-op if already cached
+        headers_cache.prune({n.s.lower() for n in self})
+        headers_cache.save()
+
+    def remap_masters(self, master_renames, save_names=None, progress=None):
+        """Apply master_renames, a dict mapping old to new plugin names, to
+        the masters of the saves in save_names - all saves in the current
+        profile by default - and of their cosaves. Saves none of whose
+        masters are renamed are skipped based on their (cached) headers. The
+        rest are rewritten over a bounded pool of worker threads, each one
+        via a temp file that replaces it once written, so a failed save is
+        left untouched. Return the names of the rewritten saves, a dict
+        mapping the names of the saves that failed to the errors and the
+        throughput, as (seconds, bytes read)."""
+        progress = progress or bolt.Progress()
+        save_names = list(self) if save_names is None else save_names
+        affected = [self[n] for n in save_names if any(
+            m in master_renames for m in self[n].header.masters)]
+        progress.setFull(max(len(affected), 1))
+        def _remap(save_info):
+            try:
+                save_info.remap_masters(master_renames)
+            except (FileError, SaveHeaderError, OSError, IOError) as e:
+                deprint(u'Failed to remap the masters of %s' % save_info,
+                        traceback=True)
+                return e
+        start, read_bytes = time.time(), 0
+        remapped, errors = [], {}
+        for i, (save_info, error) in enumerate(izip(affected, bolt.imap_ordered(
+                _remap, affected))):
+            progress(i, save_info.name.s)
+            read_bytes += save_info.fsize
+            if error is None: remapped.append(save_info.name)
+            else: errors[save_info.name] = error
+        elapsed = time.time() - start
+        deprint(u'Remapped the masters of %d saves (%d skipped, %d failed): '
+                u'%.1f MB in %.2fs' % (len(remapped), len(save_names) - len(
+            affected), len(errors), read_bytes / 1048576.0, elapsed))
+        if affected: self.refresh() # reread the rewritten headers
+        return remapped, errors, (elapsed, read_bytes)
 
     def _rename_operation(self, oldName, newName):
         """Renames member file from oldName to newName, update also cosave
@@ -3134,6 +3264,8 @@ def enable(self,fileName,value=True):
 
 #------------------------------------------------------------------------------
 from . import bsa_files
+from ._asset_index import AssetIndex
+from ._bsa_cache import BsaAssetsCache
 
 class BSAInfos(FileInfos):
     """BSAInfo collection. Represents bsa files in game's Data directory."""
@@ -3175,6 +3307,16 @@ def do_update(self, raise_on_error=False):
             def readHeader(self):  # just reset the cache
                 self._assets = self.__class__._assets
 
+            @property
+            def assets(self):
+                assets_cache = bsaInfos.assets_cache
+                if self._assets is self.__class__._assets:
+                    cached = assets_cache.get(self)
+                    if cached is not None: self._assets = cached
+                b_assets = super(BSAInfo, self).assets
+                assets_cache.put(self, b_assets) # no-op if already cached
+                return b_assets
+
             def _reset_bsa_mtime(self):
                 if bush.game.Bsa.allow_reset_timestamps and inisettings[
                     u'ResetBSATimestamps']:
@@ -3184,6 +3326,9 @@ def _reset_bsa_mtime(self):
                         self.setmtime(default_mtime)
 
         super(BSAInfos, self).__init__(dirs[u'mods'], factory=BSAInfo)
+        self.assets_cache = BsaAssetsCache(
+            self.bash_dir.join(u'BSA Assets.dat'))
+        self.asset_index = AssetIndex()
 
     def new_info(self, fileName, _in_refresh=False, owner=None,
                  notify_bain=False):
@@ -3210,6 +3355,27 @@ def new_info(self, fileName, _in_refresh=False, owner=None,
     @property
     def bash_dir(self): return dirs[u'modsBash'].join(u'BSA Data')
 
+    def save(self):
+        super(BSAInfos, self).save()
+        self.save_assets_cache()
+
+    def get_asset_index(self, loose_files=None):
+        """Return the asset index, synced with the active BSAs.
+
+        :param loose_files: the Data dir files, relative to it - the
+            InstallersData.data_sizeCrcDate of BAIN, if it has scanned Data.
+            If None, the Data dir is walked."""
+        if loose_files is None:
+            loose_files = AssetIndex.scan_loose(dirs[u'mods'])
+        self.asset_index.sync(modInfos.get_active_bsas()[0], loose_files)
+        return self.asset_index
+
+    def save_assets_cache(self):
+        """Drop the cached assets of deleted BSAs and write the cache if it
+        changed."""
+        self.assets_cache.prune({n.s.lower() for n in self})
+        self.assets_cache.save()
+
     @staticmethod
     def remove_invalidation_file():
         """Removes ArchiveInvalidation.txt, if it exists in the game folder.
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Resolves the asset paths the game looks up to the source it loads them
+from - a loose file in the Data directory or the highest loading active BSA
+containing them. Hence the underscore, BSAInfos owns the only instance.
+Only the winning source of each asset is indexed - InstallersData
+.find_conflicts needs all the BSAs containing an asset, so it uses the
+reverse index of BsaAssetsCache instead."""
+
+import os
+
+from ..bolt import deprint
+from ..exception import BSAError
+
+# The source of assets that are loaded from loose files
+LOOSE = u'Data'
+
+class AssetIndex(object):
+    """Maps each asset contained in the active BSAs to the highest loading of
+    those BSAs. Loose files override BSAs, so are looked up in a container of
+    the (lowercase) Data dir files, passed to sync. When the BSA load order
+    changes, only the assets of the BSAs above the first changed position
+    are reindexed."""
+
+    def __init__(self):
+        # the active BSAs in load order, as (key, bsa_info, assets) tuples,
+        # key being the (lowercase name, size, mtime) of the BSA when indexed
+        self._layers = []
+        # asset -> the highest loading active BSA containing it
+        self._winners = {}
+        # anything supporting 'in' for lowercase paths relative to Data
+        self._loose = frozenset()
+        self.bsa_errors = [] # BSAs that failed to parse in the last sync
+
+    def sync(self, active_bsas, loose_files):
+        """Bring the index up to date with the active BSAs.
+
+        :param active_bsas: dict mapping the active BSAs to their load
+            positions, as returned by bosh.modInfos.get_active_bsas()
+        :param loose_files: the paths of the loose files in the Data dir,
+            relative to it - a LowerDict/set of lowercase paths, so that
+            changes to it are visible without syncing again"""
+        self._loose = loose_files
+        new_layers, self.bsa_errors = [], []
+        for bsa_info in sorted(active_bsas, key=active_bsas.__getitem__):
+            try:
+                b_assets = bsa_info.assets
+            except BSAError:
+                deprint(u'Error parsing %s' % bsa_info, traceback=True)
+                self.bsa_errors.append(bsa_info)
+                continue
+            new_layers.append(((bsa_info.name.s.lower(), bsa_info.fsize,
+                                bsa_info._file_mod_time), bsa_info, b_assets))
+        old_layers = self._layers
+        first_changed = 0
+        for old_layer, new_layer in zip(old_layers, new_layers):
+            if old_layer[0] != new_layer[0]: break
+            first_changed += 1
+        if first_changed == len(old_layers) == len(new_layers):
+            return # nothing changed
+        self._reindex(first_changed, new_layers)
+
+    def _reindex(self, first_changed, new_layers):
+        winners = self._winners
+        kept_layers = new_layers[:first_changed]
+        # Assets of the BSAs above first_changed that are no longer active
+        # (or changed) fall through to the highest kept BSA containing them
+        dropped = set()
+        for _key, _bsa_info, b_assets in self._layers[first_changed:]:
+            dropped.update(b_assets)
+        for asset in dropped:
+            del winners[asset]
+        for _key, bsa_info, b_assets in reversed(kept_layers):
+            if not dropped: break
+            fallen = dropped.intersection(b_assets)
+            if fallen:
+                winners.update(dict.fromkeys(fallen, bsa_info))
+                dropped -= fallen
+        for _key, bsa_info, b_assets in new_layers[first_changed:]:
+            winners.update(dict.fromkeys(b_assets, bsa_info))
+        self._layers = new_layers
+
+    # Queries -----------------------------------------------------------------
+    def resolve(self, asset):
+        """Return the source the game loads asset from: LOOSE, a BSA or None
+        if it's missing. Assets are lowercase and use os.sep."""
+        if asset in self._loose: return LOOSE
+        return self._winners.get(asset)
+
+    def resolve_all(self, assets):
+        """Return a dict mapping each of the assets that is not missing to
+        the source it is loaded from - see resolve."""
+        loose, winners_get = self._loose, self._winners.get
+        result = {}
+        for asset in assets:
+            if asset in loose:
+                result[asset] = LOOSE
+            else:
+                source = winners_get(asset)
+                if source is not None: result[asset] = source
+        return result
+
+    def missing(self, assets):
+        """Return the set of assets that are neither loose nor in an active
+        BSA."""
+        loose = self._loose
+        return {a for a in assets if a not in self._winners and a not in loose}
+
+    def overridden(self, bsa_info):
+        """Return a dict mapping the assets of the (active) bsa_info that the
+        game loads from another source to that source."""
+        for _key, b_inf, b_assets in self._layers:
+            if b_inf is bsa_info: break
+        else: return {}
+        loose, winners = self._loose, self._winners
+        return {a: LOOSE if a in loose else winners[a] for a in b_assets if
+                a in loose or winners[a] is not bsa_info}
+
+    @staticmethod
+    def scan_loose(data_dir):
+        """Return a set of the lowercase paths of all files in data_dir,
+        relative to it. For when BAIN has not scanned the Data dir."""
+        data_dir = data_dir.s
+        prefix_len = len(data_dir) + len(os.sep)
+        loose = set()
+        for root, _dirs, files in os.walk(data_dir):
+            rel_root = root[prefix_len:].lower()
+            if rel_root:
+                loose.update(os.path.join(rel_root, f.lower()) for f in files)
+            else:
+                loose.update(f.lower() for f in files)
+        return loose
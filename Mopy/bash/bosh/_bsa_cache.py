@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""BSA Assets.dat - persistent cache of the (lowercase) asset paths in each
+BSA, so the conflict reports don't have to parse the name tables of every
+active BSA on each run. Hence the underscore, BSAInfos is the only client."""
+
+import array
+import marshal
+from itertools import izip
+
+from ..bolt import deprint
+
+def encode_assets(assets):
+    """Sort assets and prefix compress them - return a string of the lengths
+    of the prefixes each path shares with the previous one and the newline
+    separated remainders of the paths."""
+    prefix_lens, suffixes, prev = array.array(u'H'), [], u''
+    for asset in sorted(assets):
+        common, max_common = 0, min(len(prev), len(asset), 0xFFFF)
+        while common < max_common and prev[common] == asset[common]:
+            common += 1
+        prefix_lens.append(common)
+        suffixes.append(asset[common:])
+        prev = asset
+    return prefix_lens.tostring(), u'\n'.join(suffixes)
+
+def decode_assets(prefix_lens, suffixes):
+    """Inverse of encode_assets - return a frozenset of the asset paths."""
+    lens = array.array(u'H')
+    lens.fromstring(prefix_lens)
+    assets, prev = [], u''
+    for common, suffix in izip(lens, suffixes.split(u'\n')):
+        prev = prev[:common] + suffix
+        assets.append(prev)
+    return frozenset(assets)
+
+class BsaAssetsCache(object):
+    """Maps BSA names to the asset sets of those BSAs, as of the size and
+    modification time the BSA had when it was parsed. Also keeps a reverse
+    index, mapping assets to the BSAs containing them, for the BSAs that
+    were queried via owners."""
+    _cache_version = 1
+
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        # lowercase bsa name -> (size, mtime, prefix_lens, suffixes)
+        self._entries = None # loaded on first use
+        self._dirty = False
+        # asset -> lowercase name of the BSA containing it, or a tuple of
+        # names if more than one does
+        self._owners = {}
+        # lowercase bsa name -> the asset set indexed in _owners for it
+        self._indexed = {}
+
+    def _load(self):
+        self._entries = {}
+        if not self._cache_path.exists(): return
+        try:
+            with self._cache_path.open(u'rb') as ins:
+                cache_ver, entries = marshal.load(ins)
+            if cache_ver == self._cache_version:
+                self._entries = entries
+        except (EOFError, ValueError, TypeError, IOError, OSError):
+            deprint(u'Failed to read %s' % self._cache_path, traceback=True)
+
+    def _entries_dict(self):
+        if self._entries is None: self._load()
+        return self._entries
+
+    def get(self, bsa_info):
+        """Return the cached assets of bsa_info, or None if it was not cached
+        or it changed since."""
+        entry = self._entries_dict().get(bsa_info.name.s.lower())
+        if entry is None or entry[:2] != (bsa_info.fsize,
+                                          bsa_info._file_mod_time):
+            return None
+        return decode_assets(*entry[2:])
+
+    def put(self, bsa_info, assets):
+        """Cache the assets of bsa_info, unless they are cached already."""
+        bsa_key = bsa_info.name.s.lower()
+        stat_tuple = (bsa_info.fsize, bsa_info._file_mod_time)
+        entries = self._entries_dict()
+        entry = entries.get(bsa_key)
+        if entry is not None and entry[:2] == stat_tuple: return
+        entries[bsa_key] = stat_tuple + encode_assets(assets)
+        self._dirty = True
+
+    def prune(self, live_keys):
+        """Drop the entries of BSAs whose (lowercase) names are not in
+        live_keys - they were deleted."""
+        entries = self._entries_dict()
+        for bsa_key in set(entries) - live_keys:
+            del entries[bsa_key]
+            self._dirty = True
+        for bsa_key in set(self._indexed) - live_keys:
+            self._unindex(bsa_key)
+
+    def save(self):
+        """Write the cache if it changed since it was loaded."""
+        if not self._dirty: return
+        with self._cache_path.temp.open(u'wb') as out:
+            marshal.dump((self._cache_version, self._entries), out, 2)
+        self._cache_path.untemp()
+        self._dirty = False
+
+    # Reverse index -----------------------------------------------------------
+    def _unindex(self, bsa_key):
+        owners = self._owners
+        for asset in self._indexed.pop(bsa_key, ()):
+            own = owners[asset]
+            if own == bsa_key: del owners[asset]
+            elif isinstance(own, tuple):
+                own = tuple(k for k in own if k != bsa_key)
+                owners[asset] = own[0] if len(own) == 1 else own
+
+    def _index(self, bsa_key, assets):
+        if self._indexed.get(bsa_key) is assets: return
+        self._unindex(bsa_key)
+        self._indexed[bsa_key] = assets
+        owners = self._owners
+        for asset in assets:
+            own = owners.get(asset)
+            if own is None: owners[asset] = bsa_key
+            elif isinstance(own, tuple): owners[asset] = own + (bsa_key,)
+            else: owners[asset] = (own, bsa_key)
+
+    def owners(self, bsa_assets, assets):
+        """Return a dict mapping each of the BSAs in bsa_assets that contains
+        any of the specified assets to the set of those assets.
+
+        :param bsa_assets: a dict mapping BSAs to their asset sets - the
+            index is updated for any of them that changed
+        :param assets: the assets to look up"""
+        key_bsa = {}
+        for bsa_info, b_assets in bsa_assets.iteritems():
+            bsa_key = bsa_info.name.s.lower()
+            key_bsa[bsa_key] = bsa_info
+            self._index(bsa_key, b_assets)
+        result = {}
+        owners_get = self._owners.get
+        for asset in assets:
+            own = owners_get(asset)
+            if own is None: continue
+            for bsa_key in (own,) if not isinstance(own, tuple) else own:
+                try:
+                    bsa_info = key_bsa[bsa_key]
+                except KeyError: # not one of the BSAs we were asked about
+                    continue
+                result.setdefault(bsa_info, set()).add(asset)
+        return result
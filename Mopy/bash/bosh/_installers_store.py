@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Installers.db - sqlite storage for the BAIN installers and the Data
+directory sizes/crcs/dates cache. Replaces the Installers.dat pickle, which
+had to be rewritten in full on every save - here only the rows of the
+installers and the Data files that changed are written. Hence the underscore,
+InstallersData is the only client."""
+
+import cPickle as pickle
+import marshal
+import sqlite3
+from binascii import crc32
+from functools import partial
+
+from .. import bolt
+from ..bolt import GPath, deprint
+
+class InstallersStore(object):
+    """Reads the installers from and incrementally writes them to an sqlite
+    database. The big persistent attributes get columns of their own, the
+    rest are pickled together - the project caches (src_sizeCrcDate) are only
+    read when a project needs them."""
+    _schema_version = 1
+    _schema = (
+        u'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)',
+        u'CREATE TABLE IF NOT EXISTS installers (key TEXT PRIMARY KEY, '
+        u'name TEXT, kind TEXT, attrs BLOB, files BLOB, src_files BLOB)',
+        u'CREATE TABLE IF NOT EXISTS data_files (key TEXT PRIMARY KEY, '
+        u'path TEXT, size INTEGER, crc INTEGER, date REAL)',
+    )
+    _big_attrs = {u'fileSizeCrcs', u'src_sizeCrcDate'}
+
+    def __init__(self, db_path):
+        self._db_path = db_path
+        # installer name -> ((row key, class, attrs crc), fileSizeCrcs) as of
+        # the last load/save - fileSizeCrcs is replaced, not modified, when
+        # the installer is refreshed
+        self._saved = {}
+
+    def exists(self): return self._db_path.exists()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._db_path.s)
+        for statement in self._schema:
+            conn.execute(statement)
+        return conn
+
+    @staticmethod
+    def _kinds():
+        from . import InstallerArchive, InstallerProject, InstallerMarker
+        return {u'archive': InstallerArchive, u'project': InstallerProject,
+                u'marker': InstallerMarker}
+
+    @classmethod
+    def _attr_names(cls, inst_type):
+        return [a for a in inst_type.persistent if a not in cls._big_attrs]
+
+    def load(self):
+        """Return a dict mapping names to installers and a list of (path,
+        (size, crc, date)) tuples for the Data dir files, or None if the
+        database could not be read."""
+        kinds = self._kinds()
+        try:
+            conn = self._connect()
+            try:
+                schema_ver = conn.execute(u'SELECT value FROM meta WHERE '
+                                          u'key=?', (u'version',)).fetchone()
+                if schema_ver and schema_ver[0] > self._schema_version:
+                    deprint(u'%s was written by a newer version, ignoring' %
+                            self._db_path)
+                    return None
+                rows = conn.execute(u'SELECT key, name, kind, attrs, files '
+                                    u'FROM installers').fetchall()
+                data_files = [(p, (s, c, d)) for p, s, c, d in conn.execute(
+                    u'SELECT path, size, crc, date FROM data_files')]
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            deprint(u'Failed to read %s' % self._db_path, traceback=True)
+            return None
+        installers, saved = {}, {}
+        for row_key, name, kind, attrs, files in rows:
+            inst_name, inst_type = GPath(name), kinds[kind]
+            attrs = bytes(attrs)
+            values = dict(zip(self._attr_names(inst_type),
+                              pickle.loads(attrs)))
+            values[u'fileSizeCrcs'] = marshal.loads(bytes(files))
+            values[u'src_sizeCrcDate'] = bolt.LowerDict()
+            inst = inst_type(inst_name)
+            inst.__setstate__(tuple(values[a] for a in inst_type.persistent))
+            if inst.is_project(): # read it when (if) the project is scanned
+                inst.src_sizeCrcDate = partial(self._load_src, row_key)
+            installers[inst_name] = inst
+            saved[inst_name] = ((row_key, inst_type, crc32(attrs)),
+                                inst.fileSizeCrcs)
+        self._saved = saved
+        return installers, data_files
+
+    def _load_src(self, row_key):
+        """Read the src_sizeCrcDate of a project - may be called from a
+        worker thread, so use a connection of our own."""
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(u'SELECT src_files FROM installers WHERE '
+                                   u'key=?', (row_key,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            deprint(u'Failed to read %s' % self._db_path, traceback=True)
+            row = None
+        if not row or row[0] is None: # will be rescanned
+            return bolt.LowerDict()
+        return bolt.LowerDict((p, (s, c, d)) for p, s, c, d
+                              in marshal.loads(bytes(row[0])))
+
+    @staticmethod
+    def _dump_files(inst):
+        return sqlite3.Binary(marshal.dumps(
+            [(u'%s' % f, s, c) for f, s, c in inst.fileSizeCrcs]))
+
+    @staticmethod
+    def _dump_src(inst):
+        if not inst.is_project(): return None
+        return sqlite3.Binary(marshal.dumps(
+            [(u'%s' % p, s, c, d) for p, (s, c, d)
+             in inst.src_sizeCrcDate.iteritems()]))
+
+    def save(self, installers, data_sizeCrcDate, changed_paths, full=False):
+        """Write the installers that were added or changed since the last
+        load/save, delete the rows of the ones that are gone and write the
+        entries of data_sizeCrcDate for changed_paths - or everything if full
+        is True.
+
+        :param installers: dict mapping names to all installers
+        :param changed_paths: paths relative to the Data dir whose entries in
+            data_sizeCrcDate were added, changed or removed"""
+        # Serialize first - this will also read the caches of any renamed
+        # projects from their old rows, before we delete those
+        inserts, attr_updates, files_updates, saved = [], [], [], {}
+        for name, inst in installers.iteritems():
+            attrs = pickle.dumps(tuple(getattr(inst, a) for a
+                                       in self._attr_names(type(inst))), -1)
+            sig = (name.s.lower(), type(inst), crc32(attrs))
+            saved[name] = (sig, inst.fileSizeCrcs)
+            prev_sig, prev_files = self._saved.get(name, (None, None))
+            if full or prev_sig is None or prev_sig[:2] != sig[:2]:
+                kind = (u'project' if inst.is_project() else u'marker'
+                        if inst.is_marker() else u'archive')
+                inserts.append((sig[0], name.s, kind, sqlite3.Binary(attrs),
+                                self._dump_files(inst), self._dump_src(inst)))
+                continue
+            if prev_sig[2] != sig[2]:
+                attr_updates.append((sqlite3.Binary(attrs), sig[0]))
+            if prev_files is not inst.fileSizeCrcs:
+                files_updates.append((self._dump_files(inst),
+                                      self._dump_src(inst), sig[0]))
+        live_keys = {sig[0] for sig, _files in saved.itervalues()}
+        stale_keys = [(sig[0],) for sig, _files in self._saved.itervalues()
+                      if sig[0] not in live_keys]
+        if full: changed_paths = data_sizeCrcDate.keys()
+        data_upserts, data_deletes = [], []
+        for path in changed_paths:
+            try:
+                size, crc, date = data_sizeCrcDate[path]
+                data_upserts.append(((u'%s' % path).lower(), u'%s' % path,
+                                     size, crc, date))
+            except KeyError:
+                data_deletes.append(((u'%s' % path).lower(),))
+        conn = self._connect()
+        try:
+            with conn: # commits, or rolls back if anything goes wrong
+                if full:
+                    conn.execute(u'DELETE FROM installers')
+                    conn.execute(u'DELETE FROM data_files')
+                conn.execute(u'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                             (u'version', self._schema_version))
+                conn.executemany(u'DELETE FROM installers WHERE key=?',
+                                 stale_keys)
+                conn.executemany(u'INSERT OR REPLACE INTO installers VALUES '
+                                 u'(?, ?, ?, ?, ?, ?)', inserts)
+                conn.executemany(u'UPDATE installers SET attrs=? WHERE '
+                                 u'key=?', attr_updates)
+                conn.executemany(u'UPDATE installers SET files=?, '
+                                 u'src_files=? WHERE key=?', files_updates)
+                conn.executemany(u'DELETE FROM data_files WHERE key=?',
+                                 data_deletes)
+                conn.executemany(u'INSERT OR REPLACE INTO data_files VALUES '
+                                 u'(?, ?, ?, ?, ?)', data_upserts)
+        finally:
+            conn.close()
+        self._saved = saved
@@ -26,7 +26,9 @@
 # TODO: Oblivion only - we need to support rest of games - help needed
 from __future__ import division, print_function
 
+import array
 import io
+import mmap
 from collections import Counter, defaultdict
 from itertools import izip, starmap, repeat
 
@@ -220,6 +222,241 @@ def dumpText(self,saveFile):
                     self.skills))
         return buff.getvalue()
 
+# Change Records --------------------------------------------------------------
+class _ChangeRecords(object):
+    """The change records of a save, as a list of (rec_id, rec_kind, flags,
+    version, data) tuples. Backed by an index of the positions of the records
+    in a memory map of the save - a record is only read when it is accessed
+    and only records that are set or appended are kept as tuples."""
+    _header = structs_cache[u'=IBIBH']
+    _header_size = _header.size
+
+    def __init__(self, save_map=None, records_pos=0, records_num=0,
+                 progress=None):
+        self._map = save_map
+        # The positions and formids of the indexed records (the records of
+        # the save, in order)
+        self._rec_pos = array.array(u'I')
+        self._rec_ids = array.array(u'I')
+        # The indexed record numbers, in the current order of the records -
+        # numbers past the indexed records are appended records
+        self._order = array.array(u'I')
+        self._set = {} # record number -> record tuple, if it was set
+        self._next_num = 0
+        self.edits = 0 # bumped on every change, to validate record indices
+        self.end_pos = records_pos # where the records end in the save
+        if save_map is not None:
+            self._index(records_pos, records_num, progress)
+
+    def _index(self, pos, records_num, progress):
+        unpack_from, header_size = self._header.unpack_from, self._header_size
+        save_map = self._map
+        add_pos, add_id = self._rec_pos.append, self._rec_ids.append
+        for count in xrange(records_num):
+            if not count & 0xFFF and progress is not None:
+                progress(pos, _(u'Reading records...'))
+            header = unpack_from(save_map, pos)
+            add_pos(pos)
+            add_id(header[0])
+            pos += header_size + header[4]
+        self._order = array.array(u'I', xrange(records_num))
+        self._next_num = records_num
+        self.end_pos = pos
+
+    def close(self):
+        """Release the memory map of the save - the records that were not
+        set can't be read anymore."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _record(self, rec_num):
+        try:
+            return self._set[rec_num]
+        except KeyError:
+            pos = self._rec_pos[rec_num]
+            rec_id, rec_kind, rec_flags, version, siz = \
+                self._header.unpack_from(self._map, pos)
+            pos += self._header_size
+            return rec_id, rec_kind, rec_flags, version, self._map[
+                pos:pos + siz]
+
+    def _end(self, rec_num):
+        """Return where the indexed record rec_num ends in the save."""
+        pos = self._rec_pos[rec_num]
+        return pos + self._header_size + self._header.unpack_from(
+            self._map, pos)[4]
+
+    def rec_ids(self):
+        """Iterate over the formids of the records, without reading them."""
+        set_records, indexed_ids = self._set, self._rec_ids
+        for rec_num in self._order:
+            record = set_records.get(rec_num)
+            yield indexed_ids[rec_num] if record is None else record[0]
+
+    def headers(self):
+        """Iterate over the (rec_id, rec_kind, flags, data size) of the
+        records, followed by a buffer and the position of the record data in
+        it - the data of the records of the save is not copied out of the
+        map."""
+        unpack_from, header_size = self._header.unpack_from, self._header_size
+        set_records, rec_pos, save_map = self._set, self._rec_pos, self._map
+        for rec_num in self._order:
+            record = set_records.get(rec_num)
+            if record is None:
+                pos = rec_pos[rec_num]
+                rec_id, rec_kind, rec_flags, _version, siz = unpack_from(
+                    save_map, pos)
+                yield rec_id, rec_kind, rec_flags, siz, save_map, \
+                      pos + header_size
+            else:
+                data = record[4]
+                yield record[0], record[1], record[2], len(data), data, 0
+
+    def __len__(self): return len(self._order)
+
+    def __iter__(self):
+        return (self._record(rec_num) for rec_num in self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(n) for n in self._order[index]]
+        return self._record(self._order[index])
+
+    def __setitem__(self, index, record):
+        self._set[self._order[index]] = tuple(record)
+        self.edits += 1
+
+    def __delitem__(self, index):
+        self._set.pop(self._order[index], None)
+        del self._order[index]
+        self.edits += 1
+
+    def retain(self, indices):
+        """Keep only the records at the specified (ascending) indices."""
+        order = self._order
+        kept = array.array(u'I', (order[i] for i in indices))
+        for rec_num in set(self._set).difference(kept):
+            del self._set[rec_num]
+        self._order = kept
+        self.edits += 1
+
+    def append(self, record):
+        self._order.append(self._next_num)
+        self._set[self._next_num] = tuple(record)
+        self._next_num += 1
+        self.edits += 1
+
+    def dump(self, out):
+        """Write the records to out - runs of consecutive records of the save
+        that were not set are copied straight from it."""
+        pack, set_records = self._header.pack, self._set
+        run_first = run_last = None # indexed record numbers
+        for rec_num in self._order:
+            record = set_records.get(rec_num)
+            if record is None:
+                if run_first is None:
+                    run_first = rec_num
+                elif rec_num != run_last + 1:
+                    out.write(self._map[self._rec_pos[run_first]:self._end(
+                        run_last)])
+                    run_first = rec_num
+                run_last = rec_num
+                continue
+            if run_first is not None:
+                out.write(self._map[self._rec_pos[run_first]:self._end(
+                    run_last)])
+                run_first = None
+            rec_id, rec_kind, rec_flags, version, data = record
+            out.write(pack(rec_id, rec_kind, rec_flags, version, len(data)))
+            out.write(data)
+        if run_first is not None:
+            out.write(self._map[self._rec_pos[run_first]:self._end(run_last)])
+
+# Bloating --------------------------------------------------------------------
+class _BloatAnalysis(object):
+    """The bloat of a save - the created items grouped by signature and name,
+    with the indices of their change records, and the null refs - found in a
+    single pass over the created items and the change record headers. Also
+    keeps the count and size of the created items per signature and of the
+    change records per kind, to show where the size of the save comes from."""
+
+    def __init__(self, save_file, progress):
+        created, records = save_file.created, save_file.records
+        self._created, self._created_len = created, len(created)
+        self._records, self._edits = records, records.edits
+        # (rec_sig, full) -> the created items with that signature and name
+        self.created_groups = defaultdict(list)
+        # (rec_sig, full) -> the indices of the change records of those items
+        self.created_records = defaultdict(list)
+        self.null_refs = array.array(u'I') # indices of the null ref records
+        # rec_sig -> [count, size] of the created items
+        self.created_stats = defaultdict(lambda: [0, 0])
+        # rec_kind -> [count, size] of the change records
+        self.kind_stats = defaultdict(lambda: [0, 0])
+        progress.setFull(len(created) + len(records))
+        progress(0, _(u'Scanning created objects'))
+        fid_key = {}
+        for citem in created:
+            sig_stats = self.created_stats[citem._rec_sig]
+            sig_stats[0] += 1
+            sig_stats[1] += citem.size
+            if u'full' in citem.__class__.__slots__:
+                full = citem.full
+            else:
+                full = citem.getSubString(b'FULL')
+            if full:
+                key = (citem._rec_sig, full)
+                self.created_groups[key].append(citem)
+                fid_key[citem.fid] = key
+        progress(len(created), _(u'Scanning change records.'))
+        fids, kind_stats = save_file.fids, self.kind_stats
+        created_records, add_null_ref = self.created_records, \
+                                        self.null_refs.append
+        unpack_iref = structs_cache[u'I'].unpack_from
+        header_size = _ChangeRecords._header_size
+        for index, (rec_id, rec_kind, rec_flags, siz, buff, data_pos) in \
+                enumerate(records.headers()):
+            if not index & 0xFFF:
+                progress(len(created) + index)
+            rec_stats = kind_stats[rec_kind]
+            rec_stats[0] += 1
+            rec_stats[1] += header_size + siz
+            if rec_id >> 24 != 0xFF: continue
+            key = fid_key.get(rec_id)
+            if key is not None:
+                created_records[key].append(index)
+            if rec_kind == 49 and rec_flags & 2:
+                iref, = unpack_iref(buff, data_pos + 4)
+                if iref >> 24 != 0xFF and fids[iref] == 0:
+                    add_null_ref(index)
+
+    def is_current(self, save_file):
+        """Return True if the created items and the change records of
+        save_file did not change since they were analyzed."""
+        return (self._created is save_file.created and
+                self._created_len == len(save_file.created) and
+                self._records is save_file.records and
+                self._edits == save_file.records.edits)
+
+    def duplicates(self):
+        """Return a Counter of the (rec_sig, full) keys of the created items
+        duplicated enough times to be bloat."""
+        return Counter({k: len(v) for k, v in self.created_groups.iteritems()
+                        if len(v) >= (50, 100)[k[0] == b'ALCH']})
+
+    def largest_created(self, n):
+        """Return the n largest groups of created items, as (rec_sig, full),
+        count tuples."""
+        return Counter({k: len(v) for k, v in self.created_groups.iteritems()
+                        }).most_common(n)
+
+    def largest_kinds(self, n):
+        """Return the n change record kinds taking up the most space, as
+        rec_kind, (count, size) tuples."""
+        return sorted(self.kind_stats.iteritems(), key=lambda x: x[1][1],
+                      reverse=True)[:n]
+
 # Save File -------------------------------------------------------------------
 class SaveFile(object):
     """Represents a Tes4 Save file."""
@@ -249,8 +486,9 @@ def __init__(self,saveInfo=None,canSave=True):
         #--Records, temp effects, fids, worldspaces
         # (rec_id, rec_kind, flags, version, data)
         # rec_kind is an int, rec_id the short formid of the record in the save
-        self.records = []
+        self.records = _ChangeRecords()
         self.fid_recNum = None
+        self.bloat = None # type: _BloatAnalysis | None
         self.tempEffects = None
         self.fids = None
         self.irefs = {}  #--iref = self.irefs[fid]
@@ -259,7 +497,6 @@ def __init__(self,saveInfo=None,canSave=True):
     def load(self,progress=None):
         """Extract info from save file."""
         # TODO: This is Oblivion only code.  Needs to be refactored
-        import array
         with self.fileInfo.abs_path.open(u'rb') as ins:
             #--Progress
             progress = progress or bolt.Progress()
@@ -304,12 +541,9 @@ def insCopy(buff, siz, backSize=0):
                 insCopy(buff, siz, 2)
             self.preRecords = buff.getvalue()
 
-            #--Records
-            for count in xrange(recordsNum):
-                progress(ins.tell(),_(u'Reading records...'))
-                (rec_id, rec_kind, flags, version, siz) = unpack_many(ins,u'=IBIBH')
-                data = ins.read(siz)
-                self.records.append((rec_id,rec_kind,flags,version,data))
+            #--Records - indexed, read on demand
+            self._map_records(ins, ins.tell(), recordsNum, progress)
+            ins.seek(self.records.end_pos)
 
             #--Temp Effects, fids, worldids
             progress(ins.tell(),_(u'Reading fids, worldids...'))
@@ -329,11 +563,22 @@ def insCopy(buff, siz, backSize=0):
         #--Done
         progress(progress.full,_(u'Finished reading.'))
 
+    def _map_records(self, ins, records_pos, records_num, progress=None):
+        """Index the change records in the save open as ins."""
+        self.records.close()
+        self.records = _ChangeRecords(
+            mmap.mmap(ins.fileno(), 0, access=mmap.ACCESS_READ), records_pos,
+            records_num, progress)
+        self.fid_recNum = None
+
     def save(self,outPath=None,progress=None):
         """Save data to file.
-        outPath -- Path of the output file to write to. Defaults to original file path."""
+        outPath -- Path of the output file to write to. Can't be the original
+        file, the change records are read from it - use safeSave for that.
+        Returns the position of the change records in the written file."""
         if not self.canSave: raise StateError(u'Insufficient data to write file.')
-        outPath = outPath or self.fileInfo.getPath()
+        if not outPath or outPath == self.fileInfo.getPath():
+            raise StateError(u'Use safeSave to overwrite the original file.')
         with outPath.open(u'wb') as out:
             def _pack(fmt, *args):
                 out.write(structs_cache[fmt].pack(*args))
@@ -364,9 +609,8 @@ def _pack(fmt, *args):
             out.write(self.preRecords)
             #--Records, temp effects, fids, worldspaces
             progress(0.2,_(u'Writing records.'))
-            for rec_id,rec_kind,flags,version,data in self.records:
-                _pack(u'=IBIBH',rec_id,rec_kind,flags,version,len(data))
-                out.write(data)
+            records_pos = out.tell()
+            self.records.dump(out)
             #--Temp Effects, fids, worldids
             _pack(u'I',len(self.tempEffects))
             out.write(self.tempEffects)
@@ -383,14 +627,21 @@ def _pack(fmt, *args):
             self.worldSpaces.tofile(out)
             #--Done
             progress(1.0,_(u'Writing complete.'))
+        return records_pos
 
     def safeSave(self,progress=None):
         """Save data to file safely."""
         self.fileInfo.makeBackup()
         filePath = self.fileInfo.getPath()
-        self.save(filePath.temp,progress)
+        records_pos = self.save(filePath.temp,progress)
+        # The records are mapped from the old file, which we must release to
+        # replace it - then map them from the new one
+        records_num = len(self.records)
+        self.records.close()
         filePath.untemp()
         self.fileInfo.setmtime()
+        with filePath.open(u'rb') as ins:
+            self._map_records(ins, records_pos, records_num)
 
     def addMaster(self,master):
         """Adds master to masters list."""
@@ -414,7 +665,8 @@ def removeCreated(self,fid):
 
     def indexRecords(self):
         """Fills out self.fid_recNum."""
-        self.fid_recNum = {r[0]: i for i, r in enumerate(self.records)}
+        self.fid_recNum = {rec_id: i for i, rec_id in
+                           enumerate(self.records.rec_ids())}
 
     def getRecord(self,fid,default=None):
         """Returns recNum and record with corresponding fid."""
@@ -576,77 +828,37 @@ def getMaster(modIndex):
                 log(u'%6d %08X %08X %6d kb' % (count,iref,parentid,cumSize//1024))
 
     def findBloating(self,progress=None):
-        """Analyzes file for bloating. Returns (createdCounts,nullRefCount)."""
-        nullRefCount = 0
-        createdCounts = Counter()
-        progress = progress or bolt.Progress()
-        progress.setFull(len(self.created)+len(self.records))
-        #--Created objects
-        progress(0,_(u'Scanning created objects'))
-        for citem in self.created:
-            if u'full' in citem.__class__.__slots__:
-                full = citem.full
-            else:
-                full = citem.getSubString(b'FULL')
-            if full:
-                createdCounts[(citem._rec_sig, full)] += 1
-            progress.plus()
-        for k in list(createdCounts):
-            minCount = (50,100)[k[0] == b'ALCH']
-            if createdCounts[k] < minCount:
-                del createdCounts[k]
-        #--Change records
-        progress(len(self.created),_(u'Scanning change records.'))
-        fids = self.fids
-        for record in self.records:
-            rec_id,rec_kind,rec_flgs,version,data = record
-            if rec_kind == 49 and rec_id >> 24 == 0xFF and (rec_flgs & 2):
-                iref, = struct_unpack(u'I', data[4:8])
-                if iref >> 24 != 0xFF and fids[iref] == 0:
-                    nullRefCount += 1
-            progress.plus()
-        return createdCounts,nullRefCount
+        """Analyzes file for bloating. Returns (createdCounts,nullRefCount).
+        The analysis is kept as self.bloat, for removeBloating and for its
+        created item and change record stats."""
+        self.bloat = _BloatAnalysis(self, progress or bolt.Progress())
+        return self.bloat.duplicates(), len(self.bloat.null_refs)
 
     def removeBloating(self,uncreateKeys,removeNullRefs=True,progress=None):
-        """Removes duplicated created items and null refs."""
-        numUncreated = numUnCreChanged = numUnNulled = 0
-        progress = progress or bolt.Progress()
-        progress.setFull((len(uncreateKeys) and len(self.created))+len(self.records))
-        uncreated = set()
+        """Removes duplicated created items and null refs. Reuses the indices
+        found by findBloating, unless the save changed since."""
+        bloat = self.bloat
+        if bloat is None or not bloat.is_current(self):
+            bloat = _BloatAnalysis(self, progress or bolt.Progress())
         #--Uncreate
-        if uncreateKeys:
-            progress(0,_(u'Scanning created objects'))
-            kept = []
-            for citem in self.created:
-                if u'full' in citem.__class__.__slots__:
-                    full = citem.full
-                else:
-                    full = citem.getSubString(b'FULL')
-                if full and (citem._rec_sig, full) in uncreateKeys:
-                    uncreated.add(citem.fid)
-                    numUncreated += 1
-                else:
-                    kept.append(citem)
-                progress.plus()
-            self.created = kept
+        uncreated = set()
+        removed = set() # indices of the change records to remove
+        for key in uncreateKeys:
+            uncreated.update(id(c) for c in bloat.created_groups.get(key, ()))
+            removed.update(bloat.created_records.get(key, ()))
+        if uncreated:
+            self.created = [c for c in self.created if id(c) not in uncreated]
+        numUncreated, numUnCreChanged = len(uncreated), len(removed)
         #--Change records
-        progress(progress.state,_(u'Scanning change records.'))
-        fids = self.fids
-        kept = []
-        for record in self.records:
-            rec_id,rec_kind,rec_flgs,version,data = record
-            if rec_id in uncreated:
-                numUnCreChanged += 1
-            elif removeNullRefs and rec_kind == 49 and rec_id >> 24 == 0xFF and (rec_flgs & 2):
-                iref, = struct_unpack(u'I', data[4:8])
-                if iref >> 24 != 0xFF and fids[iref] == 0:
-                    numUnNulled += 1
-                else:
-                    kept.append(record)
-            else:
-                kept.append(record)
-            progress.plus()
-        self.records = kept
+        numUnNulled = 0
+        if removeNullRefs:
+            nulled = set(bloat.null_refs).difference(removed)
+            numUnNulled = len(nulled)
+            removed |= nulled
+        if removed:
+            self.records.retain([i for i in xrange(len(self.records)) if
+                                 i not in removed])
+        self.fid_recNum = self.fid_createdNum = self.bloat = None
         return numUncreated,numUnCreChanged,numUnNulled
 
     def getAbomb(self):
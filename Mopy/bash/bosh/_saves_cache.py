@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Save Headers.dat - persistent cache of the save headers (and of their
+downscaled screenshots) of a save profile, so unchanged saves are not opened
+when the Saves tab is populated. Hence the underscore, SaveInfos is the only
+client."""
+
+import marshal
+
+from ..bolt import deprint
+
+class SaveHeadersCache(object):
+    """Maps save names to the cached state of their headers (see
+    SaveFileHeader.dump_cache), as of the size and modification time the save
+    had when its header was read."""
+    _cache_version = 2
+
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        # lowercase save name -> (size, mtime, header state, thumbnail)
+        self._entries = None # loaded on first use
+        self._dirty = False
+
+    def _load(self):
+        self._entries = {}
+        if not self._cache_path.exists(): return
+        try:
+            with self._cache_path.open(u'rb') as ins:
+                cache_ver, entries = marshal.load(ins)
+            if cache_ver == self._cache_version:
+                self._entries = entries
+        except (EOFError, ValueError, TypeError, IOError, OSError):
+            deprint(u'Failed to read %s' % self._cache_path, traceback=True)
+
+    def load(self):
+        """Load the cache now, if it was not loaded yet - before it is used
+        from more than one thread."""
+        self._entries_dict()
+
+    def _entries_dict(self):
+        if self._entries is None: self._load()
+        return self._entries
+
+    def _entry(self, save_info):
+        """Return the cache entry of save_info, or None if it was not cached,
+        is malformed or the save changed since."""
+        entry = self._entries_dict().get(save_info.name.s.lower())
+        if not isinstance(entry, tuple) or len(entry) != 4 or entry[:2] != (
+                save_info.fsize, save_info._file_mod_time):
+            return None
+        return entry
+
+    def get(self, save_info):
+        """Return the cached header state of save_info, or None if it was not
+        cached or the save changed since."""
+        entry = self._entry(save_info)
+        return None if entry is None else entry[2:]
+
+    def put(self, save_info):
+        """Cache the header of save_info, unless it is cached already - with
+        its thumbnail, if the header has one."""
+        header = save_info.header
+        entry = self._entry(save_info)
+        if entry is not None and (entry[3] is not None or
+                                  not header.has_thumbnail): return
+        self._entries_dict()[save_info.name.s.lower()] = (
+            save_info.fsize, save_info._file_mod_time) + header.dump_cache()
+        self._dirty = True
+
+    def discard(self, save_info):
+        """Drop the entry of save_info - its header could not be rebuilt
+        from it."""
+        if self._entries_dict().pop(save_info.name.s.lower(),
+                                    None) is not None:
+            self._dirty = True
+
+    def prune(self, live_keys):
+        """Drop the entries of saves whose (lowercase) names are not in
+        live_keys - they were deleted or renamed."""
+        entries = self._entries_dict()
+        for save_key in set(entries) - live_keys:
+            del entries[save_key]
+            self._dirty = True
+
+    def save(self):
+        """Write the cache if it changed since it was loaded."""
+        if not self._dirty: return
+        with self._cache_path.temp.open(u'wb') as out:
+            marshal.dump((self._cache_version, self._entries), out, 2)
+        self._cache_path.untemp()
+        self._dirty = False
@@ -24,17 +24,21 @@
 
 from __future__ import print_function
 
+import array
 import collections
 import copy
 import errno
 import io
 import os
 import re
+import shutil
 import sys
 import time
+import zipfile
+import zlib
 from binascii import crc32
 from functools import partial, wraps
-from itertools import groupby, imap, izip
+from itertools import chain, groupby, imap, izip
 from operator import itemgetter, attrgetter
 
 from . import imageExts, DataStore, BestIniFile, InstallerConverter, ModInfos
@@ -47,9 +51,67 @@
 from ..exception import AbstractError, ArgumentError, BSAError, CancelError, \
     InstallerArchiveError, SkipError, StateError, FileError
 from ..ini_files import OBSEIniFile
+from ._installers_store import InstallersStore
 
 os_sep = unicode(os.path.sep) # PY3: already unicode
 
+class _FileSizeCrcs(object):
+    """Compact table of the (path, size, crc) tuples of the files in an
+    installer - behaves like the list of tuples it replaces, except that the
+    tuples are created on the fly when iterating. The directory part of the
+    paths is interned and shared between all installers, the file names are
+    stored separately and sizes and crcs are stored in arrays."""
+    __slots__ = (u'_dirs', u'_dir_indices', u'_names', u'_sizes', u'_crcs')
+    # directory (including the final separator) -> itself
+    _interned_dirs = {}
+
+    def __init__(self, files=()):
+        self._fill(files)
+
+    def _fill(self, files, _os_sep=os_sep):
+        # sizes may not fit in 32 bits and 'q' is not available in py2 - a
+        # double is exact up to 2**53
+        self._dirs, self._names = [], []
+        self._dir_indices, self._sizes, self._crcs = (
+            array.array(u'I'), array.array(u'd'), array.array(u'I'))
+        dir_index = {}
+        intern_dir = self._interned_dirs.setdefault
+        dirs_append, names_append = self._dirs.append, self._names.append
+        indices_append = self._dir_indices.append
+        sizes_append, crcs_append = self._sizes.append, self._crcs.append
+        for full, size, crc in files:
+            file_dir, sep, file_name = full.rpartition(_os_sep)
+            file_dir += sep
+            try:
+                indices_append(dir_index[file_dir])
+            except KeyError:
+                dir_index[file_dir] = len(self._dirs)
+                indices_append(len(self._dirs))
+                dirs_append(intern_dir(file_dir, file_dir))
+            names_append(file_name)
+            sizes_append(size)
+            crcs_append(crc)
+
+    def __iter__(self):
+        dirs = self._dirs
+        for dir_idx, file_name, size, crc in izip(
+                self._dir_indices, self._names, self._sizes, self._crcs):
+            yield dirs[dir_idx] + file_name, int(size), crc
+
+    def __len__(self): return len(self._names)
+
+    def __getitem__(self, i):
+        return self._dirs[self._dir_indices[i]] + self._names[i], int(
+            self._sizes[i]), self._crcs[i]
+
+    def sort(self, key=None):
+        self._fill(sorted(self, key=key))
+
+    def __reduce__(self):
+        return _FileSizeCrcs, (list(self),)
+
+    def __repr__(self): return u'%s(%r)' % (type(self).__name__, list(self))
+
 class Installer(object):
     """Object representing an installer archive, its user configuration, and
     its installation state."""
@@ -66,7 +128,9 @@ class Installer(object):
         u'espmMap', u'hasReadme', u'hasBCF', u'hasBethFiles',
         u'_dir_dirs_files', u'has_fomod_conf')
 
-    __slots__ = persistent + volatile
+    # src_sizeCrcDate is a property, so that it can be loaded lazily
+    __slots__ = tuple(x for x in persistent if x != u'src_sizeCrcDate') + \
+                volatile + (u'_src_sizeCrcDate',)
     #--Package analysis/porting.
     type_string = _(u'Unrecognized')
     docDirs = {u'screenshots'}
@@ -188,7 +252,7 @@ def initDefault(self):
         self.crc = 0 #--crc of archive
         self.isSolid = False #--package only - solid 7z archive
         self.blockSize = None #--package only - set here and there
-        self.fileSizeCrcs = [] #--list of tuples for _all_ files in installer
+        self.fileSizeCrcs = _FileSizeCrcs() #--(path, size, crc) of _all_ files
         #--For InstallerProject's, cache if refresh projects is skipped
         self.src_sizeCrcDate = bolt.LowerDict()
         #--Set by refreshBasic
@@ -239,6 +303,19 @@ def initDefault(self):
     @property
     def num_of_files(self): return len(self.fileSizeCrcs)
 
+    @property
+    def src_sizeCrcDate(self):
+        """For InstallerProject's, the cache of the sizes, crcs and dates of
+        the project's files. InstallersStore sets it to a callable that reads
+        the cache from Installers.db, which we call on first access."""
+        if callable(self._src_sizeCrcDate):
+            self._src_sizeCrcDate = self._src_sizeCrcDate()
+        return self._src_sizeCrcDate
+
+    @src_sizeCrcDate.setter
+    def src_sizeCrcDate(self, src_sizeCrcDate):
+        self._src_sizeCrcDate = src_sizeCrcDate
+
     @staticmethod
     def number_string(number, marker_string=u''):
         return unicode(number)
@@ -302,12 +379,17 @@ def __getstate__(self):
         return tuple(getter(self,x) for x in self.persistent)
 
     def _fixme_drop__for_loading_in_previous_versions(self):
-        self.src_sizeCrcDate = {GPath(x): y for x, y # FIXME: backwards compat!
-                                in self.src_sizeCrcDate.iteritems()}
-        self.dirty_sizeCrc = {GPath(x): y for x, y
-                              in self.dirty_sizeCrc.iteritems()}
-        self.fileSizeCrcs = [(unicode(x), y, z) for x, y, z in
-                             self.fileSizeCrcs]
+        """Return the persistent attributes as pickled by previous versions
+        - copies, ours (and the caches keyed on them) are left alone."""
+        pickled = { # FIXME: backwards compat!
+            u'src_sizeCrcDate': {GPath(x): y for x, y
+                                 in self.src_sizeCrcDate.iteritems()},
+            u'dirty_sizeCrc': {GPath(x): y for x, y
+                               in self.dirty_sizeCrc.iteritems()},
+            u'fileSizeCrcs': [(unicode(x), y, z) for x, y, z in
+                              self.fileSizeCrcs]}
+        return tuple(pickled[a] if a in pickled else getattr(self, a) for a
+                     in self.persistent)
 
     def _fixme_drop__fomod_backwards_compat(self):
         # Keys and values in the fomod dict got inverted, name changed to
@@ -347,6 +429,8 @@ def __setstate(self,values):
         elif self.fileRootIdex and not self.extras_dict.get('root_path', u''):
             rescan = True ##: for people that used my wip branch, drop on 307
         self.extras_dict = {unicode(k): v for k, v in self.extras_dict.iteritems()}
+        if not isinstance(self.fileSizeCrcs, _FileSizeCrcs):
+            self.fileSizeCrcs = _FileSizeCrcs(self.fileSizeCrcs)
         if not self.abs_path.exists(): # pickled installer deleted outside bash
             return  # don't do anything should be deleted from our data soon
         if not isinstance(self.src_sizeCrcDate, bolt.LowerDict):
@@ -381,10 +465,19 @@ def __copy__(self):
     _silentSkipsEnd = (u'thumbs.db', u'desktop.ini', u'meta.ini', u'config',
                        u'__folder_managed_by_vortex')
 
-    # global skips that can be overridden en masse by the installer
+    # global skips that can be overridden en masse by the installer - regex
+    # patterns matched against the start of 'fileLower', see _init_skips
     _global_skips = []
     _global_start_skips = []
     _global_skip_extensions = set()
+    # the match methods of the compiled skip regexes, keyed by their patterns
+    _skip_matchers = {}
+    # bumped when anything refreshDataSizeCrc results depend on, other than
+    # the installer attributes and the settings read there, changes
+    _skips_generation = 0
+    # the results of the last few refreshDataSizeCrc calls, keyed by archive
+    _dest_src_memo = collections.OrderedDict()
+    _dest_src_memo_size = 16
     # executables - global but if not skipped need additional processing
     _executables_ext = {u'.dll', u'.dlx'} | {u'.asi'} | {u'.jar'}
     _executables_process = {}
@@ -392,12 +485,14 @@ def __copy__(self):
     @staticmethod
     def goodDlls(force_recalc=False):
         if Installer._goodDlls is None or force_recalc:
+            Installer._skips_generation += 1
             Installer._goodDlls = collections.defaultdict(list,
                 bass.settings[u'bash.installers.goodDlls'])
         return Installer._goodDlls
     @staticmethod
     def badDlls(force_recalc=False):
         if Installer._badDlls is None or force_recalc:
+            Installer._skips_generation += 1
             Installer._badDlls = collections.defaultdict(list,
                 bass.settings[u'bash.installers.badDlls'])
         return Installer._badDlls
@@ -407,9 +502,11 @@ def badDlls(force_recalc=False):
 
     @staticmethod
     def init_global_skips():
-        """Update _global_skips with functions deciding if 'fileLower' (docs !)
+        """Update _global_skips with patterns deciding if 'fileLower' (docs !)
         must be skipped, based on global settings. Should be updated on boot
         and on flipping skip settings - and nowhere else hopefully."""
+        Installer._skips_generation += 1
+        Installer._skip_matchers.clear()
         del Installer._global_skips[:]
         del Installer._global_start_skips[:]
         Installer._global_skip_extensions.clear()
@@ -436,9 +533,9 @@ def init_global_skips():
         if skipAllTextures:
             Installer._global_start_skips.append(tex_gen)
         elif skipLODTextures: Installer._global_skips.append(
-            lambda f: f.startswith(tex_gen) and not f.endswith(u'_fn.dds'))
+            re.escape(tex_gen) + u'(?!.*_fn\\.dds$)')
         elif skipLODNormals: Installer._global_skips.append(
-            lambda f: f.startswith(tex_gen) and f.endswith(u'_fn.dds'))
+            re.escape(tex_gen) + u'.*_fn\\.dds$')
         # Skipped extensions
         skipObse = not bass.settings[u'bash.installers.allowOBSEPlugins']
         if skipObse:
@@ -530,6 +627,10 @@ def _remap_espms(self, fileLower, full, fileExt, file_relative, sub):
         Installer._extensions_to_process = set(Installer._attributes_process)
 
     def _init_skips(self):
+        """Return the match method of a regex telling if 'fileLower' must be
+        skipped (or None if nothing is) and the extensions to skip. The regex
+        combines the global and this installer's skips - it is compiled once
+        per distinct combination, so checking a file is a single call."""
         voice_dir = os_sep.join((u'sound', u'voice')) + os_sep
         start = [voice_dir] if self.skipVoices else []
         skips, skip_ext = [], set()
@@ -537,15 +638,20 @@ def _init_skips(self):
             skips = list(Installer._global_skips)
             start.extend(Installer._global_start_skips)
             skip_ext = Installer._global_skip_extensions
-        if start: skips.append(lambda f: f.startswith((tuple(start))))
-        skipEspmVoices = not self.skipVoices and {x.cs for x in self.espmNots}
-        if skipEspmVoices:
-            def _skip_espm_voices(fileLower):
-                farPos = fileLower.startswith( # u'sound\\voice\\', 12 chars
-                    voice_dir) and fileLower.find(os_sep, 12)
-                return farPos > 12 and fileLower[12:farPos] in skipEspmVoices
-            skips.append(_skip_espm_voices)
-        return skips, skip_ext
+        if start: skips.append(u'|'.join(imap(re.escape, start)))
+        skipEspmVoices = not self.skipVoices and sorted(
+            {x.cs for x in self.espmNots})
+        if skipEspmVoices: # sound\voice\<skipped espm>\...
+            skips.append(u'%s(?:%s)%s' % (re.escape(voice_dir), u'|'.join(
+                imap(re.escape, skipEspmVoices)), re.escape(os_sep)))
+        if not skips: return None, skip_ext
+        skips = tuple(skips)
+        try:
+            skip_match = Installer._skip_matchers[skips]
+        except KeyError:
+            skip_match = Installer._skip_matchers[skips] = re.compile(
+                u'|'.join(u'(?:%s)' % p for p in skips), re.U).match
+        return skip_match, skip_ext
 
     @staticmethod
     def _init_executables_skips():
@@ -561,9 +667,11 @@ def __skipExecutable(checkOBSE, fileLower, full, archiveRoot, dll_size,
             message = Installer._dllMsg(fileLower, full, archiveRoot,
                                         desc, ext, badDlls, goodDlls)
             if not balt.askYes(balt.Link.Frame,message, dialogTitle):
+                Installer._skips_generation += 1
                 badDlls[fileLower].append([archiveRoot, dll_size, crc])
                 bass.settings[u'bash.installers.badDlls'] = Installer._badDlls
                 return True
+            Installer._skips_generation += 1
             goodDlls[fileLower].append([archiveRoot, dll_size, crc])
             bass.settings[u'bash.installers.goodDlls'] = Installer._goodDlls
             return False
@@ -649,7 +757,7 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
         unSize = 0
         bethFiles = bush.game.bethDataFiles
         strings_exts = self._strings_extensions
-        skips, global_skip_ext = self._init_skips()
+        skip_match, global_skip_ext = self._init_skips()
         if self.overrideSkips:
             ##: We should split this - Override Skips & Override Redirects
             renameStrings = False
@@ -692,6 +800,20 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
         fm_active = self.extras_dict.get(u'fomod_active', False)
         fm_dict = self.extras_dict.get(u'fomod_dict', {})
         module_config = os.path.join(u'fomod', u'moduleconfig.xml')
+        # checkOBSE may pop up dialogs - always run the full scan for it
+        memo_sig = None if checkOBSE else (
+            bain_type, self.overrideSkips, self.skipVoices, hasExtraData,
+            tuple(self.subNames), tuple(self.subActives),
+            frozenset(self.espmNots), frozenset(self.remaps.iteritems()),
+            root_path, fm_active, frozenset(fm_dict.iteritems()),
+            renameStrings, bethFilesSkip, redirect_scripts, languageLower,
+            bass.settings[u'bash.installers.skipDocs'],
+            bass.settings[u'bash.installers.autoRefreshBethsoft'],
+            Installer._skips_generation)
+        if memo_sig is not None:
+            memo_dest_src = self._recall_dest_src(memo_sig)
+            if memo_dest_src is not None: return memo_dest_src
+        tracked = []
         for full,size,crc in self.fileSizeCrcs:
             if rootIdex: # exclude all files that are not under root_dir
                 if not full.startswith(root_path): continue
@@ -766,12 +888,7 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
             if len(rootLower) == 1: rootLower = u''
             else: rootLower = rootLower[0]
             #--Skips
-            for lam in skips:
-                if lam(fileLower):
-                    _out = True
-                    break
-            else: _out = False
-            if _out: continue
+            if skip_match is not None and skip_match(fileLower): continue
             dest = None # destination of the file relative to the Data/ dir
             # process attributes and define destination for docs and images
             # (if not skipped globally)
@@ -812,12 +929,59 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
                 data_sizeCrc, archiveRoot, renameStrings, languageLower,
                 redirect_scripts)
             if fileExt in commonlyEditedExts: ##: will track all the txt files in Docs/
-                InstallersData.track(bass.dirs[u'mods'].join(dest))
+                tracked.append(dest)
             #--Save
             data_sizeCrc[dest] = (size,crc)
             dest_src[dest] = full
             unSize += size
         self.unSize = unSize
+        if memo_sig is not None:
+            self._memoize_dest_src(memo_sig, dest_src, data_sizeCrc, tracked)
+        self._set_dest_sizeCrc(data_sizeCrc, tracked)
+        #--Done (return dest_src for install operation)
+        return dest_src
+
+    # attributes refreshDataSizeCrc sets as a side effect, memoized along its
+    # results - hasBethFiles is never reset, so is only ever set to True
+    _memo_attrs = (u'has_fomod_conf', u'hasWizard', u'hasBCF', u'hasReadme',
+                   u'packageDoc', u'packagePic', u'hasBethFiles', u'unSize')
+    _memo_sets = (u'skipExtFiles', u'skipDirFiles', u'espms')
+
+    def _memoize_dest_src(self, memo_sig, dest_src, data_sizeCrc, tracked):
+        memo = Installer._dest_src_memo
+        memo.pop(self.archive, None)
+        memo[self.archive] = (memo_sig, self.fileSizeCrcs, dest_src.copy(),
+            data_sizeCrc, tracked,
+            tuple(getattr(self, a) for a in self._memo_attrs),
+            tuple(set(getattr(self, a)) for a in self._memo_sets),
+            [(k, list(v)) for k, v in self.espmMap.iteritems()])
+        while len(memo) > Installer._dest_src_memo_size:
+            memo.popitem(last=False)
+
+    def _recall_dest_src(self, memo_sig):
+        """Return a copy of the dest_src of the last refreshDataSizeCrc call
+        if neither our files nor anything else it depends on (memo_sig)
+        changed since, restoring the attributes it set - else None."""
+        try:
+            (sig, files, dest_src, data_sizeCrc, tracked, attrs, sets,
+             espm_map) = Installer._dest_src_memo[self.archive]
+        except KeyError:
+            return None
+        if files is not self.fileSizeCrcs or sig != memo_sig:
+            return None
+        for a, v in izip(self._memo_attrs, attrs):
+            if a != u'hasBethFiles': setattr(self, a, v)
+            elif v: self.hasBethFiles = True
+        for a, v in izip(self._memo_sets, sets):
+            getattr(self, a).update(v) # cleared by refreshDataSizeCrc
+        self.espmMap = bolt.DefaultLowerDict(list, ((k, list(v)) for k, v
+                                                    in espm_map))
+        self._set_dest_sizeCrc(data_sizeCrc, tracked)
+        return dest_src.copy()
+
+    def _set_dest_sizeCrc(self, data_sizeCrc, tracked):
+        for dest in tracked:
+            InstallersData.track(bass.dirs[u'mods'].join(dest))
         (self.ci_dest_sizeCrc, old_sizeCrc) = (data_sizeCrc, self.ci_dest_sizeCrc)
         #--Update dirty?
         if self.is_active and data_sizeCrc != old_sizeCrc:
@@ -825,8 +989,6 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
             for filename,sizeCrc in old_sizeCrc.iteritems():
                 if filename not in dirty_sizeCrc and sizeCrc != data_sizeCrc.get(filename):
                     dirty_sizeCrc[filename] = sizeCrc
-        #--Done (return dest_src for install operation)
-        return dest_src
 
     def _find_root_index(self, _os_sep=os_sep, skips_start=_silentSkipsStart):
         # basically just care for skips and complex/simple packages
@@ -925,13 +1087,28 @@ def _remap_files(self, dest, fileLower, rootLower, fileExt, file_relative,
     def refreshBasic(self, progress, recalculate_project_crc=True):
         return self._refreshBasic(progress, recalculate_project_crc)
 
-    def _refreshBasic(self, progress, recalculate_project_crc=True,
-                      _os_sep=os_sep, skips_start=tuple(
-                s.replace(os_sep, u'') for s in _silentSkipsStart)):
+    def _refreshBasic(self, progress, recalculate_project_crc=True):
         """Extract file/size/crc and BAIN structure info from installer."""
+        return self.apply_scan(
+            self.scan_source(progress, recalculate_project_crc))
+
+    def scan_source(self, progress, recalculate_project_crc=True):
+        """First, I/O bound, stage of refreshBasic - list the archive or walk
+        the project directory. Touches nothing but self, so it may run on a
+        worker thread (pass a bolt.ThreadProgress in that case). Returns
+        False if the installer could not be read."""
         try:
             self._refreshSource(progress, recalculate_project_crc)
+            return True
         except InstallerArchiveError:
+            return False
+
+    def apply_scan(self, scan_ok, _os_sep=os_sep, skips_start=tuple(
+            s.replace(os_sep, u'') for s in _silentSkipsStart)):
+        """Second stage of refreshBasic - calculate BAIN structure info and
+        refresh ci_dest_sizeCrc from the result of scan_source. Must run on
+        the main thread."""
+        if not scan_ok:
             self.type = -1 # size, modified and some of fileSizeCrcs may be set
             return bolt.LowerDict()
         self._find_root_index()
@@ -1094,6 +1271,8 @@ def _do_sync_data(self, proj_dir, delta_files, progress):
                 full_dest.remove()
                 del_numb += 1
             else:
+                # full_src may be a link to full_dest - break it first
+                full_dest.remove()
                 full_src.copyTo(full_dest)
                 upt_numb += 1
         if upt_numb or del_numb:
@@ -1165,16 +1344,16 @@ def install(self, destFiles, progress=None):
     def _install(self, dest_src, progress):
         raise AbstractError
 
-    def _fs_install(self, dest_src, srcDirJoin, progress,
-                    subprogressPlus, unpackDir):
-        """Filesystem install, if unpackDir is not None we are installing
-         an archive."""
+    def _install_targets(self, dest_src):
+        """Return the data_sizeCrcDate entries of the files in dest_src, the
+        plugins, ini tweaks and bsas among them and the absolute paths they
+        should be installed to, in dest_src order."""
         norm_ghostGet = Installer.getGhosted().get
         data_sizeCrcDate_update = bolt.LowerDict()
         data_sizeCrc = self.ci_dest_sizeCrc
         mods, inis, bsas = set(), set(), set()
-        source_paths, dests = [], []
-        add_source, add_dest = source_paths.append, dests.append
+        dests = []
+        add_dest = dests.append
         installer_plugins = self.espms
         is_ini_tweak = InstallersData._is_ini_tweak
         join_data_dir = bass.dirs[u'mods'].join
@@ -1191,20 +1370,50 @@ def _fs_install(self, dest_src, srcDirJoin, progress,
             elif dest_path.cext == bsa_ext:
                 bsas.add(dest_path)
             data_sizeCrcDate_update[dest] = (size, crc, -1) ##: HACK we must try avoid stat'ing the mtime
-            add_source(srcDirJoin(src))
             # Append the ghost extension JIT since the FS operation below will
             # need the exact path to copy to
             add_dest(join_data_dir(norm_ghostGet(dest, dest)))
-            subprogressPlus()
+        return data_sizeCrcDate_update, mods, inis, bsas, dests
+
+    def _fs_install(self, dest_src, srcDirJoin, progress, subprogress,
+                    unpackDir, link=False):
+        """Filesystem install, if unpackDir is not None we are installing
+         an archive. subprogress reports the bytes copied (or moved). If
+         link is True, link the files instead of copying them if possible."""
+        data_sizeCrcDate_update, mods, inis, bsas, dests = \
+            self._install_targets(dest_src)
+        data_sizeCrc = self.ci_dest_sizeCrc
+        source_paths = [srcDirJoin(src) for src in dest_src.itervalues()]
         #--Now Move
+        linked = ()
+        # timestamp games keep the load order in the plugins' modification
+        # times, a plugin linked to its project file would share them
+        no_link_exts = frozenset() if bush.game.using_txt_file else \
+            bush.game.espm_extensions | {u'.ghost'}
         try:
             if data_sizeCrcDate_update:
-                fs_operation = env.shellMove if unpackDir else env.shellCopy
-                fs_operation(source_paths, dests, progress.getParent())
+                # copy in parallel, leave anything that failed (UAC...) to
+                # the shell
+                failed, linked = env.copy_files(
+                    source_paths, dests, move=bool(unpackDir), link=link,
+                    progress=subprogress, no_link_exts=no_link_exts)
+                if failed:
+                    fs_operation = env.shellMove if unpackDir else \
+                        env.shellCopy
+                    fs_operation(*izip(*failed), parent=progress.getParent())
         finally:
             #--Clean up unpack dir if we're an archive
             if unpackDir: bass.rmTempDir()
-        #--Update Installers data
+        #--Update Installers data - linked files share the modification time
+        # of the project files, so no need to stat them
+        if linked:
+            linked = {d for _s, d in linked}
+            src_get = self.src_sizeCrcDate.get
+            for (dest, src), dest_path in izip(dest_src.iteritems(), dests):
+                src_entry = src_get(src)
+                if dest_path in linked and src_entry:
+                    size, crc = data_sizeCrc[dest]
+                    data_sizeCrcDate_update[dest] = (size, crc, src_entry[2])
         return data_sizeCrcDate_update, mods, inis, bsas
 
     def listSource(self):
@@ -1250,9 +1459,8 @@ def __init__(self,archive):
 
     def __reduce__(self):
         from . import InstallerMarker as boshInstallerMarker
-        self._fixme_drop__for_loading_in_previous_versions()
-        return boshInstallerMarker, (GPath(self.archive),), tuple(
-            imap(self.__getattribute__, self.persistent))
+        return boshInstallerMarker, (GPath(self.archive),), \
+               self._fixme_drop__for_loading_in_previous_versions()
 
     @property
     def num_of_files(self): return -1
@@ -1296,9 +1504,8 @@ def is_archive(cls): return True
 
     def __reduce__(self):
         from . import InstallerArchive as boshInstallerArchive
-        self._fixme_drop__for_loading_in_previous_versions()
-        return boshInstallerArchive, (GPath(self.archive),), tuple(
-            imap(self.__getattribute__, self.persistent))
+        return boshInstallerArchive, (GPath(self.archive),), \
+               self._fixme_drop__for_loading_in_previous_versions()
 
     #--File Operations --------------------------------------------------------
     def _refreshSource(self, progress, recalculate_project_crc):
@@ -1327,15 +1534,18 @@ def _parse_archive_line(key, value):
             try:
                 list_archive(tempArch, _parse_archive_line)
                 self.crc = _li.cumCRC & 0xFFFFFFFF
+                self.fileSizeCrcs = _FileSizeCrcs(fileSizeCrcs)
             except:
                 archive_msg = u"Unable to read archive '%s'." % self.abs_path
                 deprint(archive_msg, traceback=True)
                 raise InstallerArchiveError(archive_msg)
 
-    def unpackToTemp(self, fileNames, progress=None, recurse=False):
+    def unpackToTemp(self, fileNames, progress=None, recurse=False,
+                     temp_parent=None):
         """Erases all files from self.tempDir and then extracts specified files
         from archive to self.tempDir. progress will be zeroed so pass a
-        SubProgress in.
+        SubProgress in. If temp_parent is given the new temp dir is created
+        in there, if possible.
         fileNames: File names (not paths)."""
         if not fileNames: raise ArgumentError(
             u'No files to extract for %s.' % self.archive)
@@ -1345,6 +1555,12 @@ def unpackToTemp(self, fileNames, progress=None, recurse=False):
             out.write(u'\n'.join(fileNames))
         #--Ensure temp dir empty
         bass.rmTempDir()
+        if temp_parent is not None:
+            try:
+                bass.newTempDir(temp_parent=temp_parent)
+            except OSError: # probably UAC, getTempDir will use the default
+                deprint(u'Failed to create a temp dir in %s' % temp_parent,
+                        traceback=True)
         with self.abs_path.unicodeSafe() as arch:
             if progress:
                 progress.state = 0
@@ -1360,19 +1576,91 @@ def unpackToTemp(self, fileNames, progress=None, recurse=False):
         #--Done -> don't clean out temp dir, it's going to be used soon
         return unpack_dir
 
+    _zip_methods = {zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED}
+
     def _install(self, dest_src, progress):
-        #--Extract
+        if self.abs_path.cext == u'.zip':
+            installed = self._install_from_zip(dest_src, progress)
+            if installed is not None: return installed
         progress(0, self.archive + u'\n' + _(u'Extracting files...'))
-        unpackDir = self.unpackToTemp(dest_src.values(),
-                                      SubProgress(progress, 0, 0.9))
+        try:
+            #--Extract next to the Data folder, so that moving the files to
+            # their destinations is just a rename
+            unpackDir = self.unpackToTemp(dest_src.values(),
+                SubProgress(progress, 0, 0.9),
+                temp_parent=bass.dirs[u'mods'].head)
+        except:
+            bass.rmTempDir()
+            raise
         #--Rearrange files
         progress(0.9, self.archive + u'\n' + _(u'Organizing files...'))
         srcDirJoin = unpackDir.join
         subprogress = SubProgress(progress,0.9,1.0)
-        subprogress.setFull(len(dest_src))
-        subprogressPlus = subprogress.plus
-        return self._fs_install(dest_src, srcDirJoin, progress,
-                                subprogressPlus, unpackDir)
+        return self._fs_install(dest_src, srcDirJoin, progress, subprogress,
+                                unpackDir)
+
+    def _install_from_zip(self, dest_src, progress):
+        """Stream the files in dest_src from our archive straight to their
+        destinations in the Data folder, in one pass - no temp files. Return
+        None if zipfile can't read the files we need (encrypted, compressed
+        with something other than deflate, or their names were decoded
+        differently by 7z), else what _fs_install returns. Files that can't
+        be written (UAC, locked or read only files) are extracted to a temp
+        dir instead and handed to the shell to move in place."""
+        try:
+            zip_file = zipfile.ZipFile(self.abs_path.s)
+        except (zipfile.BadZipfile, EnvironmentError):
+            return None
+        with zip_file:
+            members = bolt.LowerDict()
+            for info in zip_file.infolist():
+                zip_name = info.filename
+                if not isinstance(zip_name, unicode): # not flagged as utf8
+                    try:
+                        zip_name = zip_name.decode(u'utf8')
+                    except UnicodeDecodeError:
+                        zip_name = zip_name.decode(u'cp437')
+                members[zip_name.replace(u'/', os_sep)] = info
+            try:
+                infos = [members[src] for src in dest_src.itervalues()]
+            except KeyError:
+                return None
+            if any(i.flag_bits & 0x1 or i.compress_type not in
+                   self._zip_methods for i in infos):
+                return None
+            data_sizeCrcDate_update, mods, inis, bsas, dests = \
+                self._install_targets(dest_src)
+            progress(0, self.archive + u'\n' + _(u'Extracting files...'))
+            progress.setFull(max(sum(i.file_size + 1 for i in infos), 1))
+            done = 0
+            failed = []
+            for src, info, dest in izip(dest_src.itervalues(), infos, dests):
+                try:
+                    dest.remove() # in case it's a link, see env.copy_files
+                    with zip_file.open(info) as ins:
+                        with dest.open(u'wb') as out:
+                            shutil.copyfileobj(ins, out, 1048576)
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    os.utime(dest.s, (mtime, mtime))
+                except (zipfile.BadZipfile, zlib.error) as e:
+                    raise StateError(u'%s: Extraction failed:\n%s' % (
+                        self.archive, e))
+                except EnvironmentError as e:
+                    deprint(u'Failed to extract %s to %s: %r' % (
+                        src, dest, e))
+                    failed.append((src, dest))
+                done += info.file_size + 1
+                progress(done)
+        if failed: # leave those to the shell, as _fs_install does
+            try:
+                unpack_dir = self.unpackToTemp([src for src, _d in failed],
+                    temp_parent=bass.dirs[u'mods'].head)
+                env.shellMove([unpack_dir.join(src) for src, _d in failed],
+                              [dest for _s, dest in failed],
+                              parent=progress.getParent())
+            finally:
+                bass.rmTempDir()
+        return data_sizeCrcDate_update, mods, inis, bsas
 
     def unpackToProject(self, project, progress=None):
         """Unpacks archive to build directory."""
@@ -1492,9 +1780,8 @@ def is_project(cls): return True
 
     def __reduce__(self):
         from . import InstallerProject as boshInstallerProject
-        self._fixme_drop__for_loading_in_previous_versions()
-        return boshInstallerProject, (GPath(self.archive),), tuple(
-            imap(self.__getattribute__, self.persistent))
+        return boshInstallerProject, (GPath(self.archive),), \
+               self._fixme_drop__for_loading_in_previous_versions()
 
     def _refresh_from_project_dir(self, progress=None,
                                   recalculate_all_crcs=False):
@@ -1577,24 +1864,23 @@ def _refreshSource(self, progress, recalculate_project_crc):
         cumCRC = 0
 ##        cumDate = 0
         cumSize = 0
-        fileSizeCrcs = self.fileSizeCrcs = []
+        fileSizeCrcs = []
         for path, (size, crc, date) in self.src_sizeCrcDate.iteritems():
             fileSizeCrcs.append((path, size, crc))
 ##            cumDate = max(date,cumDate)
             cumCRC += crc
             cumSize += size
+        self.fileSizeCrcs = _FileSizeCrcs(fileSizeCrcs)
         self.fsize = cumSize
         self.crc = cumCRC & 0xFFFFFFFF
         self.project_refreshed = True
 
     def _install(self, dest_src, progress):
-        progress.setFull(len(dest_src))
         progress(0, self.archive + u'\n' + _(u'Moving files...'))
-        progressPlus = progress.plus
-        #--Copy Files
+        #--Copy (or link) Files
         srcDirJoin = self.abs_path.join
-        return self._fs_install(dest_src, srcDirJoin, progress, progressPlus,
-                                None)
+        return self._fs_install(dest_src, srcDirJoin, progress, progress,
+            None, link=bass.settings[u'bash.installers.linkProjects'])
 
     def sync_from_data(self, delta_files, progress):
         return self._do_sync_data(self.abs_path, delta_files, progress)
@@ -1640,6 +1926,168 @@ def _projects_walk_cache_wrapper(self, *args, **kwargs):
                     project._dir_dirs_files = None
     return _projects_walk_cache_wrapper
 
+#------------------------------------------------------------------------------
+class _TrackedSizeCrcDate(bolt.LowerDict):
+    """LowerDict mapping paths relative to the Data dir to (size, crc, date)
+    tuples, that records the paths whose presence or (size, crc) changed, so
+    that only installers owning those paths have their status recalculated.
+    Also records the paths whose entries changed in any way since the last
+    save, so that only those are written to Installers.db."""
+    __slots__ = (u'changed_paths', u'_cleared', u'unsaved_paths')
+
+    def __init__(self, mapping=(), **kwargs):
+        super(_TrackedSizeCrcDate, self).__init__(mapping, **kwargs)
+        self.changed_paths = set()
+        # entries removed by clear() - Installer.final_update clears and
+        # refills us, so compare against those rather than mark everything
+        self._cleared = {}
+        self.unsaved_paths = set()
+
+    def __setitem__(self, k, v):
+        old = self.get(k)
+        if old != v: self.unsaved_paths.add(bolt.CIstr(k))
+        if old is None: old = self._cleared.get(bolt.CIstr(k))
+        if old is None or old[:2] != v[:2]:
+            self.changed_paths.add(bolt.CIstr(k))
+        super(_TrackedSizeCrcDate, self).__setitem__(k, v)
+
+    def __delitem__(self, k):
+        super(_TrackedSizeCrcDate, self).__delitem__(k)
+        self.changed_paths.add(bolt.CIstr(k))
+        self.unsaved_paths.add(bolt.CIstr(k))
+
+    __no_default = object()
+    def pop(self, k, v=__no_default):
+        if k in self:
+            self.changed_paths.add(bolt.CIstr(k))
+            self.unsaved_paths.add(bolt.CIstr(k))
+        elif v is not _TrackedSizeCrcDate.__no_default:
+            return v
+        return super(_TrackedSizeCrcDate, self).pop(k)
+
+    def update(self, mapping=(), **kwargs):
+        for k, v in self._process_args(mapping, **kwargs):
+            self[k] = v
+
+    def setdefault(self, k, default=None):
+        if k not in self: self[k] = default
+        return self[k]
+
+    def clear(self):
+        for k, v in self.iteritems():
+            self._cleared.setdefault(k, v)
+            self.unsaved_paths.add(k)
+        super(_TrackedSizeCrcDate, self).clear()
+
+    def pop_changed(self):
+        """Return the paths changed since the last call and reset them."""
+        changed, self.changed_paths = self.changed_paths, set()
+        changed.update(k for k in self._cleared if k not in self)
+        self._cleared = {}
+        return changed
+
+    def pop_unsaved(self):
+        """Return the paths changed since the last call and reset them -
+        unlike pop_changed, changes in the modification date count too."""
+        unsaved, self.unsaved_paths = self.unsaved_paths, set()
+        return unsaved
+
+class _DestinationsIndex(object):
+    """Inverted index mapping the destination paths (relative to the Data
+    dir) of all installers to the installers that would install them, along
+    with the (size, crc) of the file each one provides. Installers are
+    reindexed on sync, when their ci_dest_sizeCrc has been replaced (which
+    refreshDataSizeCrc always does), so that only the entries of the changed
+    installers are touched. Changes are accumulated till pop_changes is
+    called."""
+
+    def __init__(self):
+        # path -> {installer: (size, crc)}
+        self._path_owners = bolt.DefaultLowerDict(dict)
+        # installer -> (ci_dest_sizeCrc, order, is_active, type) as of the
+        # last sync
+        self._indexed = {}
+        # paths whose owners, owner (size, crc), order or activity changed
+        self._changed_paths = set()
+        # installers whose destinations or type changed
+        self._changed_installers = set()
+
+    def sync(self, installers):
+        """Bring the index up to date with installers, which must be all
+        the installers in InstallersData.
+
+        :type installers: collections.Iterable[Installer]"""
+        current = set(installers)
+        for installer in [i for i in self._indexed if i not in current]:
+            self._reindex(installer, bolt.LowerDict())
+            del self._indexed[installer]
+            self._changed_installers.discard(installer)
+        for installer in current:
+            indexed = self._indexed.get(installer)
+            if indexed is None or indexed[0] is not installer.ci_dest_sizeCrc:
+                self._reindex(installer, installer.ci_dest_sizeCrc)
+                self._changed_installers.add(installer)
+            elif indexed[1:] != (installer.order, installer.is_active,
+                                 installer.type):
+                # order or activity decide which owner wins - all the paths
+                # of this installer may now be (un)derridden
+                self._changed_paths.update(installer.ci_dest_sizeCrc)
+                if indexed[3] != installer.type:
+                    self._changed_installers.add(installer)
+                self._snapshot(installer, indexed[0])
+
+    def pop_changes(self):
+        """Return the paths and installers changed since the last call and
+        reset them.
+
+        :rtype: tuple[set[bolt.CIstr], set[Installer]]"""
+        changes = self._changed_paths, self._changed_installers
+        self._changed_paths, self._changed_installers = set(), set()
+        return changes
+
+    def _snapshot(self, installer, ci_dest_sizeCrc):
+        self._indexed[installer] = (ci_dest_sizeCrc, installer.order,
+                                    installer.is_active, installer.type)
+
+    def _reindex(self, installer, new_sizeCrc):
+        indexed = self._indexed.get(installer)
+        if indexed is None:
+            old_sizeCrc = {}
+        else:
+            old_sizeCrc = indexed[0]
+            if indexed[1:3] != (installer.order, installer.is_active):
+                self._changed_paths.update(old_sizeCrc)
+        owners = self._path_owners
+        changed_paths = self._changed_paths
+        for path, sizeCrc in old_sizeCrc.iteritems():
+            if new_sizeCrc.get(path) != sizeCrc:
+                path_owners = owners[path]
+                del path_owners[installer]
+                if not path_owners: del owners[path]
+                changed_paths.add(path)
+        for path, sizeCrc in new_sizeCrc.iteritems():
+            if old_sizeCrc.get(path) != sizeCrc:
+                owners[path][installer] = sizeCrc
+                changed_paths.add(path)
+        self._snapshot(installer, new_sizeCrc)
+
+    def owners(self, path):
+        """Return a list of (installer, (size, crc)) tuples for all the
+        installers that would install path, sorted by install order."""
+        path_owners = self._path_owners.get(path)
+        if not path_owners: return []
+        return sorted(path_owners.iteritems(), key=lambda x: x[0].order)
+
+    def norm_sizeCrc(self, path):
+        """Return the (size, crc) of path as it should be installed - that is
+        as provided by the highest order active installer, or None if no
+        active installer provides it."""
+        path_owners = self._path_owners.get(path)
+        if not path_owners: return None
+        active = [(inst.order, sizeCrc) for inst, sizeCrc
+                  in path_owners.iteritems() if inst.is_active]
+        return max(active)[1] if active else None
+
 #------------------------------------------------------------------------------
 class InstallersData(DataStore):
     """Installers tank data. This is the data source for the InstallersList."""
@@ -1664,15 +2112,25 @@ def __init__(self):
         self.store_dir = bass.dirs[u'installers']
         self.bash_dir.makedirs()
         #--Persistent data
+        self._store = InstallersStore(self.bash_dir.join(u'Installers.db'))
+        # the pickle used before Installers.db - migrated on first load
         self.dictFile = bolt.PickleDict(self.bash_dir.join(u'Installers.dat'))
+        self._store_all = False
         self._data = {}
-        self.data_sizeCrcDate = bolt.LowerDict()
+        self.data_sizeCrcDate = _TrackedSizeCrcDate()
         from . import converters
         self.converters_data = converters.ConvertersData(bass.dirs[u'bainData'],
             bass.dirs[u'converters'], bass.dirs[u'dupeBCFs'],
             bass.dirs[u'corruptBCFs'], bass.dirs[u'installers'])
         #--Volatile
         self.ci_underrides_sizeCrc = bolt.LowerDict() # underridden files
+        self._dest_index = _DestinationsIndex()
+        # paths and installers whose status needs recalculating
+        self._status_paths = set()
+        self._status_installers = set()
+        # Data files edited in place while linked to project files -> the
+        # active projects installing them, for the UI to warn about
+        self.edited_links = bolt.LowerDict()
         self.bcfPath_sizeCrcDate = {}
         self.hasChanged = False
         self.loaded = False
@@ -1707,7 +2165,7 @@ def irefresh(self, progress=None, what=u'DIONSC', fullRefresh=False,
         from . import oblivionIni, InstallerMarker, modInfos
         if bass.settings.get(u'bash.bsaRedirection') and oblivionIni.abs_path.exists():
             oblivionIni.setBsaRedirection(True)
-        #--Load Installers.dat if not loaded - will set changed to True
+        #--Load Installers.db if not loaded - will set changed to True
         changed = not self.loaded and self.__load(progress)
         #--Last marker
         if self.lastKey not in self:
@@ -1730,13 +2188,15 @@ def irefresh(self, progress=None, what=u'DIONSC', fullRefresh=False,
 
     def __load(self, progress):
         progress(0, _(u'Loading Data...'))
-        self.dictFile.load()
         self.converters_data.load()
-        pickl_data = self.dictFile.pickled_data
-        self._data = pickl_data.get(u'installers', {}) or pickl_data.get(b'installers', {})
-        pickle = pickl_data.get(u'sizeCrcDate', {}) or pickl_data.get(b'sizeCrcDate', {})
-        self.data_sizeCrcDate = bolt.LowerDict(pickle) if not isinstance(
-            pickle, bolt.LowerDict) else pickle
+        loaded = self._store.exists() and self._store.load()
+        if loaded:
+            self._data, data_files = loaded
+            self.data_sizeCrcDate = _TrackedSizeCrcDate(data_files)
+        else: # first run with Installers.db, or it's unreadable - migrate
+            self.__load_pickle()
+            self._store_all = True
+        self.data_sizeCrcDate.pop_unsaved()
         # fixup: all markers had their archive attribute set to u'===='
         for key, value in self.iteritems():
             if value.is_marker():
@@ -1744,20 +2204,39 @@ def __load(self, progress):
         self.loaded = True
         return True
 
+    def __load_pickle(self):
+        self.dictFile.load()
+        pickl_data = self.dictFile.pickled_data
+        self._data = pickl_data.get(u'installers', {}) or pickl_data.get(b'installers', {})
+        pickle = pickl_data.get(u'sizeCrcDate', {}) or pickl_data.get(b'sizeCrcDate', {})
+        self.data_sizeCrcDate = _TrackedSizeCrcDate(pickle)
+
     def save(self):
-        """Saves to pickle file."""
+        """Saves the installers that changed to Installers.db."""
         if self.hasChanged:
-            self.dictFile.pickled_data[u'installers'] = self._data
-            self.dictFile.pickled_data[u'sizeCrcDate'] = { # FIXME: backwards compat
-                GPath(x): y for x, y in self.data_sizeCrcDate.iteritems()}
-            # for backwards compatibility, drop
-            self.dictFile.pickled_data['crc_installer'] = {
-                x.crc: x for x in self.itervalues() if x.is_archive()}
-            self.dictFile.vdata['version'] = 1
-            self.dictFile.save()
+            try:
+                self._store.save(self._data, self.data_sizeCrcDate,
+                                 self.data_sizeCrcDate.pop_unsaved(),
+                                 full=self._store_all)
+                self._store_all = False
+            except Exception:
+                self._store_all = True # we lost track of the changes
+                raise
             self.converters_data.save()
             self.hasChanged = False
 
+    def export_pickle(self):
+        """Write all the installers data to Installers.dat, in the format
+        used before Installers.db, so it can be loaded by older versions."""
+        self.dictFile.pickled_data[u'installers'] = self._data
+        self.dictFile.pickled_data[u'sizeCrcDate'] = { # FIXME: backwards compat
+            GPath(x): y for x, y in self.data_sizeCrcDate.iteritems()}
+        # for backwards compatibility, drop
+        self.dictFile.pickled_data['crc_installer'] = {
+            x.crc: x for x in self.itervalues() if x.is_archive()}
+        self.dictFile.vdata['version'] = 1
+        self.dictFile.save()
+
     def _rename_operation(self, oldName, newName):
         return self[oldName].renameInstaller(newName, self)
 
@@ -1852,20 +2331,46 @@ def _refreshInstallers(self, progress, fullRefresh, refresh_info, deleted,
             if not subPending: continue
             progress(0,_(u'Scanning Packages...'))
             progress.setFull(len(subPending))
-            for index,package in enumerate(sorted(subPending)):
-                progress(index, _(u'Scanning Packages...') + u'\n%s' % package)
-                self.refresh_installer(package, is_project, progress,
-                                       _index=index, _fullRefresh=fullRefresh)
+            self._scan_packages(sorted(subPending), is_project, progress,
+                                fullRefresh)
         return changed
 
-    def refresh_installer(self, package, is_project, progress,
-                          install_order=None, do_refresh=False, _index=None,
-                          _fullRefresh=False):
+    def _scan_packages(self, packages, is_project, progress, fullRefresh):
+        """Refresh the specified new or updated packages. Listing archives
+        (an external process) and walking projects is I/O bound, so it runs
+        over a bounded pool of worker threads - the results are applied to
+        the installers here, on the main thread, in the order of packages.
+        The workers report to ThreadProgresses, the one of the package
+        awaited is passed on to progress while waiting for it."""
+        installers = [self._get_installer(p, is_project) for p in packages]
+        progresses = [bolt.ThreadProgress(SubProgress(progress, i, i + 1))
+                      for i in xrange(len(installers))]
+        def _scan(i):
+            return installers[i].scan_source(progresses[i], fullRefresh)
+        def _scanning(i):
+            progress(i, _(u'Scanning Packages...') + u'\n%s' %
+                     installers[i].archive)
+        if installers: _scanning(0)
+        for index, scan_ok in enumerate(bolt.imap_ordered(
+                _scan, xrange(len(installers)),
+                poll=lambda i: progresses[i].pump())):
+            installers[index].apply_scan(scan_ok)
+            if index + 1 < len(installers): _scanning(index + 1)
+        progress(len(installers), _(u'Done'))
+
+    def _get_installer(self, package, is_project, install_order=None):
+        """Return the installer for package, creating it if needed."""
         installer = self.get(package)
         if not installer:
             installer = self[package] = self._inst_types[is_project](package)
             if install_order is not None:
                 self.moveArchives([package], install_order)
+        return installer
+
+    def refresh_installer(self, package, is_project, progress,
+                          install_order=None, do_refresh=False, _index=None,
+                          _fullRefresh=False):
+        installer = self._get_installer(package, is_project, install_order)
         if _index is not None:
             progress = SubProgress(progress, _index, _index + 1)
         installer.refreshBasic(progress, recalculate_project_crc=_fullRefresh)
@@ -2006,29 +2511,62 @@ def refreshOrder(self):
                 changed = True
         return changed
 
-    def refreshNorm(self):
-        """Populate self.ci_underrides_sizeCrc with all underridden files."""
-        active_sorted = (x for x in self.sorted_values() if x.is_active)
-        #--dict mapping all should-be-installed files to their attributes
-        norm_sizeCrc = bolt.LowerDict()
-        for package in active_sorted:
-            norm_sizeCrc.update(package.ci_dest_sizeCrc)
+    def _propagate_changes(self):
+        """Propagate the paths changed in data_sizeCrcDate and in the
+        installers' destinations (or order, or activity) since the last call
+        to ci_underrides_sizeCrc, and collect the paths and installers whose
+        status needs recalculating. Return True if ci_underrides_sizeCrc
+        changed."""
+        installers = set(self.itervalues())
+        self._dest_index.sync(installers)
+        changed_paths, changed_insts = self._dest_index.pop_changes()
+        changed_paths |= self.data_sizeCrcDate.pop_changed()
+        self._status_paths |= changed_paths
+        self._status_installers |= changed_insts
+        # drop the installers deleted since they were collected
+        self._status_installers &= installers
         #--Abnorm
-        ci_underrides_sizeCrc = bolt.LowerDict()
+        underrides_changed = False
+        ci_underrides_sizeCrc = self.ci_underrides_sizeCrc
         dataGet = self.data_sizeCrcDate.get
-        for path,sizeCrc in norm_sizeCrc.iteritems():
+        norm_sizeCrc = self._dest_index.norm_sizeCrc
+        for path in changed_paths:
+            # the should-be-installed attributes of this path
+            sizeCrc = norm_sizeCrc(path)
             sizeCrcDate = dataGet(path)
-            if sizeCrcDate and sizeCrc != sizeCrcDate[:2]: # file is installed
-                # in data dir, but from a lower loading installer (or manually)
-                ci_underrides_sizeCrc[path] = sizeCrcDate[:2]
-        self.ci_underrides_sizeCrc, oldAbnorm_sizeCrc = \
-            ci_underrides_sizeCrc, self.ci_underrides_sizeCrc
-        return ci_underrides_sizeCrc != oldAbnorm_sizeCrc
+            if sizeCrc and sizeCrcDate and sizeCrc != sizeCrcDate[:2]:
+                # file is installed in data dir, but from a lower loading
+                # installer (or manually)
+                if ci_underrides_sizeCrc.get(path) != sizeCrcDate[:2]:
+                    ci_underrides_sizeCrc[path] = sizeCrcDate[:2]
+                    underrides_changed = True
+            elif ci_underrides_sizeCrc.pop(path, None) is not None:
+                underrides_changed = True
+        return underrides_changed
+
+    def refreshNorm(self):
+        """Update self.ci_underrides_sizeCrc with all underridden files. Only
+        the paths that changed since the last refresh are examined."""
+        return self._propagate_changes()
 
     def refreshInstallersStatus(self):
-        """Refresh installer status."""
+        """Refresh installer status - only for installers whose destinations
+        changed or that own (or have dirty) paths that changed since the last
+        refresh."""
+        self._propagate_changes()
+        status_paths = self._status_paths
+        to_refresh = self._status_installers
+        self._status_paths, self._status_installers = set(), set()
+        if status_paths:
+            for path in status_paths:
+                to_refresh.update(
+                    inst for inst, _sc in self._dest_index.owners(path))
+            for installer in self.itervalues():
+                if installer.dirty_sizeCrc and not status_paths.isdisjoint(
+                        installer.dirty_sizeCrc):
+                    to_refresh.add(installer)
         changed = False
-        for installer in self.itervalues():
+        for installer in to_refresh:
             changed |= installer.refreshStatus(self)
         return changed
 
@@ -2057,6 +2595,7 @@ def _refresh_from_data_dir(self, progress=None, recalculate_all_crcs=False):
         progress(0, _(u'%s: Scanning...') % bass.dirs[u'mods'].stail)
         new_sizeCrcDate, pending, pending_size = \
             self._process_data_dir(dirDirsFiles, progress)
+        self._unlink_edited(new_sizeCrcDate, pending)
         #--Remove empty dirs?
         if not bass.settings[u'bash.installers.removeEmptyDirs']:
             for empty in emptyDirs:
@@ -2123,8 +2662,9 @@ def _process_data_dir(self, dirDirsFiles, progress):
                             continue
                         except KeyError:
                             pass # corrupted/missing, let os.lstat decide
-                    lstat = os.lstat(asFile)
-                    size, date = lstat.st_size, lstat.st_mtime
+                    # stat, not lstat - follow links to installed projects
+                    fstat = os.stat(asFile)
+                    size, date = fstat.st_size, fstat.st_mtime
                     if size != oSize or date != oDate:
                         pending[rpFile] = (size, oCrc, date, asFile)
                         pending_size += size
@@ -2135,6 +2675,30 @@ def _process_data_dir(self, dirDirsFiles, progress):
                     raise
         return new_sizeCrcDate, pending, pending_size
 
+    def _unlink_edited(self, new_sizeCrcDate, pending):
+        """Replace the Data files that changed since the last scan and are
+        links to project files with copies, so that further edits no longer
+        reach the project - the edit itself already has, as a linked file
+        and its project file are the same file. Record them in
+        self.edited_links."""
+        old_get = self.data_sizeCrcDate.get
+        owners = None
+        for rpFile, (size, _crc, date, asFile) in chain(
+                pending.iteritems(), new_sizeCrcDate.iteritems()):
+            old = old_get(rpFile)
+            if old is None or (old[0], old[2]) == (size, date): continue
+            if owners is None: # only sync when something did change
+                self._dest_index.sync(self.itervalues())
+                owners = self._dest_index.owners
+            projects = [inst.archive for inst, _sc in owners(rpFile)
+                        if inst.is_project() and inst.is_active]
+            try:
+                if not projects or not env.file_is_linked(asFile): continue
+                env.break_link(asFile)
+            except OSError:
+                deprint(u'Failed to unlink %s' % asFile, traceback=True)
+            self.edited_links[rpFile] = projects
+
     def reset_refresh_flag_on_projects(self):
         for installer in self.itervalues():
             if installer.is_project():
@@ -2782,13 +3346,26 @@ def find_conflicts(self, src_installer, active_bsas=None, bsa_cause=None,
             # Calculate all conflicts and save them in lower_bsa and higher_bsa
             asset_to_bsa, src_assets = self.find_src_assets(src_installer,
                                                             active_bsas)
+            # look up the active BSAs containing each of the src_assets in
+            # the reverse index, instead of intersecting all asset sets
+            from . import bsaInfos
+            bsa_assets = {}
+            for b_inf in active_bsas:
+                try:
+                    bsa_assets[b_inf] = b_inf.assets
+                except BSAError:
+                    pass # reported below, if not discarded
+            src_owners = bsaInfos.assets_cache.owners(bsa_assets, src_assets)
             remaining_bsas = copy.copy(active_bsas)
             def _process_bsa_conflicts(b_inf, b_source):
-                try: # conflicting assets from this installer active bsas
-                    curConflicts = b_inf.assets & src_assets
-                except BSAError:
-                    self._parse_error(b_inf, b_source)
+                if b_inf not in bsa_assets:
+                    try: # parse again to log the error
+                        b_inf.assets
+                    except BSAError:
+                        self._parse_error(b_inf, b_source)
                     return
+                # conflicting assets from this installer active bsas
+                curConflicts = src_owners.get(b_inf)
                 # We've used this BSA for a conflict, don't use it again
                 del remaining_bsas[b_inf]
                 if curConflicts:
@@ -2829,21 +3406,25 @@ def _sort_bsa_conflicts(bsa_conflict):
                 return active_bsas[bsa_conflict[1]]
             lower_bsa.sort(key=_sort_bsa_conflicts)
             higher_bsa.sort(key=_sort_bsa_conflicts)
-        # Calculate loose conflicts
-        lower_loose, higher_loose = [], []
-        for package, installer in self.sorted_pairs():
-            if installer.order == srcOrder or not (
+        # Calculate loose conflicts - look up the other owners of each of
+        # the source installer's files in the destinations index
+        self._propagate_changes()
+        inst_conflicts = collections.defaultdict(list)
+        for path in mismatched:
+            for installer, sizeCrc in self._dest_index.owners(path):
+                if installer.order == srcOrder or not (
                         showInactive or installer.is_active): continue
-            if not showLower and installer.order < srcOrder: continue
-            curConflicts = bolt.sortFiles(
-                [x for x, y in installer.ci_dest_sizeCrc.iteritems()
-                if x in mismatched and y != src_sizeCrc[x]])
-            if curConflicts:
-                if installer.order < srcOrder:
-                    conflict_type = lower_loose
-                else:
-                    conflict_type = higher_loose
-                conflict_type.append((installer, package.s, curConflicts))
+                if not showLower and installer.order < srcOrder: continue
+                if sizeCrc != src_sizeCrc[path]:
+                    inst_conflicts[installer].append(path)
+        lower_loose, higher_loose = [], []
+        for installer in sorted(inst_conflicts, key=attrgetter(u'order')):
+            if installer.order < srcOrder:
+                conflict_type = lower_loose
+            else:
+                conflict_type = higher_loose
+            conflict_type.append((installer, installer.archive,
+                                  bolt.sortFiles(inst_conflicts[installer])))
         return lower_loose, higher_loose, lower_bsa, higher_bsa
 
     def find_src_assets(self, src_installer, active_bsas):
@@ -2898,6 +3479,9 @@ def getConflictReport(self, srcInstaller, mode, modInfos):
         lower_loose, higher_loose, lower_bsa, higher_bsa = self.find_conflicts(
             srcInstaller, active_bsas, bsa_cause, list_overrides,
             include_inactive, include_lower, include_bsas)
+        if include_bsas: # parsed BSAs will be read from the cache next time
+            from . import bsaInfos
+            bsaInfos.save_assets_cache()
         # Generate report
         buff = io.StringIO()
         # Print BSA conflicts
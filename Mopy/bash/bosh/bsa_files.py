@@ -32,6 +32,7 @@
 
 import collections
 import errno
+import mmap
 import os
 import zlib
 from functools import partial
@@ -44,7 +45,7 @@
 from .dds_files import DDSFile, mk_dxgi_fmt
 from ..bolt import deprint, Progress, struct_unpack, unpack_byte, \
     unpack_string, unpack_int, Flags, AFile, structs_cache, struct_calcsize, \
-    struct_error
+    struct_error, imap_ordered
 from ..exception import AbstractError, BSAError, BSADecodingError, \
     BSAFlagError, BSACompressionError, BSADecompressionError, \
     BSADecompressionSizeError
@@ -77,6 +78,33 @@ def decompress_rec(compressed_data, decompressed_size, bsa_name):
         error. Returns the resulting decompressed data."""
         raise AbstractError()
 
+    @classmethod
+    def decompress_head(cls, ins, compressed_size, head_size, bsa_name):
+        """Read the compressed record of the specified size at the current
+        position of ins, in chunks, until its first head_size bytes can be
+        decompressed and return those (fewer if the record is smaller)."""
+        decompressor = cls._decompressor()
+        head, remaining = [], compressed_size
+        while remaining > 0 and head_size > 0:
+            chunk = ins.read(min(remaining, _head_chunk_size))
+            if not chunk: break
+            remaining -= len(chunk)
+            # if the output is capped, we got all we need
+            head.append(cls._decompress_some(decompressor, chunk, head_size,
+                                             bsa_name))
+            head_size -= len(head[-1])
+        return b''.join(head)
+
+    @staticmethod
+    def _decompressor(): raise AbstractError()
+    @staticmethod
+    def _decompress_some(decompressor, data, max_length, bsa_name):
+        raise AbstractError()
+
+# decompress_head reads compressed records in chunks of this size - enough
+# for the headers of most files
+_head_chunk_size = 4096
+
 # Note that I mirrored BSArch here by simply leaving zlib and lz4 at their
 # defaults for compression
 class _Bsa_zlib(_BsaCompressionType):
@@ -100,6 +128,15 @@ def decompress_rec(compressed_data, decompressed_size, bsa_name):
                 bsa_name, u'zlib', decompressed_size, len(decompressed_data))
         return decompressed_data
 
+    _decompressor = staticmethod(zlib.decompressobj)
+
+    @staticmethod
+    def _decompress_some(decompressor, data, max_length, bsa_name):
+        try:
+            return decompressor.decompress(data, max_length)
+        except zlib.error as e:
+            raise BSADecompressionError(bsa_name, u'zlib', e)
+
 class _Bsa_lz4(_BsaCompressionType):
     """Implements BSA record compression and decompression using lz4. Used
     only for SSE."""
@@ -121,6 +158,15 @@ def decompress_rec(compressed_data, decompressed_size, bsa_name):
                 bsa_name, u'LZ4', decompressed_size, len(decompressed_data))
         return decompressed_data
 
+    _decompressor = staticmethod(lz4.frame.LZ4FrameDecompressor)
+
+    @staticmethod
+    def _decompress_some(decompressor, data, max_length, bsa_name):
+        try:
+            return decompressor.decompress(data, max_length=max_length)
+        except RuntimeError as e: # No custom lz4 exception for frames...
+            raise BSADecompressionError(bsa_name, u'LZ4', e)
+
 # Table used in Bethesda's CRC algorithm for BA2 hashing
 _BA2_CRC_TABLE = [
     0x00000000, 0x77073096, 0xEE0E612C, 0x990951BA, 0x076DC419, 0x706AF48F,
@@ -178,6 +224,20 @@ def _hash_ba2_string(ba2_string):
         ret = (ret >> 8) ^ _BA2_CRC_TABLE[(ret ^ ord(c)) & 0xFF]
     return ret
 
+def _bisect_records(bsa_map, start, count, rec_size, target_hash):
+    """Binary search a table of count records of rec_size bytes, sorted by
+    the hash they start with, for the record with target_hash. Return its
+    offset in bsa_map or -1 if not found."""
+    hash_fmt = _HashedRecord.formats[0][0]
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        mid_hash = _unpack_from(hash_fmt, bsa_map, start + mid * rec_size)[0]
+        if mid_hash < target_hash: lo = mid + 1
+        elif mid_hash > target_hash: hi = mid
+        else: return start + mid * rec_size
+    return -1
+
 # Headers ---------------------------------------------------------------------
 class _Header(object):
     __slots__ = (u'file_id', u'version')
@@ -338,7 +398,8 @@ class BSAFileRecord(_BsaHashedRecord):
     __slots__ = (u'file_size_flags', u'raw_file_data_offset')
     formats = [(f, struct_calcsize(f)) for f in (u'I', u'I')]
 
-    def compression_toggle(self): return self.file_size_flags & 0x40000000
+    def compression_toggle(self):
+        return bool(self.file_size_flags & 0x40000000)
 
     def raw_data_size(self):
         if self.compression_toggle():
@@ -436,6 +497,17 @@ def load_record(self, ins):
             tex_chunk.load_chunk(ins)
             self.tex_chunks.append(tex_chunk)
 
+    def load_record_from_buffer(self, memview, start):
+        start = super(Ba2FileRecordTexture, self).load_record_from_buffer(
+            memview, start)
+        self.dxgi_format = mk_dxgi_fmt(self.dxgi_format)
+        self.tex_chunks = []
+        for x in xrange(self.num_chunks):
+            tex_chunk = Ba2TexChunk()
+            start = tex_chunk.load_chunk_from_buffer(memview, start)
+            self.tex_chunks.append(tex_chunk)
+        return start
+
 class Ba2TexChunk(object):
     """BA2 texture chunk, used in texture file records."""
     # unused1 is always BAADF00D
@@ -448,6 +520,12 @@ def load_chunk(self, ins): ##: Centralize this, copy-pasted everywhere
         for f, a in izip(Ba2TexChunk.formats, Ba2TexChunk.__slots__):
             setattr(self, a, struct_unpack(f[0], ins.read(f[1]))[0])
 
+    def load_chunk_from_buffer(self, memview, start):
+        for f, a in izip(Ba2TexChunk.formats, Ba2TexChunk.__slots__):
+            setattr(self, a, _unpack_from(f[0], memview, start)[0])
+            start += f[1]
+        return start
+
     def __repr__(self):
         return u'Ba2TexChunk<mipmaps #%u to #%u>' % (
             self.start_mip, self.end_mip)
@@ -465,6 +543,38 @@ class Ba2Folder(object):
     def __init__(self):
         self.folder_assets = collections.OrderedDict() # keep files order
 
+# Packing ---------------------------------------------------------------------
+# Audio is stored uncompressed, the engines stream it straight from the archive
+_uncompressed_exts = {u'.fuz', u'.lip', u'.mp3', u'.ogg', u'.wav', u'.xwm'}
+# Bytes of source files to read and compress per batch when packing, bounds
+# the memory used
+_pack_batch_size = 64 * 1024 * 1024
+
+def _encode_path(string_path, bsa_name):
+    try:
+        return string_path.encode(_bsa_encoding)
+    except UnicodeEncodeError:
+        raise BSAError(bsa_name, u'Unencodable path %r' % string_path)
+
+def _read_records(sources, compress_rec, bsa_name):
+    """Yield (size, data) for each of the (source path, compress) tuples in
+    sources, where data is the compressed contents of the file if compress is
+    True. The files are read and compressed in batches over a pool of
+    worker threads - zlib and lz4 release the GIL while compressing."""
+    def _read(src_compress):
+        src_path, compress = src_compress
+        with open(src_path, u'rb') as ins:
+            data = ins.read()
+        return len(data), compress_rec(data, bsa_name) if compress else data
+    batch, batch_size = [], 0
+    for src_compress in sources:
+        batch.append(src_compress)
+        batch_size += os.path.getsize(src_compress[0])
+        if batch_size >= _pack_batch_size:
+            for rec in imap_ordered(_read, batch): yield rec
+            batch, batch_size = [], 0
+    for rec in imap_ordered(_read, batch): yield rec
+
 # Files -----------------------------------------------------------------------
 def _makedirs_exists_ok(target_dir):
     try:
@@ -477,6 +587,11 @@ class ABsa(AFile):
     """:type bsa_folders: collections.OrderedDict[unicode, BSAFolder]"""
     _header_type = BsaHeader
     _assets = frozenset()
+    # above this many assets, extract_assets loads all the records instead of
+    # looking up each asset by its hash
+    _max_hashed_assets = 256
+    # the version pack_archive writes, None if packing is not supported
+    _pack_version = None
     _compression_type = _Bsa_zlib # type: _BsaCompressionType
 
     def __init__(self, fullpath, load_cache=False, names_only=True):
@@ -511,16 +626,16 @@ def __load(self, names_only):
     def _map_files_to_folders(asset_paths): # lowercase keys and values
         folder_file = []
         for a in asset_paths:
-            split = a.rsplit(path_sep, 1)
+            split = a.lower().rsplit(path_sep, 1)
             if len(split) == 1:
                 split = [u'', split[0]]
             folder_file.append(split)
-        # group files by folder
+        # group files by folder - lower case first, so that folders differing
+        # only in case are grouped together
         folder_files_dict = {}
         folder_file.sort(key=itemgetter(0)) # sort first then group
         for key, val in groupby(folder_file, key=itemgetter(0)):
-            folder_files_dict[key.lower()] = {dest.lower() for _key, dest
-                                              in val}
+            folder_files_dict[key] = {dest for _key, dest in val}
         return folder_files_dict
 
     def extract_assets(self, asset_paths, dest_folder, progress=None):
@@ -534,11 +649,7 @@ def extract_assets(self, asset_paths, dest_folder, progress=None):
         folder_files_dict = self._map_files_to_folders(
             imap(unicode.lower, asset_paths))
         del asset_paths # forget about this
-        # load the bsa - this should be reworked to load only needed records
-        self._load_bsa()
-        folder_to_assets = self._map_assets_to_folders(folder_files_dict)
-        # unload the bsa
-        self.bsa_folders.clear()
+        folder_to_assets = self._map_assets(folder_files_dict)
         # get the data from the file
         global_compression = self.bsa_header.is_compressed()
         i = 0
@@ -584,6 +695,67 @@ def extract_assets(self, asset_paths, dest_folder, progress=None):
                               u'wb') as out:
                         out.write(raw_data)
 
+    def read_asset_heads(self, asset_paths, head_size):
+        """Return a dict mapping the specified asset paths (lowercase, as in
+        assets) to their first head_size bytes, decompressing only as much of
+        compressed records as needed. Assets that are not in the BSA are
+        skipped."""
+        folder_files_dict = self._map_files_to_folders(asset_paths)
+        del asset_paths
+        folder_to_assets = self._map_assets(folder_files_dict)
+        heads = {}
+        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+            for folder, file_records in folder_to_assets.iteritems():
+                folder = folder.lower()
+                for filename, record in file_records:
+                    heads[path_sep.join((folder, filename.lower())) if
+                          folder else filename.lower()] = self._read_head(
+                        bsa_file, record, head_size)
+        return heads
+
+    def _read_head(self, bsa_file, record, head_size):
+        """Return the first head_size bytes of the file of record."""
+        raise AbstractError()
+
+    def _map_assets(self, folder_files_dict):
+        """Return an OrderedDict mapping folders to lists of (filename,
+        record) tuples for the requested assets, looking them up by their
+        hashes if possible, else loading all the records."""
+        folder_to_assets = self._map_hashed_assets(folder_files_dict)
+        if folder_to_assets is None:
+            self._load_bsa()
+            folder_to_assets = self._map_assets_to_folders(folder_files_dict)
+            # unload the bsa
+            self.bsa_folders.clear()
+        return folder_to_assets
+
+    def _map_hashed_assets(self, folder_files_dict):
+        """Look up the records of the requested assets by the hashes of their
+        paths, reading only the parts of the tables needed through an mmap.
+        Return None if there are too many assets to make this worth it, or
+        any of them was not found (e.g. altered hashes), so the caller falls
+        back to loading all the records."""
+        if sum(imap(len, folder_files_dict.itervalues())) > \
+                self._max_hashed_assets:
+            return None
+        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+            self.bsa_header.load_header(bsa_file, self.bsa_name)
+            try:
+                bsa_map = mmap.mmap(bsa_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError):
+                return None
+            try:
+                return self._find_hashed_records(bsa_map, folder_files_dict)
+            except (struct_error, ValueError, IndexError):
+                return None # corrupt - let the full load raise the error
+            finally:
+                bsa_map.close()
+
+    def _find_hashed_records(self, bsa_map, folder_files_dict):
+        """Return what _map_hashed_assets does, or None if unsupported."""
+        return None
+
     def _map_assets_to_folders(self, folder_files_dict):
         folder_to_assets = collections.OrderedDict()
         for folder_path, bsa_folder in self.bsa_folders.iteritems():
@@ -601,6 +773,23 @@ def _map_assets_to_folders(self, folder_files_dict):
     def _load_bsa(self): raise AbstractError()
     def _load_bsa_light(self): raise AbstractError()
 
+    @classmethod
+    def can_pack(cls): return cls._pack_version is not None
+
+    @classmethod
+    def pack_archive(cls, archive_path, asset_sources, compress=True,
+                     progress=None):
+        """Writes a new archive of this type containing the specified files.
+
+        :param archive_path: The path of the archive to create.
+        :param asset_sources: A dict mapping the paths of the assets in the
+            archive (relative to the Data folder) to the absolute paths of the
+            files to pack.
+        :param compress: Whether or not to compress the records - audio
+            files are always stored uncompressed.
+        :param progress: The progress callback to use. None if unwanted."""
+        raise AbstractError()
+
     # API - delegates to abstract methods above
     def has_assets(self, asset_paths):
         return {a.cs for a in asset_paths} & self.assets
@@ -625,6 +814,11 @@ class BSA(ABsa):
     are embedded."""
     file_record_type = BSAFileRecord
     folder_record_type = BSAFolderRecord
+    _pack_version = 104
+    # Maps top level folders to the content type flags in the header
+    _content_flags = {u'meshes': 0x1, u'textures': 0x2, u'interface': 0x4,
+                      u'menus': 0x4, u'sound': 0x8, u'shaders': 0x20,
+                      u'trees': 0x40, u'fonts': 0x80}
 
     def _load_bsa(self):
         folder_records = [] # we need those to parse the folder names
@@ -698,6 +892,196 @@ def _read_bsa_file(self, folder_records, read_file_records):
             # close the file
         return file_names
 
+    # A dictionary mapping file extensions to hash components. Used when
+    # hashing file names for BSAs.
+    _bsa_ext_lookup = collections.defaultdict(int)
+    for ext, hash_part in [(u'.kf', 0x80), (u'.nif', 0x8000),
+                           (u'.dds', 0x8080), (u'.wav', 0x80000000)]:
+        _bsa_ext_lookup[ext] = hash_part
+
+    @staticmethod
+    def calculate_hash(file_name, is_folder=False):
+        """Calculates the hash used by BSAs for the provided file name - or
+        folder path, if is_folder is True.
+        Based on Timeslips code with cleanup and pythonization.
+
+        See here for more information:
+        https://en.uesp.net/wiki/Tes4Mod:Hash_Calculation"""
+        #--NOTE: fileName is NOT a Path object!
+        if is_folder: # folders are hashed as a whole
+            root, ext = file_name.lower(), u''
+        else:
+            root, ext = os.path.splitext(file_name.lower())
+        chars = map(ord, root)
+        hash_part_1 = chars[-1] | ((len(chars) > 2 and chars[-2]) or 0) << 8 \
+                      | len(chars) << 16 | chars[0] << 24
+        hash_part_1 |= BSA._bsa_ext_lookup[ext]
+        uint_mask, hash_part_2, hash_part_3 = 0xFFFFFFFF, 0, 0
+        for char in chars[1:-2]:
+            hash_part_2 = ((hash_part_2 * 0x1003F) + char) & uint_mask
+        for char in map(ord, ext):
+            hash_part_3 = ((hash_part_3 * 0x1003F) + char) & uint_mask
+        hash_part_2 = (hash_part_2 + hash_part_3) & uint_mask
+        return (hash_part_2 << 32) + hash_part_1
+
+    def _find_hashed_records(self, bsa_map, folder_files_dict):
+        # folder records and the file records of each folder are sorted by
+        # hash - binary search them
+        my_header = self.bsa_header # type: BsaHeader
+        folder_rec_type = self.__class__.folder_record_type
+        file_rec_type = self.__class__.file_record_type
+        folder_rec_size = folder_rec_type.total_record_size()
+        file_rec_size = file_rec_type.total_record_size()
+        folder_to_assets = collections.OrderedDict()
+        for folder_path, filenames in folder_files_dict.iteritems():
+            if not folder_path: return None # no hash for the empty string
+            folder_pos = _bisect_records(bsa_map,
+                my_header.folder_records_offset, my_header.folder_count,
+                folder_rec_size, self.calculate_hash(folder_path, True))
+            if folder_pos < 0: return None
+            folder_rec = folder_rec_type()
+            folder_rec.load_record_from_buffer(bsa_map, folder_pos)
+            # the folder name precedes its file records - check it to catch
+            # hash collisions
+            name_pos = (folder_rec.file_records_offset -
+                        my_header.total_file_name_length)
+            name_size = _unpack_from(u'B', bsa_map, name_pos)[0]
+            folder_name = bsa_map[name_pos + 1:name_pos + name_size]
+            if _decode_path(folder_name, self.bsa_name).lower() != \
+                    folder_path:
+                return None
+            files_pos = name_pos + 1 + name_size
+            file_records = []
+            for filename in filenames:
+                file_pos = _bisect_records(bsa_map, files_pos,
+                    folder_rec.files_count, file_rec_size,
+                    self.calculate_hash(filename))
+                if file_pos < 0: return None
+                rec = file_rec_type()
+                rec.load_record_from_buffer(bsa_map, file_pos)
+                file_records.append((filename, rec))
+            # read the data in the order it is stored in the file
+            file_records.sort(key=lambda r: r[1].raw_file_data_offset)
+            folder_to_assets[folder_path] = file_records
+        return folder_to_assets
+
+    def _read_head(self, bsa_file, record, head_size):
+        data_size = record.raw_data_size()
+        bsa_file.seek(record.raw_file_data_offset)
+        if self.bsa_header.embed_filenames():
+            filename_len = unpack_byte(bsa_file)
+            bsa_file.seek(filename_len, 1) # discard filename
+            data_size -= filename_len + 1
+        if self.bsa_header.is_compressed() ^ record.compression_toggle():
+            bsa_file.seek(4, 1) # discard uncompressed size
+            return self._compression_type.decompress_head(
+                bsa_file, data_size - 4, head_size, self.bsa_name)
+        return bsa_file.read(min(data_size, head_size))
+
+    @classmethod
+    def pack_archive(cls, archive_path, asset_sources, compress=True,
+                     progress=None):
+        bsa_name = os.path.basename(archive_path)
+        hash_file = cls.calculate_hash
+        folder_files = collections.defaultdict(list)
+        for asset, src_path in asset_sources.iteritems():
+            folder, _sep, filename = asset.lower().replace(
+                u'/', path_sep).rpartition(path_sep)
+            if not folder:
+                raise BSAError(bsa_name, u'Files must be in a folder: %r' %
+                               asset)
+            folder_files[folder].append((hash_file(filename), filename,
+                                         src_path))
+        # The engine binary searches the folders and each folder's files by
+        # their hashes - sort them and make sure there are no collisions
+        def _sorted_by_hash(hashed):
+            hashed.sort()
+            for prev, curr in izip(hashed, hashed[1:]):
+                if prev[0] == curr[0]:
+                    raise BSAError(bsa_name, u'Hash collision between %r and '
+                                             u'%r' % (prev[1], curr[1]))
+            return hashed
+        folders = _sorted_by_hash([
+            (hash_file(folder, True), folder, _sorted_by_hash(files))
+            for folder, files in folder_files.iteritems()])
+        folder_names = [_encode_path(f, bsa_name) for _h, f, _fs in folders]
+        file_names = [_encode_path(n, bsa_name) for _h, _f, files in folders
+                      for _h2, n, _s in files]
+        if any(len(n) >= 0xFF for n in folder_names):
+            raise BSAError(bsa_name, u'Folder path too long')
+        folder_fmt = structs_cache[u'=' + u''.join(
+            [_HashedRecord.formats[0][0]] + [f for f, _s in
+                                             cls.folder_record_type.formats])]
+        file_fmt = structs_cache[u'=' + u''.join(
+            [_HashedRecord.formats[0][0]] + [f for f, _s in
+                                             cls.file_record_type.formats])]
+        total_file_name_length = sum(len(n) + 1 for n in file_names)
+        # Lay out the folder blocks (folder name, then its file records)
+        block_pos = BsaHeader.header_size + folder_fmt.size * len(folders)
+        block_offsets = []
+        for folder_name, (_h, _f, files) in izip(folder_names, folders):
+            block_offsets.append(block_pos)
+            block_pos += len(folder_name) + 2 + file_fmt.size * len(files)
+        data_pos = block_pos + total_file_name_length
+        file_flags = 0
+        for _h, folder, _fs in folders:
+            if folder.startswith(u'sound' + path_sep + u'voice'):
+                file_flags |= 0x10
+            else:
+                file_flags |= cls._content_flags.get(
+                    folder.split(path_sep, 1)[0], 0x100)
+        # Write the data first, recording the size and offset of each file
+        sources = [(src, compress and os.path.splitext(n)[1] not in
+                    _uncompressed_exts)
+                   for _h, _f, files in folders for _h2, n, src in files]
+        file_sizes_offsets = []
+        with open(archive_path, u'wb') as out:
+            out.seek(data_pos)
+            if progress: progress.setFull(max(len(sources), 1))
+            records = _read_records(sources,
+                cls._compression_type.compress_rec, bsa_name)
+            for i, ((size, data), (src_path, rec_compressed)) in enumerate(
+                    izip(records, sources)):
+                if progress and not i % 100:
+                    progress(i, u'%s\n%s' % (bsa_name, src_path))
+                if data_pos > 0xFFFFFFFF:
+                    raise BSAError(bsa_name, u'Archive exceeds 4GB')
+                size_flags = len(data)
+                if rec_compressed:
+                    out.write(structs_cache[u'=I'].pack(size))
+                    size_flags += 4
+                out.write(data)
+                if size_flags > 0x3FFFFFFF:
+                    raise BSAError(bsa_name, u'File too large: %s' %
+                                   src_path)
+                if rec_compressed != compress: # toggle global compression
+                    size_flags |= 0x40000000
+                file_sizes_offsets.append((size_flags, data_pos))
+                data_pos += size_flags & 0x3FFFFFFF
+            # Then go back and write the header and the tables
+            out.seek(0)
+            out.write(structs_cache[u'=4s8I'].pack(BsaHeader.bsa_magic,
+                cls._pack_version, BsaHeader.header_size,
+                0x3 | (0x4 if compress else 0), len(folders), len(sources),
+                sum(len(n) + 1 for n in folder_names), total_file_name_length,
+                file_flags))
+            for block_offset, (folder_hash, _f, files) in izip(block_offsets,
+                                                               folders):
+                values = {u'files_count': len(files),
+                          u'file_records_offset': block_offset +
+                                                  total_file_name_length}
+                out.write(folder_fmt.pack(folder_hash, *[
+                    values.get(a, 0) for _fmt, a in izip(
+                        cls.folder_record_type.formats,
+                        cls.folder_record_type.__slots__)]))
+            sizes_offsets = iter(file_sizes_offsets)
+            for folder_name, (_h, _f, files) in izip(folder_names, folders):
+                out.write(structs_cache[u'=B'].pack(len(folder_name) + 1))
+                out.write(folder_name + b'\x00')
+                for file_hash, _n, _s in files:
+                    out.write(file_fmt.pack(file_hash, *next(sizes_offsets)))
+            out.write(b'\x00'.join(file_names) + b'\x00')
+
     def _discard_file_records(self, bsa_file, folder_path, folder_record,
                               folders=None):
         bsa_file.seek(self.file_record_type.total_record_size() *
@@ -706,18 +1090,87 @@ def _discard_file_records(self, bsa_file, folder_path, folder_record,
 
 class BA2(ABsa):
     _header_type = Ba2Header
+    _pack_version = 1
+
+    @classmethod
+    def pack_archive(cls, archive_path, asset_sources, compress=True,
+                     progress=None):
+        # Only general archives - textures need DX10 ones
+        bsa_name = os.path.basename(archive_path)
+        assets = sorted((a.replace(u'/', path_sep), s) for a, s
+                        in asset_sources.iteritems())
+        name_table = b''.join(
+            structs_cache[u'=H'].pack(len(n)) + n for n in
+            (_encode_path(a, bsa_name) for a, _s in assets))
+        rec_fmt = structs_cache[u'=I4sIIQIII']
+        data_pos = Ba2Header.header_size + rec_fmt.size * len(assets)
+        sources = [(s, compress and os.path.splitext(a)[1].lower() not in
+                    _uncompressed_exts) for a, s in assets]
+        file_records = []
+        with open(archive_path, u'wb') as out:
+            out.seek(data_pos)
+            if progress: progress.setFull(max(len(sources), 1))
+            records = _read_records(sources,
+                cls._compression_type.compress_rec, bsa_name)
+            for i, ((size, data), (asset, _src), (_src, rec_compressed)) in \
+                    enumerate(izip(records, assets, sources)):
+                if progress and not i % 100:
+                    progress(i, u'%s\n%s' % (bsa_name, asset))
+                out.write(data)
+                folder, _sep, filename = asset.rpartition(path_sep)
+                file_root, file_ext = os.path.splitext(filename)
+                file_records.append(rec_fmt.pack(_hash_ba2_string(file_root),
+                    file_ext[1:].lower().encode(u'ascii', u'ignore')[:4],
+                    _hash_ba2_string(folder), 0x00100100, data_pos,
+                    len(data) if rec_compressed else 0, size, 0xBAADF00D))
+                data_pos += len(data)
+            out.write(name_table)
+            out.seek(0)
+            out.write(structs_cache[u'=4sI4sIQ'].pack(Ba2Header.bsa_magic,
+                cls._pack_version, b'GNRL', len(assets), data_pos))
+            out.write(b''.join(file_records))
+
+    @staticmethod
+    def _build_dds_header(dds_file, record):
+        """Helper method, sets up a functional DDS header for the specified
+        DDS file based on the specified texture record."""
+        dds_file.dds_header.dw_height = record.height
+        dds_file.dds_header.dw_width = record.width
+        dds_file.dds_header.dw_mip_map_count = record.num_mips
+        dds_file.dds_header.dw_depth = 1
+        # 3 == DDS_DIMENSION_TEXTURE2D - PY3: enum!
+        dds_file.dds_dxt10.resource_dimension = 3
+        dds_file.dds_dxt10.array_size = 1
+        if record.cube_maps == 2049:
+            dds_file.dds_header.dw_caps.DDSCAPS_COMPLEX = True
+            # All but DDSCAPS2_VOLUME or'd together
+            # Archive.exe sticks these into dwCaps, which is 100%
+            # wrong, but that's DDS for you...
+            dds_file.dds_header.dw_caps2 = 0xFE00
+            # 0x4 == DDS_RESOURCE_MISC_TEXTURECUBE
+            dds_file.dds_dxt10.misc_flag = 0x4
+        # This needs to be last, it uses the header's width and height
+        record.dxgi_format.setup_file(dds_file, use_legacy_formats=True)
+
+    def _read_head(self, bsa_file, record, head_size):
+        if self.bsa_header.ba2_files_type == b'DX10':
+            # The DDS headers are not stored, but built from the record
+            dds_file = DDSFile(u'')
+            self._build_dds_header(dds_file, record)
+            return dds_file.dump_file()[:head_size]
+        bsa_file.seek(record.offset)
+        if record.packed_size:
+            return self._compression_type.decompress_head(
+                bsa_file, record.packed_size, head_size, self.bsa_name)
+        return bsa_file.read(min(record.unpacked_size, head_size))
 
     def extract_assets(self, asset_paths, dest_folder, progress=None):
         # map files to folders
         folder_files_dict = self._map_files_to_folders(asset_paths)
         del asset_paths # forget about this
-        # load the bsa - this should be reworked to load only needed records
-        self._load_bsa()
+        folder_to_assets = self._map_assets(folder_files_dict)
         my_header = self.bsa_header # type: Ba2Header
         is_dx10 = my_header.ba2_files_type == b'DX10'
-        folder_to_assets = self._map_assets_to_folders(folder_files_dict)
-        # unload the bsa
-        self.bsa_folders.clear()
         # get the data from the file
         i = 0
         if progress:
@@ -735,27 +1188,6 @@ def _read_rec_or_chunk(record):
                 else:
                     # This is an uncompressed record, just read it
                     return bsa_file.read(record.unpacked_size)
-            def _build_dds_header(dds_file, record):
-                """Helper method, sets up a functional DDS header for the
-                specified DDS file based on the specified record."""
-                dds_file.dds_header.dw_height = record.height
-                dds_file.dds_header.dw_width = record.width
-                dds_file.dds_header.dw_mip_map_count = record.num_mips
-                dds_file.dds_header.dw_depth = 1
-                # 3 == DDS_DIMENSION_TEXTURE2D - PY3: enum!
-                dds_file.dds_dxt10.resource_dimension = 3
-                dds_file.dds_dxt10.array_size = 1
-                if record.cube_maps == 2049:
-                    dds_file.dds_header.dw_caps.DDSCAPS_COMPLEX = True
-                    # All but DDSCAPS2_VOLUME or'd together
-                    # Archive.exe sticks these into dwCaps, which is 100%
-                    # wrong, but that's DDS for you...
-                    dds_file.dds_header.dw_caps2 = 0xFE00
-                    # 0x4 == DDS_RESOURCE_MISC_TEXTURECUBE
-                    dds_file.dds_dxt10.misc_flag = 0x4
-                # This needs to be last, it uses the header's width and height
-                record.dxgi_format.setup_file(
-                    dds_file, use_legacy_formats=True)
             for folder, file_records in folder_to_assets.iteritems():
                 if progress:
                     progress(i, u'Extracting %s...\n%s' % (
@@ -775,7 +1207,7 @@ def _build_dds_header(dds_file, record):
                         # Add a DDS header based on the data in the record,
                         # then dump the resulting DDS file - cf. BSArch
                         dds_file = DDSFile(u'')
-                        _build_dds_header(dds_file, record)
+                        self._build_dds_header(dds_file, record)
                         dds_file.dds_contents = dds_data
                         raw_data = dds_file.dump_file()
                     else:
@@ -823,6 +1255,43 @@ def _load_bsa(self):
             current_folder.folder_assets[filename[folder_dex + 1:]] = \
                 file_records[index]
 
+    def _find_hashed_records(self, bsa_map, folder_files_dict):
+        # BA2 records are not sorted, but start with the hashes of the file
+        # name and folder and the extension - search for those 12 bytes
+        my_header = self.bsa_header # type: Ba2Header
+        if not my_header.ba2_num_files or not my_header.ba2_name_table_offset:
+            return None
+        records_start = my_header.header_size
+        if my_header.ba2_files_type == b'DX10':
+            rec_type, rec_size = Ba2FileRecordTexture, 0 # variable size
+            first_rec = rec_type()
+            first_rec.load_record_from_buffer(bsa_map, records_start)
+            records_end = min([c.offset for c in first_rec.tex_chunks] +
+                              [my_header.ba2_name_table_offset])
+        else:
+            rec_type = Ba2FileRecordGeneral
+            rec_size = rec_type.total_record_size()
+            records_end = records_start + rec_size * my_header.ba2_num_files
+        pack_key = structs_cache[u'=I4sI'].pack
+        folder_to_assets = collections.OrderedDict()
+        for folder_path, filenames in folder_files_dict.iteritems():
+            folder_hash = _hash_ba2_string(folder_path)
+            folder_to_assets[folder_path] = file_records = []
+            for filename in filenames:
+                file_root, file_ext = os.path.splitext(filename)
+                rec_key = pack_key(_hash_ba2_string(file_root),
+                    file_ext[1:].encode(u'ascii', u'ignore')[:4],
+                    folder_hash)
+                rec_pos = bsa_map.find(rec_key, records_start, records_end)
+                while rec_pos >= 0 and rec_size and (
+                        rec_pos - records_start) % rec_size:
+                    rec_pos = bsa_map.find(rec_key, rec_pos + 1, records_end)
+                if rec_pos < 0: return None
+                rec = rec_type()
+                rec.load_record_from_buffer(bsa_map, rec_pos)
+                file_records.append((filename, rec))
+        return folder_to_assets
+
     def _load_bsa_light(self):
         my_header = self.bsa_header # type: Ba2Header
         with open(u'%s' % self.abs_path, u'rb') as bsa_file:
@@ -914,34 +1383,7 @@ def extract_assets(self, asset_paths, dest_folder, progress=None):
 class OblivionBsa(BSA):
     _header_type = OblivionBsaHeader
     file_record_type = BSAOblivionFileRecord
-    # A dictionary mapping file extensions to hash components. Used by Oblivion
-    # when hashing file names for its BSAs.
-    _bsa_ext_lookup = collections.defaultdict(int)
-    for ext, hash_part in [(u'.kf', 0x80), (u'.nif', 0x8000),
-                           (u'.dds', 0x8080), (u'.wav', 0x80000000)]:
-        _bsa_ext_lookup[ext] = hash_part
-
-    @staticmethod
-    def calculate_hash(file_name):
-        """Calculates the hash used by Oblivion BSAs for the provided file
-        name.
-        Based on Timeslips code with cleanup and pythonization.
-
-        See here for more information:
-        https://en.uesp.net/wiki/Tes4Mod:Hash_Calculation"""
-        #--NOTE: fileName is NOT a Path object!
-        root, ext = os.path.splitext(file_name.lower())
-        chars = map(ord, root)
-        hash_part_1 = chars[-1] | ((len(chars) > 2 and chars[-2]) or 0) << 8 \
-                      | len(chars) << 16 | chars[0] << 24
-        hash_part_1 |= OblivionBsa._bsa_ext_lookup[ext]
-        uint_mask, hash_part_2, hash_part_3 = 0xFFFFFFFF, 0, 0
-        for char in chars[1:-2]:
-            hash_part_2 = ((hash_part_2 * 0x1003F) + char) & uint_mask
-        for char in map(ord, ext):
-            hash_part_3 = ((hash_part_3 * 0x1003F) + char) & uint_mask
-        hash_part_2 = (hash_part_2 + hash_part_3) & uint_mask
-        return (hash_part_2 << 32) + hash_part_1
+    _pack_version = 103
 
     def undo_alterations(self, progress=Progress()):
         """Undoes any alterations that previously applied BSA Alteration may
@@ -976,6 +1418,7 @@ def undo_alterations(self, progress=Progress()):
 class SkyrimSeBsa(BSA):
     folder_record_type = BSASkyrimSEFolderRecord
     _compression_type = _Bsa_lz4
+    _pack_version = 105
 
 # Factory
 def get_bsa_type(game_fsName):
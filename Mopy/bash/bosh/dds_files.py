@@ -38,15 +38,20 @@
 __author__ = u'Infernio'
 
 import copy
+import io
+import os
 from collections import defaultdict
 from struct import Struct
-from ..bolt import Flags, unpack_4s, unpack_int, AFile
+from ..bolt import Flags, unpack_4s, unpack_int, AFile, imap_ordered, \
+    round_size, struct_error
 from ..exception import DDSError
 
 # Constants
 _HEADER_MAGIC = b'DDS '
 _HEADER_SIZE = 124
 _PF_SIZE = 32
+# Magic + header + DXT10 header - all we need to read to scan a DDS file
+DDS_HEADERS_SIZE = 4 + _HEADER_SIZE + 20
 
 _MAGIC_DXT1 = b'DXT1'
 _MAGIC_DXT2 = b'DXT2'
@@ -251,8 +256,9 @@ def setup_file(self, dds_file, use_legacy_formats=False):
 
         :type dds_file: DDSFile
         :param use_legacy_formats: If set to True, use non-DXT10 legacy formats
-            that are equivalent instead."""
-        target_pf = self._fmt_ddspf if use_legacy_formats else _DDSPF_DXT10
+            that are equivalent instead, if there are any."""
+        target_pf = (self._fmt_ddspf if use_legacy_formats and
+                     self._fmt_ddspf else _DDSPF_DXT10)
         dds_file.dds_header.ddspf = copy.copy(target_pf)
         row_pitch, slice_pitch = _compute_pitch[self._fmt_name](
             self._fmt_bpp, dds_file.dds_header.dw_width,
@@ -265,7 +271,7 @@ def setup_file(self, dds_file, use_legacy_formats=False):
             dds_file.dds_header.dw_flags.DDSD_PITCH = True
             dds_file.dds_header.dw_flags.DDSD_LINEARSIZE = False
             dds_file.dds_header.dw_pitch_or_linear_size = row_pitch
-        if self._fmt_ddspf.needs_dxt10:
+        if target_pf.needs_dxt10:
             dds_file.dds_dxt10.dxgi_format = copy.copy(self)
 
     def __repr__(self):
@@ -434,11 +440,11 @@ def _compute_shift_dyn(_bpp, width, height):
 _compute_nv11 = _compute_complex(4, lambda height: height, 3, 2)
 _compute_p208 = _compute_complex(2, lambda height: height)
 
-def _compute_v208(width, height):
+def _compute_v208(_bpp, width, height):
     """V208-specific row/slice pitch computation function."""
     return width, width * (height + (((height + 1) >> 1) * 2))
 
-def _compute_v408(width, height):
+def _compute_v408(_bpp, width, height):
     """V408-specific row/slice pitch computation function."""
     return width, width * (height + ((height >> 1) * 4))
 
@@ -490,6 +496,32 @@ def _compute_default(bpp, width, height):
     u'DXGI_FORMAT_V408': _compute_v408,
 })
 
+# Maps the pixel formats of non-DXT10 files to DXGI formats - fourcc formats
+# by their fourcc, the rest by their bit count and masks
+def _pf_key(ddspf):
+    if ddspf.pf_flags.DDPF_FOURCC: return ddspf.pf_four_cc
+    return (ddspf.pf_rgb_bit_count, ddspf.pf_r_bit_mask, ddspf.pf_g_bit_mask,
+            ddspf.pf_b_bit_mask, ddspf.pf_a_bit_mask)
+_legacy_formats = {_pf_key(f._fmt_ddspf): f for f in
+                   _DXGIFormat.index_to_fmt.itervalues() if f._fmt_ddspf}
+_dxgi_by_name = {f._fmt_name: f for f in _DXGIFormat.index_to_fmt.itervalues()}
+for _four_cc, _fmt_name in (
+        # premultiplied alpha and ATI variants of the BCn formats
+        (_MAGIC_DXT2, u'DXGI_FORMAT_BC2_UNORM'),
+        (_MAGIC_DXT4, u'DXGI_FORMAT_BC3_UNORM'),
+        (b'ATI1', u'DXGI_FORMAT_BC4_UNORM'),
+        (b'ATI2', u'DXGI_FORMAT_BC5_UNORM'),
+        # D3DFORMAT values stored in the fourcc
+        (b'\x24\x00\x00\x00', u'DXGI_FORMAT_R16G16B16A16_UNORM'),
+        (b'\x6f\x00\x00\x00', u'DXGI_FORMAT_R16_FLOAT'),
+        (b'\x70\x00\x00\x00', u'DXGI_FORMAT_R16G16_FLOAT'),
+        (b'\x71\x00\x00\x00', u'DXGI_FORMAT_R16G16B16A16_FLOAT'),
+        (b'\x72\x00\x00\x00', u'DXGI_FORMAT_R32_FLOAT'),
+        (b'\x73\x00\x00\x00', u'DXGI_FORMAT_R32G32_FLOAT'),
+        (b'\x74\x00\x00\x00', u'DXGI_FORMAT_R32G32B32A32_FLOAT')):
+    _legacy_formats[_four_cc] = _dxgi_by_name[_fmt_name]
+del _four_cc, _fmt_name
+
 # https://docs.microsoft.com/en-us/windows/win32/direct3ddds/dds-header
 class _DDSHeader(object):
     """A DDS header, contains a pixel format."""
@@ -606,13 +638,74 @@ def load_file(self):
 
     def load_from_stream(self, ins):
         """Load the entire DDS file from the specified stream."""
-        self.dds_header.load_header(ins)
-        # Check if a DXT10 header is going to be present
-        if self.dds_header.ddspf.needs_dxt10:
-            self.dds_dxt10.load_header(ins)
+        self.load_headers(ins)
         # Read and store the rest of the stream
         self.dds_contents = ins.read()
 
+    def load_headers(self, ins):
+        """Load just the DDS header and the DXT10 one, if present, from the
+        specified stream - at most DDS_HEADERS_SIZE bytes are read."""
+        try:
+            self.dds_header.load_header(ins)
+            # Check if a DXT10 header is going to be present
+            if self.dds_header.ddspf.needs_dxt10:
+                self.dds_dxt10.load_header(ins)
+        except struct_error as e:
+            raise DDSError(u'Truncated header (%s)' % e)
+
+    @property
+    def dxgi_format(self):
+        """The DXGI format of this file, or None if it uses a legacy format
+        with no DXGI equivalent (e.g. 24 bit RGB).
+        :rtype: _DXGIFormat | None"""
+        ddspf = self.dds_header.ddspf
+        if ddspf.needs_dxt10: return self.dds_dxt10.dxgi_format
+        return _legacy_formats.get(_pf_key(ddspf))
+
+    @property
+    def format_name(self):
+        """A short name for the format of this file (e.g. BC7_UNORM)."""
+        dxgi_fmt = self.dxgi_format
+        if dxgi_fmt is not None:
+            return dxgi_fmt._fmt_name[len(u'DXGI_FORMAT_'):]
+        ddspf = self.dds_header.ddspf
+        if ddspf.pf_flags.DDPF_FOURCC:
+            return u'%r' % ddspf.pf_four_cc
+        return u'RGB%u' % ddspf.pf_rgb_bit_count
+
+    @property
+    def is_compressed(self):
+        dxgi_fmt = self.dxgi_format
+        return dxgi_fmt is not None and dxgi_fmt._fmt_compressed
+
+    def estimate_vram(self):
+        """Return the size in bytes of the texture data, including all mip
+        levels, cubemap faces and array slices - roughly what the texture
+        takes up in video memory."""
+        header = self.dds_header
+        dxgi_fmt = self.dxgi_format
+        if dxgi_fmt is not None:
+            compute_pitch = _compute_pitch[dxgi_fmt._fmt_name]
+            bpp = dxgi_fmt._fmt_bpp
+        else:
+            compute_pitch = _compute_default
+            bpp = header.ddspf.pf_rgb_bit_count
+        surfaces = 1
+        if header.ddspf.needs_dxt10:
+            surfaces = max(1, self.dds_dxt10.array_size)
+            # 0x4 == DDS_RESOURCE_MISC_TEXTURECUBE
+            if self.dds_dxt10.misc_flag & 0x4: surfaces *= 6
+        elif header.dw_caps2.DDSCAPS2_CUBEMAP:
+            surfaces = 6
+        width, height = header.dw_width, header.dw_height
+        depth = header.dw_depth if header.dw_caps2.DDSCAPS2_VOLUME else 1
+        total = 0
+        for _mip in xrange(max(1, header.dw_mip_map_count)):
+            total += compute_pitch(bpp, width, height)[1] * max(1, depth)
+            width, height, depth = (max(1, width >> 1), max(1, height >> 1),
+                                    depth >> 1)
+        return total * surfaces
+
     def dump_file(self):
         """Dumps this DDS file to a bytestring and returns the result."""
         out_data = self.dds_header.dump_header()
@@ -648,3 +741,128 @@ def mk_dxgi_fmt(fmt_index):
         return _DXGIFormat.index_to_fmt[fmt_index]
     except KeyError:
         raise DDSError(u'Unknown DXGI format with index %u' % fmt_index)
+
+# Batch scanning --------------------------------------------------------------
+class DDSHeaderInfo(object):
+    """The stats of one texture, as read from its headers - error is None
+    unless the headers are malformed (or could not be read), in which case
+    the rest is unset."""
+    __slots__ = (u'dds_path', u'format_name', u'width', u'height',
+                 u'mip_count', u'vram_size', u'is_compressed', u'error')
+
+    def __init__(self, dds_path, dds_headers):
+        self.dds_path = dds_path
+        self.error = None
+        dds_file = DDSFile(u'')
+        try:
+            dds_file.load_headers(io.BytesIO(dds_headers))
+            self.format_name = dds_file.format_name
+            self.vram_size = dds_file.estimate_vram()
+        except DDSError as e:
+            self.error = u'%s' % e
+            return
+        self.width = dds_file.dds_header.dw_width
+        self.height = dds_file.dds_header.dw_height
+        self.mip_count = dds_file.dds_header.dw_mip_map_count
+        self.is_compressed = dds_file.is_compressed
+
+    @classmethod
+    def failed(cls, dds_path, error):
+        """Return an info for a texture (or BSA) that could not be read."""
+        info = cls(dds_path, b'')
+        info.error = u'%s' % error
+        return info
+
+def _read_headers(dds_path):
+    try:
+        with open(dds_path, u'rb') as ins:
+            return ins.read(DDS_HEADERS_SIZE)
+    except EnvironmentError as e:
+        return e
+
+def scan_loose_textures(root_dir, rel_paths):
+    """Read the headers of the textures at the specified paths, relative to
+    root_dir, over a thread pool - return a list of DDSHeaderInfo in the
+    order of rel_paths. Only the first DDS_HEADERS_SIZE bytes of each file
+    are read."""
+    rel_paths = list(rel_paths)
+    results = []
+    for rel_path, dds_headers in zip(rel_paths, imap_ordered(_read_headers,
+            [os.path.join(root_dir, r) for r in rel_paths])):
+        if isinstance(dds_headers, EnvironmentError):
+            info = DDSHeaderInfo.failed(rel_path, dds_headers)
+        else:
+            info = DDSHeaderInfo(rel_path, dds_headers)
+        results.append(info)
+    return results
+
+def scan_bsa_textures(bsa):
+    """Read the headers of all textures in the specified BSA/BA2 - see
+    ABsa.read_asset_heads. Return a list of DDSHeaderInfo, sorted by path."""
+    heads = bsa.read_asset_heads(
+        [a for a in bsa.assets if a.endswith(u'.dds')], DDS_HEADERS_SIZE)
+    return [DDSHeaderInfo(a, h) for a, h in sorted(heads.iteritems())]
+
+class TextureReport(object):
+    """Collects the DDSHeaderInfo of the textures of several packages
+    (installers, BSAs) and renders a report of them."""
+    # textures at least this wide or high are listed as oversized if they are
+    # not block compressed
+    huge_dimension = 4096
+
+    def __init__(self):
+        self._packages = [] # (package name, [DDSHeaderInfo])
+
+    def add_package(self, package_name, header_infos):
+        self._packages.append((package_name, header_infos))
+
+    def render(self, top_count=10):
+        """Return the report as text - per package, the textures by format,
+        the total estimated VRAM, the biggest textures, the uncompressed
+        oversized ones and the malformed ones."""
+        buff = io.StringIO()
+        grand_total = 0
+        for package_name, infos in self._packages:
+            valid = [i for i in infos if i.error is None]
+            malformed = [i for i in infos if i.error is not None]
+            total_vram = sum(i.vram_size for i in valid)
+            grand_total += total_vram
+            buff.write(u'=== %s\n' % package_name)
+            buff.write(_(u'Textures: %u, estimated VRAM: %s') % (
+                len(infos), round_size(total_vram)) + u'\n')
+            by_format = defaultdict(lambda: [0, 0])
+            for info in valid:
+                fmt_stats = by_format[info.format_name]
+                fmt_stats[0] += 1
+                fmt_stats[1] += info.vram_size
+            for fmt_name, (count, vram) in sorted(
+                    by_format.iteritems(), key=lambda f: -f[1][1]):
+                buff.write(u'  %s: %u (%s)\n' % (fmt_name, count,
+                                                 round_size(vram)))
+            biggest = sorted(valid, key=lambda i: -i.vram_size)[:top_count]
+            if biggest:
+                buff.write(_(u'Biggest:') + u'\n')
+                for info in biggest:
+                    buff.write(self._info_line(info))
+            huge = [i for i in valid if not i.is_compressed and max(
+                i.width, i.height) >= self.huge_dimension]
+            if huge:
+                buff.write(_(u'Uncompressed, %u or larger:') %
+                           self.huge_dimension + u'\n')
+                for info in huge:
+                    buff.write(self._info_line(info))
+            if malformed:
+                buff.write(_(u'Malformed:') + u'\n')
+                for info in malformed:
+                    buff.write(u'  %s: %s\n' % (info.dds_path, info.error))
+            buff.write(u'\n')
+        if len(self._packages) > 1:
+            buff.write(_(u'Total estimated VRAM: %s') % round_size(
+                grand_total) + u'\n')
+        return buff.getvalue()
+
+    @staticmethod
+    def _info_line(info):
+        return u'  %s: %ux%u %s, %u mips, %s\n' % (
+            info.dds_path, info.width, info.height, info.format_name,
+            info.mip_count, round_size(info.vram_size))
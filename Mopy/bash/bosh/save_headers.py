@@ -52,22 +52,82 @@ def _pack_c(out, value, __pack=structs_cache[u'=c'].pack):
     out.write(__pack(value))
 unpack_fstr16 = partial(unpack_string, string_len=16)
 
+def downscale_image(width, height, image_data, bpp, max_width, max_height):
+    """Shrink the specified image (pixels of bpp bytes, row by row) by the
+    integer factor that brings it closest to max_width x max_height without
+    going below either, keeping its aspect ratio, by sampling every nth pixel
+    of every nth row. Return a (width, height, image_data) tuple."""
+    step = max(1, min(int(round(width / max_width)),
+                      int(round(height / max_height))))
+    if step == 1: return width, height, image_data
+    new_width, new_height = width // step, height // step
+    row_size, new_row_size = width * bpp, new_width * bpp
+    out = bytearray(new_row_size * new_height)
+    for y in xrange(new_height):
+        row = image_data[y * step * row_size:(y * step + 1) * row_size]
+        out_pos = y * new_row_size
+        for channel in xrange(bpp):
+            out[out_pos + channel:out_pos + new_row_size:bpp] = row[
+                channel:channel + new_width * step * bpp:step * bpp]
+    return new_width, new_height, bytes(out)
+
 class SaveFileHeader(object):
     save_magic = b'OVERRIDE'
     # common slots Bash code expects from SaveHeader (added header_size and
     # turned image to a property)
     __slots__ = (u'header_size', u'pcName', u'pcLevel', u'pcLocation',
                  u'gameDays', u'gameTicks', u'ssWidth', u'ssHeight', u'ssData',
-                 u'masters', u'_save_path', u'_mastersStart')
+                 u'masters', u'_save_path', u'_mastersStart', u'_thumbnail',
+                 u'_image_offset')
     # map slots to (seek position, unpacker) - seek position negative means
     # seek relative to ins.tell(), otherwise to the beginning of the file
     unpackers = OrderedDict()
+    # the screenshot is shown in the Saves tab at about this size
+    thumbnail_size = (256, 192)
+    # (save path, size, mtime) -> screenshot, for the last few screenshots
+    # decoded via image_parameters
+    _decoded_images = OrderedDict()
+    _max_decoded_images = 8
 
     def __init__(self, save_path, load_image=False, ins=None):
         self._save_path = save_path
         self.ssData = None # lazily loaded at runtime
+        self._thumbnail = None
         self.read_save_header(load_image, ins)
 
+    @classmethod
+    def _cached_attrs(cls):
+        return [a for t in cls.__mro__ for a in getattr(t, u'__slots__', ())
+                if a not in (u'_save_path', u'ssData', u'_thumbnail')]
+
+    def dump_cache(self):
+        """Return the attributes of this header and its thumbnail, if it was
+        created, as a tuple of builtin types - see from_cache."""
+        state = {}
+        for attr in self._cached_attrs():
+            try:
+                state[attr] = getattr(self, attr)
+            except AttributeError:
+                continue # only set for some versions of the save format
+        state[u'masters'] = [m.s for m in self.masters]
+        return state, self._thumbnail
+
+    @classmethod
+    def from_cache(cls, save_path, cached):
+        """Create a header from the output of dump_cache, without reading
+        the save."""
+        state, thumbnail = cached
+        header = cls.__new__(cls)
+        header._save_path = save_path
+        header.ssData = None
+        for attr, val in state.iteritems():
+            setattr(header, attr, val)
+        header.masters = [bolt.GPath_no_norm(m) for m in state[u'masters']]
+        if thumbnail is not None: # (width, height, image data)
+            thumbnail = (thumbnail[0], thumbnail[1], thumbnail[2])
+        header._thumbnail = thumbnail
+        return header
+
     def read_save_header(self, load_image=False, ins=None):
         """Fully reads this save header, optionally loading the image as
         well."""
@@ -106,12 +166,23 @@ def dump_header(self, out):
         raise AbstractError
 
     def load_image_data(self, ins, load_image=False):
-        bpp = (4 if self.has_alpha else 3)
-        image_size = bpp * self.ssWidth * self.ssHeight
+        self._image_offset = ins.tell()
         if load_image:
-            self.ssData = bytearray(ins.read(image_size))
+            self.ssData = bytearray(ins.read(self._image_size()))
         else:
-            ins.seek(image_size, 1)
+            ins.seek(self._image_size(), 1)
+
+    def _image_size(self):
+        return (4 if self.has_alpha else 3) * self.ssWidth * self.ssHeight
+
+    def _read_image(self):
+        """Read the screenshot from the save, as load_image_data would."""
+        with self._save_path.open(u'rb') as ins:
+            ins.seek(self._image_offset)
+            image_data = ins.read(self._image_size())
+        if len(image_data) != self._image_size():
+            raise SaveHeaderError(u'Screenshot truncated')
+        return bytearray(image_data)
 
     def load_masters(self, ins):
         self._mastersStart = ins.tell()
@@ -134,7 +205,40 @@ def image_loaded(self):
 
     @property
     def image_parameters(self):
-        return self.ssWidth, self.ssHeight, self.ssData, self.has_alpha
+        """The screenshot, as (width, height, data, has alpha). Unless it was
+        loaded along with the header, it is read from the save when first
+        requested - only the last few screenshots read are kept."""
+        ss_data = self.ssData
+        if ss_data is None:
+            try:
+                image_key = (self._save_path,) + self._save_path.size_mtime()
+                decoded = self._decoded_images
+                ss_data = decoded.pop(image_key, None)
+                if ss_data is None:
+                    ss_data = self._read_image()
+                decoded[image_key] = ss_data # most recently used last
+                while len(decoded) > self._max_decoded_images:
+                    decoded.popitem(last=False)
+            except (OSError, IOError):
+                bolt.deprint(u'Failed to read the screenshot of %s' %
+                             self._save_path, traceback=True)
+                raise_bolt_error(u'Failed to read the screenshot of %s' %
+                                 self._save_path, SaveHeaderError)
+        return self.ssWidth, self.ssHeight, ss_data, self.has_alpha
+
+    @property
+    def thumbnail_parameters(self):
+        """The screenshot downscaled to about thumbnail_size, in the format
+        of image_parameters."""
+        if self._thumbnail is None:
+            width, height, ss_data, has_alpha = self.image_parameters
+            self._thumbnail = downscale_image(width, height, bytes(ss_data),
+                4 if has_alpha else 3, *self.thumbnail_size)
+        width, height, ss_data = self._thumbnail
+        return width, height, bytearray(ss_data), self.has_alpha
+
+    @property
+    def has_thumbnail(self): return self._thumbnail is not None
 
     def writeMasters(self, ins, out):
         """Rewrites masters of existing save file."""
@@ -335,17 +439,17 @@ def _load_masters_16(self, ins, sse_offset=0): # common for skyrim and FO4
                     mastersSize))
 
     def _sse_compress(self, to_compress):
-        """Compresses the specified data using either LZ4 or zlib, depending on
-        self._compressType. Do not call for uncompressed files!"""
+        """Compresses the specified data (any buffer) using either LZ4 or
+        zlib, depending on self._compressType. Do not call for uncompressed
+        files!"""
         try:
             if self._compressType == 2:
                 # SSE uses default lz4 settings; store_size is not in docs, so:
                 # noinspection PyArgumentList
-                return lz4.block.compress(to_compress.getvalue(),
-                                          store_size=False)
+                return lz4.block.compress(to_compress, store_size=False)
             else:
                 # SSE uses zlib level 1
-                return zlib.compress(to_compress.getvalue(), 1)
+                return zlib.compress(to_compress, 1)
         except (zlib.error, lz4.block.LZ4BlockError) as e:
             raise SaveHeaderError(u'Failed to compress header: %r' % e)
 
@@ -354,7 +458,10 @@ def _sse_decompress(self, ins, compressed_size, decompressed_size,
         """Decompresses the specified data using either LZ4 or zlib, depending
         on self._compressType. Do not call for uncompressed files!"""
         if self._compressType == 1:
-            decompressor = self._sse_decompress_zlib
+            if light_decompression:
+                decompressor = self._sse_light_decompress_zlib
+            else:
+                decompressor = self._sse_decompress_zlib
         else:
             if light_decompression:
                 decompressor = self._sse_light_decompress_lz4
@@ -375,6 +482,24 @@ def _sse_decompress_zlib(ins, compressed_size, decompressed_size):
                 decompressed_size, len(decompressed_data)))
         return io.BytesIO(decompressed_data)
 
+    @classmethod
+    def _sse_light_decompress_zlib(cls, ins, compressed_size, _decomp_size):
+        """Decompress the start of the zlib compressed data in the SSE
+        savefile, up to the end of the master table - see
+        _sse_light_decompress_lz4."""
+        uncompressed = b''
+        try:
+            for chunk in cls._inflate_chunks(ins, compressed_size, 0x10000):
+                uncompressed += chunk
+                if len(uncompressed) < 5: continue
+                # Stop when we have the whole masters table
+                masters_size = struct_unpack(u'I', uncompressed[1:5])[0]
+                if len(uncompressed) >= masters_size + 5: break
+        except zlib.error as e:
+            raise SaveHeaderError(u'zlib error while decompressing '
+                                  u'zlib-compressed header: %r' % e)
+        return io.BytesIO(uncompressed)
+
     @staticmethod
     def _sse_decompress_lz4(ins, compressed_size, decompressed_size):
         try:
@@ -389,14 +514,103 @@ def _sse_decompress_lz4(ins, compressed_size, decompressed_size):
                 decompressed_size, len(decompressed_data)))
         return io.BytesIO(decompressed_data)
 
-    @staticmethod
-    def _sse_light_decompress_lz4(ins, _comp_size, _decomp_size):
+    @classmethod
+    def _sse_light_decompress_lz4(cls, ins, comp_size, _decomp_size):
         """Read the start of the LZ4 compressed data in the SSE savefile and
         stop when the whole master table is found.
         Return a file-like object that can be read by _load_masters_16
-        containing the now decompressed master table.
+        containing the now decompressed master table. Decodes with lz4,
+        falling back to parsing the block in python if that fails."""
+        start_pos = ins.tell()
+        try:
+            return cls._lz4_decompress_head(ins, comp_size)
+        except SaveHeaderError:
+            bolt.deprint(u'Failed to decompress the masters with lz4, '
+                         u'retrying', traceback=True)
+            ins.seek(start_pos)
+            return cls._lz4_parse_head(ins)
+
+    @classmethod
+    def _lz4_decompress_head(cls, ins, comp_size, chunk_size=0x10000):
+        """Read the start of the LZ4 block in chunks, until a prefix of it
+        that decompresses past the master table is found - the lz4 module has
+        no partial decompression, but it happily decompresses such prefixes,
+        see _lz4_literal_ends."""
+        comp = bytearray()
+        masters_size = None
+        while True:
+            chunk = ins.read(min(chunk_size, comp_size - len(comp)))
+            if not chunk:
+                raise SaveHeaderError(u'lz4-compressed header truncated or '
+                                      u'corrupt.')
+            comp += chunk
+            if masters_size is None:
+                # The masters table's size is found in bytes 1-5
+                head = cls._lz4_decompress_prefix(comp, 5)
+                if head is None: continue
+                masters_size = struct_unpack(u'I', head[1:5])[0]
+            head = cls._lz4_decompress_prefix(comp, masters_size + 5)
+            if head is not None:
+                return io.BytesIO(head)
+
+    @classmethod
+    def _lz4_decompress_prefix(cls, comp, needed):
+        """Return at least the first needed bytes of the data decompressed
+        from comp, the start of an LZ4 block, or None if comp is too short
+        (or corrupt)."""
+        comp_view = memoryview(comp)
+        for cut, size in cls._lz4_literal_ends(comp, needed):
+            try:
+                # noinspection PyArgumentList
+                return lz4.block.decompress(comp_view[:cut],
+                                            uncompressed_size=size + 64)
+            except lz4.block.LZ4BlockError:
+                # The cut tripped one of the end of block checks of the
+                # decoder - try the next one
+                continue
+        return None
+
+    @staticmethod
+    def _lz4_literal_ends(comp, needed):
+        """Yield the offsets in comp, the start of an LZ4 block, that follow
+        the literals of each sequence that decompresses past the first needed
+        bytes, along with the decompressed size up to there. Cut there, the
+        block is still valid - its last sequence merely lacks a match - but
+        the decoder may reject cuts too close to a previous sequence.
         See https://fastcompression.blogspot.se/2011/05/lz4-explained.html
         for an LZ4 explanation/specification."""
+        comp_len = len(comp)
+        pos = size = 0
+        try:
+            while True:
+                token = comp[pos]
+                pos += 1
+                literal_length = token >> 4
+                if literal_length == 15: # LSIC, see _lz4_parse_head
+                    while True:
+                        pos += 1
+                        literal_length += comp[pos - 1]
+                        if comp[pos - 1] != 255: break
+                pos += literal_length
+                if pos > comp_len: return
+                size += literal_length
+                if size >= needed: yield pos, size
+                if pos == comp_len: return # the last sequence
+                pos += 2 # the offset
+                match_length = token & 0b1111
+                if match_length == 15:
+                    while True:
+                        pos += 1
+                        match_length += comp[pos - 1]
+                        if comp[pos - 1] != 255: break
+                size += match_length + 4
+        except IndexError: # ran out of data mid sequence
+            return
+
+    @staticmethod
+    def _lz4_parse_head(ins):
+        """Decompress the start of the LZ4 block in python, stopping after
+        the masters table."""
         def _read_lsic_int():
             # type: () -> int
             """Read a compressed int from the stream.
@@ -410,7 +624,7 @@ def _read_lsic_int():
                 result += num
                 if num != 255:
                     return result
-        uncompressed = b''
+        uncompressed = bytearray()
         masters_size = None  # type: int
         while True:  # parse and decompress each block here
             token = unpack_byte(ins)
@@ -423,29 +637,32 @@ def _read_lsic_int():
             # The offset is how many bytes back in the uncompressed string the
             # start of the match-field (copied bytes) is
             offset = unpack_short(ins)
+            if not 0 < offset <= len(uncompressed):
+                raise SaveHeaderError(u'Invalid LZ4 match offset %d.' % offset)
             # How many bytes long is the match-field?
             match_length = token & 0b1111
             if match_length == 15:
                 match_length += _read_lsic_int()
             match_length += 4  # the match-field always gets an extra 4 bytes
-            # The boundary of the match-field
             start_pos = len(uncompressed) - offset
-            end_pos = start_pos + match_length
-            # Matches can be overlapping (aka including not yet decompressed
-            # data) so we can't jump the whole match_length directly
-            while start_pos < end_pos:
-                uncompressed += uncompressed[start_pos:min(start_pos + offset,
-                                                           end_pos)]
-                start_pos += offset
+            if match_length <= offset:
+                uncompressed += uncompressed[start_pos:start_pos + match_length]
+            else:
+                # Matches can be overlapping (aka including not yet
+                # decompressed data) - that is they repeat the last offset
+                # bytes, so copy those as many times as needed at once
+                repeats, rest = divmod(match_length, offset)
+                pattern = uncompressed[start_pos:]
+                uncompressed += pattern * repeats + pattern[:rest]
             # The masters table's size is found in bytes 1-5
             if masters_size is None and len(uncompressed) >= 5:
-                masters_size = struct_unpack(u'I', uncompressed[1:5])[0]
+                masters_size = struct_unpack(u'I', bytes(uncompressed[1:5]))[0]
             # Stop when we have the whole masters table
             if masters_size is not None:
                 if len(uncompressed) >= masters_size + 5:
                     break
         # Wrap the decompressed data in a file-like object and return it
-        return io.BytesIO(uncompressed)
+        return io.BytesIO(bytes(uncompressed))
 
     def calc_time(self):
         # gameDate format: hours.minutes.seconds
@@ -460,21 +677,117 @@ def writeMasters(self, ins, out):
             return super(SkyrimSaveHeader, self).writeMasters(ins, out)
         # Write out everything up until the compressed portion
         out.write(ins.read(self._sse_start))
-        # Now we need to decompress the portion again
         decompressed_size = unpack_int(ins)
         compressed_size = unpack_int(ins)
-        ins = self._sse_decompress(ins, compressed_size, decompressed_size)
-        # Gather the data that will be compressed
-        to_compress = io.BytesIO()
-        pack_byte(to_compress, self._formVersion)
-        ins.seek(1, 1) # skip the form version
-        old_masters = self._write_masters(ins, to_compress)
-        for block in iter(partial(ins.read, 0x5000000), b''):
-            to_compress.write(block)
-        # Compress the gathered data, write out the sizes and finally write out
-        # the actual compressed data
-        compressed_data = self._sse_compress(to_compress)
-        pack_int(out, to_compress.tell())   # decompressed_size
+        if self._compressType == 1:
+            return self._write_masters_zlib(ins, out, compressed_size,
+                                            decompressed_size)
+        return self._write_masters_lz4(ins, out, compressed_size,
+                                       decompressed_size)
+
+    def _rewrite_masters_head(self, body):
+        """Rewrite the masters in the start of the decompressed body - which
+        must extend past the file location table, see _masters_head_size.
+        Return the old masters, the rewritten head and the size of the head
+        it replaces."""
+        head_size = self._masters_head_size(body)
+        ins = io.BytesIO(bytes(body[:head_size]))
+        ins.seek(1) # skip the form version
+        new_head = io.BytesIO()
+        pack_byte(new_head, self._formVersion)
+        old_masters = self._write_masters(ins, new_head)
+        return old_masters, new_head.getvalue(), head_size
+
+    @staticmethod
+    def _masters_head_size(body):
+        """Return the size of the start of the decompressed body that
+        _write_masters rewrites - form version, masters and file location
+        table - or None if body is too short to tell."""
+        if len(body) < 5: return None
+        return 5 + struct_unpack(u'I', bytes(body[1:5]))[0] + 24
+
+    def _write_masters_zlib(self, ins, out, compressed_size,
+                            decompressed_size):
+        """Stream the zlib compressed body through a decompressor and a
+        compressor, rewriting the masters on the way, so that only a chunk of
+        it is in memory at a time. The sizes are patched in once known."""
+        sizes_pos = out.tell()
+        out.write(b'\x00' * 8) # decompressed_size, compressed_size
+        compressor = zlib.compressobj(1) # SSE uses zlib level 1
+        old_masters = head = None
+        old_total = new_total = new_compressed = 0
+        try:
+            for chunk in self._inflate_chunks(ins, compressed_size):
+                old_total += len(chunk)
+                if old_masters is None: # gather the head in the first chunks
+                    head = chunk if head is None else head + chunk
+                    head_size = self._masters_head_size(head)
+                    if head_size is None or len(head) < head_size: continue
+                    old_masters, new_head, head_size = \
+                        self._rewrite_masters_head(head)
+                    chunk = new_head + head[head_size:]
+                    head = None
+                new_total += len(chunk)
+                chunk = compressor.compress(chunk)
+                new_compressed += len(chunk)
+                out.write(chunk)
+            chunk = compressor.flush()
+        except zlib.error as e:
+            raise SaveHeaderError(u'zlib error while rewriting zlib-compressed '
+                                  u'header: %r' % e)
+        if old_masters is None or old_total != decompressed_size:
+            raise SaveHeaderError(u'zlib-decompressed header size incorrect - '
+                                  u'expected %u, but got %u.' % (
+                decompressed_size, old_total))
+        out.write(chunk)
+        new_compressed += len(chunk)
+        end_pos = out.tell()
+        out.seek(sizes_pos)
+        pack_int(out, new_total)
+        pack_int(out, new_compressed)
+        out.seek(end_pos)
+        return old_masters
+
+    @staticmethod
+    def _inflate_chunks(ins, compressed_size, chunk_size=0x400000):
+        """Yield the zlib decompressed data in ins in chunks of at most
+        chunk_size bytes, reading compressed_size bytes."""
+        decompressor = zlib.decompressobj()
+        remaining = compressed_size
+        while remaining > 0:
+            data = ins.read(min(remaining, chunk_size))
+            if not data:
+                raise SaveHeaderError(u'Truncated zlib-compressed header.')
+            remaining -= len(data)
+            while data:
+                chunk = decompressor.decompress(data, chunk_size)
+                data = decompressor.unconsumed_tail
+                if chunk: yield chunk
+        chunk = decompressor.flush()
+        if chunk: yield chunk
+
+    def _write_masters_lz4(self, ins, out, compressed_size,
+                           decompressed_size):
+        """SSE compresses the body as a single LZ4 block, which can't be
+        produced piecewise - decompress it into a bytearray and rewrite the
+        masters in place instead, so that it is not copied around."""
+        try:
+            # The buffer is allocated at this size - anything else is an
+            # error anyway
+            # noinspection PyArgumentList
+            body = lz4.block.decompress(ins.read(compressed_size),
+                uncompressed_size=decompressed_size, return_bytearray=True)
+        except lz4.block.LZ4BlockError as e:
+            raise SaveHeaderError(u'LZ4 error while decompressing '
+                                  u'lz4-compressed header: %r' % e)
+        if len(body) != decompressed_size:
+            raise SaveHeaderError(u'lz4-decompressed header size incorrect - '
+                                  u'expected %u, but got %u.' % (
+                decompressed_size, len(body)))
+        old_masters, new_head, head_size = self._rewrite_masters_head(body)
+        body[:head_size] = new_head
+        compressed_data = self._sse_compress(body)
+        pack_int(out, len(body))            # decompressed_size
         pack_int(out, len(compressed_data)) # compressed_size
         out.write(compressed_data)
         return old_masters
@@ -557,7 +870,7 @@ def parse_int(gd_bytes):
 
     def writeMasters(self, ins, out):
         # Call the SaveFileHeader version - *not* the Skyrim one
-        super(SkyrimSaveHeader, self).writeMasters(ins, out)
+        return super(SkyrimSaveHeader, self).writeMasters(ins, out)
 
 class FalloutNVSaveHeader(SaveFileHeader):
     save_magic = b'FO3SAVEGAME'
@@ -660,16 +973,23 @@ def load_header(self, ins, load_image=False):
         self.pc_curr_health = save_info.header.pc_curr_health
         self.pc_max_health = save_info.header.pc_max_health
         if load_image:
-            # Read the image data - note that it comes as BGRA, which we
-            # need to turn into RGB. Note that we disregard the alpha, seems to
-            # make the image 100% black and is therefore unusable.
-            out = io.BytesIO()
-            for pxl in save_info.header.screenshot_data:
-                out.write(
-                    structs_cache[u'3B'].pack(pxl.red, pxl.green, pxl.blue))
-            self.ssData = out.getvalue()
+            self.ssData = self._convert_image(save_info)
         self.ssHeight = self.ssWidth = 128 # fixed size for Morrowind
 
+    @staticmethod
+    def _convert_image(save_info):
+        # Read the image data - note that it comes as BGRA, which we need to
+        # turn into RGB. Note that we disregard the alpha, seems to make the
+        # image 100% black and is therefore unusable.
+        out = io.BytesIO()
+        for pxl in save_info.header.screenshot_data:
+            out.write(structs_cache[u'3B'].pack(pxl.red, pxl.green, pxl.blue))
+        return out.getvalue()
+
+    def _read_image(self):
+        from . import ModInfo
+        return self._convert_image(ModInfo(self._save_path, load_cache=True))
+
     @property
     def can_edit_header(self):
         # TODO(inf) Once we support writing Morrowind plugins, implement
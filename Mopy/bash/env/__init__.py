@@ -45,7 +45,7 @@
 except ImportError:
     shell = shellcon = None
 
-from ..bolt import deprint, Path
+from ..bolt import deprint, Path, imap_ordered
 from ..exception import CancelError, SkipError, AccessDeniedError, \
     DirectoryFileCollisionError, FileOperationError
 
@@ -266,3 +266,84 @@ def _filterUnixPaths(path):
     finally:
         for tmpDir in tempDirs:
             tmpDir.rmtree(safety=tmpDir.stail)
+
+# Parallel file copying -------------------------------------------------------
+_COPY_BUFFER = 1048576 # 1MB
+
+def _copy_file(src, dest, move, link):
+    """Copy, move or link src to dest. An existing dest is removed first, so
+    if it is a link the file it links to is left alone. Moves are renames
+    when src and dest are on the same filesystem, copies are reflinks where
+    the filesystem supports them. Return True if dest was linked to src."""
+    dest_dir = os.path.dirname(dest)
+    try:
+        os.makedirs(dest_dir)
+    except OSError as e: # another worker may have created it meanwhile
+        if e.errno != errno.EEXIST or not os.path.isdir(dest_dir): raise
+    if os.path.lexists(dest): os.remove(dest)
+    if move:
+        try:
+            os.rename(src, dest)
+            return False
+        except OSError: pass # probably another filesystem, copy instead
+    elif link:
+        try:
+            link_file(src, dest)
+            return True
+        except OSError: pass # copy instead
+    with open(src, u'rb') as ins:
+        with open(dest, u'wb') as out:
+            if not clone_file(ins, out):
+                shutil.copyfileobj(ins, out, _COPY_BUFFER)
+    shutil.copystat(src, dest)
+    if move: os.remove(src)
+    return False
+
+def break_link(path):
+    """Replace the file path, a hardlink or symlink to another file, with a
+    copy of that file, so that changing one no longer changes the other."""
+    temp_path = path + u'.tmp'
+    shutil.copy2(path, temp_path)
+    os.remove(path)
+    os.rename(temp_path, path)
+
+def copy_files(sources, dests, move=False, link=False, progress=None,
+               no_link_exts=frozenset()):
+    """Copy (or move, if move is True) each file in sources to the matching
+    path in dests, replacing existing files, using a bounded pool of worker
+    threads. If link is True, hardlink (or symlink) instead of copying where
+    possible - except for destinations whose (lower case) extension is in
+    no_link_exts, which are always copied. Progress is reported per byte,
+    from the calling thread, as files complete. Return the (source, dest)
+    pairs that failed - for instance because the destination is under UAC
+    protection - so the caller can retry them via shellCopy/shellMove, and
+    the (source, dest) pairs that were linked.
+
+    :type sources: list[Path]
+    :type dests: list[Path]"""
+    pairs, sizes = [], []
+    for src, dest in izip(sources, dests):
+        pairs.append((src, dest))
+        try:
+            sizes.append(os.path.getsize(src.s) + 1) # count empty files too
+        except OSError:
+            sizes.append(1) # will fail below
+    if progress is not None: progress.setFull(max(sum(sizes), 1))
+    def _do_copy(pair):
+        try:
+            return _copy_file(pair[0].s, pair[1].s, move,
+                              link and pair[1].cext not in no_link_exts)
+        except (OSError, IOError) as e:
+            return e
+    failed, linked, done = [], [], 0
+    for pair, size, result in izip(pairs, sizes, imap_ordered(
+            _do_copy, pairs)):
+        if result is True:
+            linked.append(pair)
+        elif result is not False:
+            deprint(u'Failed to %s %s to %s: %r' % (
+                u'move' if move else u'copy', pair[0], pair[1], result))
+            failed.append(pair)
+        done += size
+        if progress is not None: progress(done)
+    return failed, linked
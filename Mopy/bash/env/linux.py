@@ -212,6 +212,31 @@ def python_tools_dir():
 def convert_separators(p):
     return p.replace(u'\\', u'/')
 
+_FICLONE = 0x40049409 # _IOW(0x94, 9, int), from linux/fs.h
+
+def clone_file(src_file, dest_file):
+    """Try to make dest_file share the data blocks of src_file (a reflink),
+    which is instant on copy on write filesystems (btrfs, xfs...). Both are
+    open file objects. Return True if that succeeded."""
+    import fcntl
+    try:
+        fcntl.ioctl(dest_file.fileno(), _FICLONE, src_file.fileno())
+        return True
+    except (IOError, OSError): # not supported, or different filesystems
+        return False
+
+def link_file(src, dest):
+    """Make dest a hardlink to src, or a symlink if src is on another
+    filesystem. Raises OSError if neither is possible."""
+    try:
+        os.link(src, dest)
+    except OSError:
+        os.symlink(src, dest)
+
+def file_is_linked(path):
+    """Return True if path is a symlink or a file with other hardlinks."""
+    return os.path.islink(path) or os.stat(path).st_nlink > 1
+
 # API - Classes ===============================================================
 class TaskDialog(object):
     def __init__(self, _title, _heading, _content, _buttons=(),
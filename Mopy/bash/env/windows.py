@@ -30,11 +30,12 @@
 import _winreg as winreg  # PY3
 from ctypes import byref, c_wchar_p, c_void_p, POINTER, Structure, windll, \
     wintypes, WINFUNCTYPE, c_uint, c_long, Union, c_ushort, c_int, \
-    c_longlong, c_ulong, c_wchar, sizeof, wstring_at, ARRAY
+    c_longlong, c_ulong, c_wchar, sizeof, wstring_at, ARRAY, WinError
 from uuid import UUID
 
 import win32api
 import win32com.client as win32client
+import win32file
 import win32gui
 
 from ..bolt import GPath, deprint, Path
@@ -775,6 +776,32 @@ def convert_separators(p):
     """Converts other OS's path separators to separators for this OS."""
     return p.replace(u'/', u'\\')
 
+def clone_file(src_file, dest_file):
+    """Block cloning (on ReFS) is not supported yet, always returns False so
+    that the file gets copied."""
+    return False
+
+def link_file(src, dest):
+    """Make dest a hardlink to src. Symlinks need admin rights (or developer
+    mode), so unlike on Linux we don't fall back to those. Raises OSError if
+    src and dest are on different volumes or the filesystem is not NTFS."""
+    if not windll.kernel32.CreateHardLinkW(dest, src, None):
+        raise WinError()
+
+def file_is_linked(path):
+    """Return True if path is a file with other hardlinks. Raises OSError if
+    the file can't be opened."""
+    try:
+        handle = win32file.CreateFile(path, 0, win32file.FILE_SHARE_READ |
+            win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE, None,
+            win32file.OPEN_EXISTING, 0, None)
+        try: # the eighth field is nNumberOfLinks
+            return win32file.GetFileInformationByHandle(handle)[7] > 1
+        finally:
+            handle.Close()
+    except win32api.error as e:
+        raise WinError(e.winerror)
+
 # API - Classes ===============================================================
 # The same note about the taskdialog license from above applies to the section
 # below.
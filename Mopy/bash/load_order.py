@@ -57,7 +57,7 @@
 locked = False
 warn_locked = False
 _lords_pickle = None # type: bolt.PickleDict
-_LORDS_PICKLE_VERSION = 2
+_LORDS_PICKLE_VERSION = 3
 # active mod lists were saved in BashSettings.dat - sentinel needed for moving
 # them to BashloadOrder.dat
 __active_mods_sentinel = {}
@@ -101,14 +101,14 @@ class LoadOrder(object):
     def __init__(self, loadOrder=__empty, active=__none):
         """:type loadOrder: list | set | tuple
         :type active: list | set | tuple"""
-        if set(active) - set(loadOrder):
-            raise exception.BoltError(
-                u'Active mods with no load order: ' + u', '.join(
-                    [x.s for x in (set(active) - set(loadOrder))]))
         self._loadOrder = tuple(loadOrder)
         self._active = frozenset(active)
-        self.__mod_loIndex = {a: i for i, a in enumerate(loadOrder)}
-        # below would raise key error if active have no loadOrder
+        self.__mod_loIndex = {a: i for i, a in enumerate(self._loadOrder)}
+        no_lo = self._active.difference(self.__mod_loIndex)
+        if no_lo:
+            raise exception.BoltError(
+                u'Active mods with no load order: ' + u', '.join(
+                    [x.s for x in no_lo]))
         self._activeOrdered = tuple(
             sorted(active, key=self.__mod_loIndex.__getitem__))
         self.__mod_actIndex = {a: i for i, a in enumerate(self._activeOrdered)}
@@ -159,24 +159,152 @@ def __str__(self):
 
 # Saved load orders
 lo_entry = collections.namedtuple(u'lo_entry', [u'date', u'lord'])
-_saved_load_orders = [] # type: list[lo_entry]
+
+def _lo_diff(lord_a, lord_b):
+    """Return the difference of load order lord_b from lord_a, as a
+    (removed, inserted, activated, deactivated) tuple. removed holds the
+    (index, mod) pairs of the mods removed from lord_a's load order and
+    inserted the (index, mod) pairs of the mods then inserted to get
+    lord_b's - a mod moved is removed and reinserted. Only the mods that are
+    not in the longest run of mods keeping their relative order between the
+    first and the last difference are moved, so a diff is proportional to
+    the mods moved rather than to the length of the load order.
+    :type lord_a: LoadOrder
+    :type lord_b: LoadOrder"""
+    lo_a, lo_b = lord_a.loadOrder, lord_b.loadOrder
+    removed = inserted = ()
+    if lo_a != lo_b:
+        max_common = min(len(lo_a), len(lo_b))
+        start = 0
+        while start < max_common and lo_a[start] == lo_b[start]:
+            start += 1
+        end_a, end_b = len(lo_a), len(lo_b)
+        while end_a > start and end_b > start and \
+                lo_a[end_a - 1] == lo_b[end_b - 1]:
+            end_a -= 1
+            end_b -= 1
+        mod_index_a = {m: i for i, m in enumerate(lo_a[start:end_a], start)}
+        middle_b = lo_b[start:end_b]
+        kept_b = bolt.longest_increasing(middle_b, key=mod_index_a.get)
+        kept_a = {mod_index_a[middle_b[i]] for i in kept_b}
+        removed = tuple((i, lo_a[i]) for i in xrange(start, end_a) if
+                        i not in kept_a)
+        inserted = tuple((i + start, m) for i, m in enumerate(middle_b) if
+                         i not in kept_b)
+    return removed, inserted, tuple(lord_b.active - lord_a.active), tuple(
+        lord_a.active - lord_b.active)
+
+def _apply_lo_diff(lo, active, diff, undo=False):
+    """Apply diff (see _lo_diff) to the load order and active mods - or
+    revert it, if undo is True.
+    :type lo: list[bolt.Path]
+    :type active: set[bolt.Path]"""
+    removed, inserted, activated, deactivated = diff
+    if undo:
+        removed, inserted = inserted, removed
+        activated, deactivated = deactivated, activated
+    for i, _mod in reversed(removed):
+        del lo[i]
+    for i, mod in inserted:
+        lo.insert(i, mod)
+    active.difference_update(deactivated)
+    active.update(activated)
+
+class _LoHistory(object):
+    """The saved load orders, a sequence of lo_entry tuples supporting
+    insertion. Stored as the first load order followed by the difference
+    of each load order from the previous one, so the load orders in it are
+    recreated on access - walking the differences from the load order last
+    accessed, which is usually the current one or next to it."""
+
+    def __init__(self, first=None, entries=()):
+        # (loadOrder, activeOrdered) tuples of the first load order
+        self._first = first
+        # (date, diff from the previous load order) - None for the first
+        self._entries = list(entries)
+        self._cached_index, self._cached = -1, None # type: int, LoadOrder
+
+    def __len__(self): return len(self._entries)
+
+    def __getitem__(self, index):
+        if index < 0: index += len(self._entries)
+        date = self._entries[index][0] # raise IndexError if out of range
+        if index != self._cached_index:
+            start, cached = self._cached_index, self._cached
+            if start < 0 or index < start - index: # closer to the first one
+                lo, active = list(self._first[0]), set(self._first[1])
+                start = 0
+            else:
+                lo, active = list(cached.loadOrder), set(cached.active)
+            entries = self._entries
+            for i in xrange(start + 1, index + 1): # forwards
+                _apply_lo_diff(lo, active, entries[i][1])
+            for i in xrange(start, index, -1): # backwards
+                _apply_lo_diff(lo, active, entries[i][1], undo=True)
+            self._cached_index, self._cached = index, LoadOrder(lo, active)
+        return lo_entry(date, self._cached)
+
+    def insert(self, index, entry):
+        """Insert entry at index - the load order after it is diffed
+        against the new one instead of the one before it."""
+        entries = self._entries
+        index = max(0, min(index, len(entries)))
+        lord = entry.lord
+        # diff against the old neighbours before touching the entries
+        new_entry = (entry.date, _lo_diff(self[index - 1].lord, lord)
+                     if index else None)
+        if index < len(entries):
+            next_date, next_lord = self[index]
+            entries[index] = (next_date, _lo_diff(lord, next_lord))
+        if index == 0:
+            self._first = (lord.loadOrder, lord.activeOrdered)
+        entries.insert(index, new_entry)
+        self._cached_index, self._cached = index, lord
+
+    def dump(self, start=0, stop=None):
+        """Return the entries from start up to stop as a tuple of picklable
+        builtins, for from_dump."""
+        stop = len(self._entries) if stop is None else stop
+        if start >= stop: return None
+        first_date, first_lord = self[start]
+        return (first_lord.loadOrder, first_lord.activeOrdered, first_date,
+                self._entries[start + 1:stop])
+
+    @classmethod
+    def from_dump(cls, dumped):
+        if dumped is None: return cls()
+        lo, acti, first_date, entries = dumped
+        return cls((tuple(lo), tuple(acti)), [(first_date, None)] + entries)
+
+    @classmethod
+    def from_entries(cls, lo_entries):
+        """Create a history of the lo_entry tuples saved by older versions.
+        :type lo_entries: list[lo_entry]"""
+        history = cls()
+        for entry in lo_entries:
+            history.insert(len(history), entry)
+        return history
+
+_saved_load_orders = _LoHistory()
 _current_list_index = -1
 
 def _new_entry():
-    _saved_load_orders[_current_list_index:_current_list_index] = [
-        lo_entry(time.time(), cached_lord)]
+    _saved_load_orders.insert(_current_list_index,
+                              lo_entry(time.time(), cached_lord))
 
 def persist_orders(__keep_max=256):
     _lords_pickle.vdata[u'_lords_pickle_version'] = _LORDS_PICKLE_VERSION
     length = len(_saved_load_orders)
     if length > __keep_max:
         x, y = _keep_max(__keep_max, length)
-        _lords_pickle.pickled_data[u'_saved_load_orders'] = \
-            _saved_load_orders[_current_list_index - x:_current_list_index + y]
+        _lords_pickle.pickled_data[u'_lo_history'] = _saved_load_orders.dump(
+            _current_list_index - x, _current_list_index + y)
         _lords_pickle.pickled_data[u'_current_list_index'] = x
     else:
-        _lords_pickle.pickled_data[u'_saved_load_orders'] = _saved_load_orders
+        _lords_pickle.pickled_data[u'_lo_history'] = _saved_load_orders.dump()
         _lords_pickle.pickled_data[u'_current_list_index'] = _current_list_index
+    # the full load orders saved by older versions
+    _lords_pickle.pickled_data.pop(u'_saved_load_orders', None)
     _lords_pickle.pickled_data[u'_active_mods_lists'] = _active_mods_lists
     ##: save them also in BashSettings.dat in case someone downgrades - drop !
     bass.settings[u'bash.loadLists.data'] = _active_mods_lists
@@ -238,10 +366,18 @@ def get_ordered(mod_paths):
     :type mod_paths: collections.Iterable[bolt.Path]
     :rtype : list[bolt.Path]
     """
-    # resolve time conflicts or no load order
-    mod_paths = sorted(mod_paths)
-    mod_paths.sort(key=cached_lo_index_or_max)
-    return mod_paths
+    # load order indices are unique, so only the mods without one need the
+    # (slower) alphabetical sort
+    indexed, no_lo = [], []
+    lindex = cached_lord.lindex
+    for mod in mod_paths:
+        try:
+            indexed.append((lindex(mod), mod))
+        except KeyError:
+            no_lo.append(mod)
+    indexed.sort()
+    no_lo.sort()
+    return [mod for _dex, mod in indexed] + no_lo
 
 def filter_pinned(imods):
     return filter(_game_handle.pinned_mods().__contains__, imods)
@@ -375,14 +511,19 @@ def __load_pickled_load_orders():
         _active_mods_lists
     _lords_pickle = bolt.PickleDict(_lord_pickle_path)
     _lords_pickle.load()
-    if _lords_pickle.vdata.get(u'_lords_pickle_version', 1) < _LORDS_PICKLE_VERSION:
+    pickle_version = _lords_pickle.vdata.get(u'_lords_pickle_version', 1)
+    if pickle_version < 2:
         # used to load active lists from settings
         active_mods_list = __active_mods_sentinel
     else:
         active_mods_list = {}
     _get = lambda x, d: _lords_pickle.pickled_data.get(
         x, d) or _lords_pickle.pickled_data.get(x.encode(u'ascii'), d)
-    _saved_load_orders = _get(u'_saved_load_orders', [])
+    if pickle_version < 3:
+        _saved_load_orders = _LoHistory.from_entries(
+            _get(u'_saved_load_orders', []))
+    else:
+        _saved_load_orders = _LoHistory.from_dump(_get(u'_lo_history', None))
     _current_list_index = _get(u'_current_list_index', -1)
     _active_mods_lists = _get(u'_active_mods_lists', active_mods_list)
     if b'Bethesda ESMs' in _active_mods_lists: ##: backwards compat
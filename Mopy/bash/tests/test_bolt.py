@@ -20,12 +20,15 @@
 #  https://github.com/wrye-bash
 #
 # =============================================================================
+import threading
 from collections import OrderedDict
 
 import pytest
 
+from .. import bolt
 from ..bolt import LowerDict, DefaultLowerDict, OrderedLowerDict, decoder, \
-    encode, getbestencoding, GPath, Path
+    encode, getbestencoding, GPath, Path, longest_increasing, imap_ordered, \
+    Progress, ThreadProgress
 
 def test_getbestencoding():
     """Tests getbestencoding. Keep this one small, we don't want to test
@@ -175,6 +178,46 @@ def test_decoder_encode_roundtrip():
               u'Atenção', u'Внимание'):
         assert decoder(encode(s)) == s
 
+def test_longest_increasing():
+    assert longest_increasing([]) == set()
+    assert longest_increasing([3, 2, 1]) in ({0}, {1}, {2})
+    assert longest_increasing([1, 5, 2, 3, 9, 4]) == {0, 2, 3, 5}
+    # strictly increasing - of equal items only one is kept
+    assert len(longest_increasing([1, 2, 2, 2, 3])) == 3
+    # items with a None key are skipped
+    assert longest_increasing([u'a', u'x', u'b', u'c'], key={
+        u'a': 0, u'b': 1, u'c': 2}.get) == {0, 2, 3}
+
+class _RecordingProgress(Progress):
+    def __init__(self):
+        super(_RecordingProgress, self).__init__()
+        self.calls = []
+
+    def _do_progress(self, state, message):
+        self.calls.append((state, message, threading.current_thread()))
+
+def test_thread_progress(monkeypatch):
+    """Progress reported by the workers reaches the wrapped progresses on
+    the calling thread, while their results are awaited."""
+    # use a pool even on a single core
+    monkeypatch.setattr(bolt, u'worker_count', lambda max_workers: max_workers)
+    recorders = [_RecordingProgress() for _i in xrange(4)]
+    progresses = [ThreadProgress(r) for r in recorders]
+    forwarded = [threading.Event() for _i in xrange(4)]
+    def work(i):
+        progresses[i](0.5, u'half')
+        # wait for the calling thread to pass it on
+        forwarded[i].wait(5)
+        return i * 2
+    def poll(i):
+        progresses[i].pump()
+        if recorders[i].calls: forwarded[i].set()
+    assert list(imap_ordered(work, xrange(4), max_workers=2, poll=poll,
+                             poll_interval=0.01)) == [0, 2, 4, 6]
+    main_thread = threading.current_thread()
+    for r in recorders:
+        assert r.calls == [(0.5, u'half', main_thread)]
+
 class TestLowerDict(object):
     dict_type = LowerDict
 
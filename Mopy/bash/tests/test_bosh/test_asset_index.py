@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import os
+import random
+
+import pytest
+
+from ... import bolt
+from ...bolt import GPath
+from ...bosh._asset_index import AssetIndex, LOOSE
+from ...exception import BSAError
+
+_paths = [os.path.join(d, u'%s.%s' % (f, e)) for d in (u'meshes', u'textures')
+          for f in u'abcdefgh' for e in (u'nif', u'dds')]
+
+class _BsaInfo(object):
+    """The BSAInfo attributes the index uses - a BSA with no assets fails
+    to parse."""
+    def __init__(self, name, b_assets):
+        self.name = GPath(name)
+        self.fsize, self._file_mod_time = 0, 1500000000.0
+        self.set_assets(b_assets)
+
+    def set_assets(self, b_assets):
+        self._assets = frozenset(b_assets)
+        self.fsize += 1 # the BSA was rewritten
+
+    @property
+    def assets(self):
+        if not self._assets:
+            raise BSAError(self.name, u'Corrupt BSA')
+        return self._assets
+
+    def __repr__(self): return u'_BsaInfo(%s)' % self.name
+
+def _resolve(active_bsas, loose, asset):
+    """Resolve asset the naive way - loose files win, else the highest
+    loading BSA containing it."""
+    if asset in loose: return LOOSE
+    containing = [b for b in active_bsas if b._assets and asset in b._assets]
+    if not containing: return None
+    return max(containing, key=active_bsas.__getitem__)
+
+def _check(index, active_bsas, loose):
+    sources = {a: _resolve(active_bsas, loose, a) for a in _paths}
+    for asset, source in sources.iteritems():
+        assert index.resolve(asset) is source
+    assert index.resolve_all(_paths) == {a: s for a, s in sources.iteritems()
+                                         if s is not None}
+    assert index.missing(_paths) == {a for a, s in sources.iteritems()
+                                     if s is None}
+    for bsa in active_bsas:
+        expected = {a: sources[a] for a in bsa._assets
+                    if sources[a] is not bsa}
+        assert index.overridden(bsa) == expected
+    assert set(index.bsa_errors) == {b for b in active_bsas
+                                     if not b._assets}
+
+def test_sync():
+    a = _BsaInfo(u'A.bsa', _paths[:10])
+    b = _BsaInfo(u'B.bsa', _paths[5:15])
+    c = _BsaInfo(u'C.bsa', _paths[12:20])
+    broken = _BsaInfo(u'Broken.bsa', [])
+    active_bsas = {a: 0, b: 1, broken: 2, c: 3}
+    loose = {_paths[0], _paths[13], _paths[-1]}
+    index = AssetIndex()
+    index.sync(active_bsas, loose)
+    _check(index, active_bsas, loose)
+    assert index.resolve(_paths[7]) is b
+    assert index.overridden(a) == {_paths[0]: LOOSE, _paths[5]: b,
+        _paths[6]: b, _paths[7]: b, _paths[8]: b, _paths[9]: b}
+    # an inactive BSA overrides nothing
+    assert index.overridden(_BsaInfo(u'D.bsa', _paths)) == {}
+
+def test_loose_files_changed():
+    """Changes to the loose files are visible without syncing."""
+    a = _BsaInfo(u'A.bsa', _paths[:10])
+    loose = bolt.LowerDict()
+    index = AssetIndex()
+    index.sync({a: 0}, loose)
+    loose[_paths[0]] = (0, 0, 0.0)
+    loose[_paths[-1]] = (0, 0, 0.0)
+    _check(index, {a: 0}, loose)
+    del loose[_paths[0]]
+    _check(index, {a: 0}, loose)
+
+def test_scan_loose(tmpdir):
+    for rel_path in (u'Plugin.esp', os.path.join(u'Meshes', u'A.NIF')):
+        tmpdir.join(rel_path).ensure()
+    assert AssetIndex.scan_loose(GPath(tmpdir.strpath)) == {
+        u'plugin.esp', os.path.join(u'meshes', u'a.nif')}
+
+@pytest.mark.parametrize(u'seed', range(10))
+def test_random_changes(seed):
+    """Check the index against the naive resolution as BSAs change, are
+    (de)activated and move in the load order - as happens when their
+    plugins do - and against an index synced from scratch."""
+    rng = random.Random(seed)
+    def _random_assets():
+        return rng.sample(_paths, rng.randint(0, 12)) # may be broken
+    bsas = [_BsaInfo(u'%d.bsa' % i, _random_assets()) for i in xrange(8)]
+    active_bsas = {b: i for i, b in enumerate(bsas[:5])}
+    loose = set(rng.sample(_paths, 4))
+    index = AssetIndex()
+    for _i in xrange(40):
+        change = rng.choice((u'assets', u'activate', u'deactivate', u'move',
+                             u'loose'))
+        if change == u'assets':
+            rng.choice(bsas).set_assets(_random_assets())
+        elif change == u'activate':
+            inactive = [b for b in bsas if b not in active_bsas]
+            if inactive:
+                active_bsas[rng.choice(inactive)] = rng.uniform(-1, 10)
+        elif change == u'deactivate' and active_bsas:
+            del active_bsas[rng.choice(list(active_bsas))]
+        elif change == u'move' and active_bsas:
+            active_bsas[rng.choice(list(active_bsas))] = rng.uniform(-1, 10)
+        else:
+            loose.symmetric_difference_update(rng.sample(_paths, 2))
+        index.sync(active_bsas, loose)
+        _check(index, active_bsas, loose)
+        fresh = AssetIndex()
+        fresh.sync(active_bsas, loose)
+        assert fresh._winners == index._winners
@@ -0,0 +1,881 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import cPickle as pickle
+import collections
+import copy
+import errno
+import io
+import os
+import random
+import re
+import shutil
+import zipfile
+from binascii import crc32
+
+import pytest
+
+from ... import bass, bolt, bosh, bush, env
+from ...bolt import GPath, Path
+from ...bosh import bain, ModInfos
+from ...bosh import InstallerArchive as BoshArchive, \
+    InstallerMarker as BoshMarker, InstallerProject as BoshProject
+from ...bosh._installers_store import InstallersStore
+from ...bosh.bain import InstallerArchive, InstallerProject, \
+    InstallersData
+
+_files = (u'Plugin.esp', os.path.join(u'textures', u'a.dds'),
+          u'Locked.esp')
+
+def _contents(rel_path):
+    return b'contents of ' + rel_path.encode(u'utf8')
+
+class _ArchiveInstall(object):
+    """Installs _files from an archive in an Installers folder to a Data
+    folder, both in tmpdir - extracting with 7z records where it extracts
+    to and writes _contents."""
+    _archive = u'Package.7z'
+
+    @pytest.fixture(autouse=True)
+    def _game_dirs(self, tmpdir, monkeypatch):
+        self.game_dir = GPath(tmpdir.strpath)
+        monkeypatch.setitem(bass.dirs, u'installers',
+                            self.game_dir.join(u'Installers'))
+        monkeypatch.setitem(bass.dirs, u'mods', self.game_dir.join(u'Data'))
+        bass.dirs[u'installers'].makedirs()
+        bass.dirs[u'mods'].makedirs()
+        self.extracted_to = []
+        def _extract7z(src_archive, extract_dir, progress=None,
+                       readExtensions=None, recursive=False,
+                       filelist_to_extract=None):
+            self.extracted_to.append(extract_dir)
+            with io.open(filelist_to_extract, encoding=u'utf8') as ins:
+                for rel_path in ins.read().split(u'\n'):
+                    with extract_dir.join(rel_path).open(u'wb') as out:
+                        out.write(_contents(rel_path))
+        monkeypatch.setattr(bain, u'extract7z', _extract7z)
+        # which sets no read only flags
+        monkeypatch.setattr(bolt, u'clearReadOnly', lambda dir_path: None)
+        self.installer = InstallerArchive(GPath(self._archive))
+        for rel_path in _files:
+            contents = _contents(rel_path)
+            self.installer.ci_dest_sizeCrc[rel_path] = (
+                len(contents), crc32(contents) & 0xFFFFFFFF)
+
+    def _install(self):
+        dest_src = bolt.LowerDict((f, f) for f in _files)
+        data_sizeCrcDate_update, _mods, _inis, _bsas = \
+            self.installer._install(dest_src, bolt.Progress())
+        assert len(data_sizeCrcDate_update) == len(_files)
+        assert all(f in data_sizeCrcDate_update for f in _files)
+        for rel_path in _files:
+            with bass.dirs[u'mods'].join(rel_path).open(u'rb') as ins:
+                assert ins.read() == _contents(rel_path)
+        # the temp dir is gone
+        assert all(not d.exists() for d in self.extracted_to)
+
+class TestInstall7z(_ArchiveInstall):
+    def test_unpacked_next_to_data(self):
+        """Archives are extracted next to the Data folder, so the files are
+        renamed into place."""
+        self._install()
+        assert [d.head for d in self.extracted_to] == [self.game_dir]
+
+    def test_unpack_fallback(self):
+        """If the temp dir can't be created next to the Data folder the
+        default temp dir is used."""
+        not_a_dir = self.game_dir.join(u'not_a_dir')
+        with not_a_dir.open(u'wb'): pass
+        unpack_dir = self.installer.unpackToTemp(list(_files),
+                                                 temp_parent=not_a_dir)
+        try:
+            assert unpack_dir.head == Path.baseTempDir()
+            assert unpack_dir.join(_files[0]).exists()
+        finally:
+            bass.rmTempDir()
+
+    def test_failed_files_to_shell(self, monkeypatch):
+        """Files that can't be moved in place are left to the shell."""
+        _fail_copy(monkeypatch, u'Locked.esp')
+        shelled = _shell_op(monkeypatch, u'shellMove', os.rename)
+        self._install()
+        assert shelled == [u'Locked.esp']
+
+def _fail_copy(monkeypatch, fail_name):
+    """Make copying or moving fail_name with env.copy_files fail."""
+    copy_file = bain.env._copy_file
+    def _copy_file(src, dest, move, link):
+        if dest.endswith(fail_name):
+            raise OSError(errno.EACCES, u'Permission denied')
+        return copy_file(src, dest, move, link)
+    monkeypatch.setattr(bain.env, u'_copy_file', _copy_file)
+
+def _shell_op(monkeypatch, op_name, fs_op):
+    """Replace env.shellMove or env.shellCopy with fs_op, recording the names
+    of the files it was called for."""
+    shelled = []
+    def _shell_op(sources, dests, parent=None):
+        for src, dest in zip(sources, dests):
+            shelled.append(dest.tail.s)
+            fs_op(src.s, dest.s)
+    monkeypatch.setattr(bain.env, op_name, _shell_op)
+    return shelled
+
+class TestInstallProject(object):
+    """Installs _files from a project in the Installers folder of idata to
+    its Data folder."""
+    @pytest.fixture(autouse=True)
+    def _project(self, idata, monkeypatch):
+        self.idata = idata
+        self.settings = collections.defaultdict(bool)
+        monkeypatch.setattr(bass, u'settings', self.settings)
+        self.installer = InstallerProject(GPath(u'Project'))
+        for rel_path in _files:
+            self._add_file(rel_path)
+
+    def _add_file(self, rel_path):
+        contents = _contents(rel_path)
+        src = self.installer.abs_path.join(rel_path)
+        src.head.makedirs()
+        with src.open(u'wb') as out: out.write(contents)
+        self.installer.ci_dest_sizeCrc[rel_path] = (
+            len(contents), crc32(contents) & 0xFFFFFFFF)
+        self.installer.src_sizeCrcDate[rel_path] = (
+            len(contents), crc32(contents) & 0xFFFFFFFF, src.mtime)
+
+    def _install(self, rel_paths=_files):
+        dest_src = bolt.LowerDict((f, f) for f in rel_paths)
+        data_sizeCrcDate_update, _mods, _inis, _bsas = \
+            self.installer._install(dest_src, bolt.Progress())
+        assert sorted(data_sizeCrcDate_update) == sorted(rel_paths)
+        for rel_path in rel_paths:
+            with self._data(rel_path).open(u'rb') as ins:
+                assert ins.read() == _contents(rel_path)
+            # the project is left alone
+            with self._src(rel_path).open(u'rb') as ins:
+                assert ins.read() == _contents(rel_path)
+        return data_sizeCrcDate_update
+
+    def _data(self, rel_path): return bass.dirs[u'mods'].join(rel_path)
+
+    def _src(self, rel_path): return self.installer.abs_path.join(rel_path)
+
+    def _linked(self, rel_path):
+        return env.file_is_linked(self._data(rel_path).s)
+
+    def test_copied(self):
+        self._install()
+        assert not any(self._linked(f) for f in _files)
+
+    def test_failed_files_to_shell(self, monkeypatch):
+        """Files that can't be copied are left to the shell."""
+        _fail_copy(monkeypatch, u'Locked.esp')
+        shelled = _shell_op(monkeypatch, u'shellCopy', shutil.copy2)
+        self._install()
+        assert shelled == [u'Locked.esp']
+
+    def test_linked(self):
+        """Linked files get the size, crc and date of the project files -
+        except for plugins of timestamp games, which are copied."""
+        self.settings[u'bash.installers.linkProjects'] = True
+        update = self._install()
+        for rel_path in _files:
+            is_plugin = GPath(rel_path).cext in bush.game.espm_extensions
+            linked = bush.game.using_txt_file or not is_plugin
+            assert self._linked(rel_path) == linked
+            if linked:
+                assert update[rel_path] == \
+                       self.installer.src_sizeCrcDate[rel_path]
+
+    def test_linked_overwritten(self):
+        """Installing over a linked file leaves the project file alone."""
+        self.settings[u'bash.installers.linkProjects'] = True
+        self._install()
+        other = InstallerProject(GPath(u'Other'))
+        src = other.abs_path.join(_files[1])
+        src.head.makedirs()
+        with src.open(u'wb') as out: out.write(b'other')
+        other.ci_dest_sizeCrc[_files[1]] = (5, crc32(b'other') & 0xFFFFFFFF)
+        other._install(bolt.LowerDict([(_files[1], _files[1])]),
+                       bolt.Progress())
+        with self._data(_files[1]).open(u'rb') as ins:
+            assert ins.read() == b'other'
+        with self._src(_files[1]).open(u'rb') as ins:
+            assert ins.read() == _contents(_files[1])
+
+    def test_linked_uninstalled(self, monkeypatch):
+        """Uninstalling removes the links, not the project files."""
+        # only rightFileType is needed, a classmethod
+        monkeypatch.setattr(bosh, u'modInfos', ModInfos)
+        self.settings[u'bash.installers.linkProjects'] = True
+        self._install()
+        self.idata._removeFiles({_files[1]}, [False, False])
+        assert not self._data(_files[1]).exists()
+        with self._src(_files[1]).open(u'rb') as ins:
+            assert ins.read() == _contents(_files[1])
+
+    def test_linked_edited(self):
+        """A linked file edited in place is replaced with a copy on the next
+        Data refresh, with a warning - the project file has been edited too,
+        so is left alone."""
+        self.settings[u'bash.installers.linkProjects'] = True
+        edited, kept = _files[1], os.path.join(u'meshes', u'b.nif')
+        self._add_file(kept)
+        self.idata[GPath(u'Project')] = self.installer
+        self.installer.is_active = True
+        self.idata.refreshOrder()
+        self.idata.data_sizeCrcDate.update(self._install([edited, kept]))
+        assert not self.idata._refresh_from_data_dir()
+        assert not self.idata.edited_links
+        with self._data(edited).open(u'ab') as out: out.write(b' - edited')
+        assert self.idata._refresh_from_data_dir()
+        assert self.idata.edited_links == {edited: [u'Project']}
+        assert not self._linked(edited)
+        assert self._linked(kept)
+        for edited_path in (self._data(edited), self._src(edited)):
+            with edited_path.open(u'rb') as ins:
+                assert ins.read() == _contents(edited) + b' - edited'
+        # the edit is picked up, and further edits won't reach the project
+        assert self.idata.data_sizeCrcDate[edited][:2] == (
+            self._data(edited).psize,
+            crc32(_contents(edited) + b' - edited') & 0xFFFFFFFF)
+        with self._data(edited).open(u'ab') as out: out.write(b' again')
+        with self._src(edited).open(u'rb') as ins:
+            assert ins.read() == _contents(edited) + b' - edited'
+
+class TestInstallZip(_ArchiveInstall):
+    _archive = u'Package.zip'
+
+    @pytest.fixture(autouse=True)
+    def _zip(self, _game_dirs):
+        with zipfile.ZipFile(bass.dirs[u'installers'].join(
+                self._archive).s, u'w', zipfile.ZIP_DEFLATED) as out:
+            for rel_path in _files:
+                out.writestr(rel_path.replace(os.sep, u'/'),
+                             _contents(rel_path))
+
+    def test_streamed_to_data(self):
+        self._install()
+        assert not self.extracted_to # 7z was not needed
+
+    def test_failed_files_to_shell(self, monkeypatch):
+        """Files that can't be written are extracted with 7z and moved in
+        place by the shell."""
+        copyfileobj = shutil.copyfileobj
+        def _copy(ins, out, *args):
+            if out.name.endswith(u'Locked.esp'):
+                raise IOError(errno.EACCES, u'Permission denied')
+            copyfileobj(ins, out, *args)
+        monkeypatch.setattr(bain.shutil, u'copyfileobj', _copy)
+        moved = []
+        def _shell_move(sources, dests, parent=None):
+            for src, dest in zip(sources, dests):
+                moved.append(dest.tail.s)
+                dest.remove() # the shell overwrites
+                os.rename(src.s, dest.s)
+        monkeypatch.setattr(bain.env, u'shellMove', _shell_move)
+        self._install()
+        assert moved == [u'Locked.esp']
+        assert [d.head for d in self.extracted_to] == [self.game_dir]
+
+# refreshDataSizeCrc memo ----------------------------------------------------
+_sep = os.sep.join
+# files hitting every skip setting, attribute and remap refreshDataSizeCrc
+# takes into account
+_package_files = (u'Plugin.esp', u'Oblivion.esm', u'Skipped.esp',
+    u'readme.txt', u'package.txt', u'wizard.txt', u'masterlist.txt',
+    u'Package-bcf.7z', u'screenshot.jpg', u'preview.png', u'script.bsl',
+    u'setup.exe', _sep((u'Docs', u'manual.txt')),
+    _sep((u'textures', u'a.dds')), _sep((u'textures', u'b.png')),
+    _sep((u'textures', u'landscapelod', u'generated', u'a.dds')),
+    _sep((u'textures', u'landscapelod', u'generated', u'a_fn.dds')),
+    _sep((u'meshes', u'landscape', u'lod', u'a.nif')),
+    _sep((u'distantlod', u'a.lod')), _sep((u'screenshots', u'a.bmp')),
+    _sep((u'obse', u'plugins', u'a.dll')),
+    _sep((u'sound', u'voice', u'plugin.esp', u'a.mp3')),
+    _sep((u'sound', u'voice', u'skipped.esp', u'a.mp3')),
+    _sep((u'unknown', u'a.txt')), _sep((u'--skipped', u'a.nif')))
+# the settings toggled by the _Installers_Skip links, which call
+# init_global_skips - the rest are read directly by refreshDataSizeCrc
+_skip_settings = [(s, True) for s in (u'skipDocs', u'skipImages',
+    u'skipDistantLOD', u'skipLandscapeLODMeshes', u'skipLandscapeLODTextures',
+    u'skipLandscapeLODNormals', u'skipScreenshots', u'skipTESVBsl',
+    u'allowOBSEPlugins')] + [(u'skipDocs', False),
+                             (u'autoRefreshBethsoft', False)]
+
+class TestDestSrcMemo(object):
+    """refreshDataSizeCrc results are memoized - check they match the ones
+    of a full scan whatever they depend on changes."""
+    @pytest.fixture(autouse=True)
+    def _installers(self, idata, monkeypatch):
+        self.settings = collections.defaultdict(bool, {
+            u'bash.installers.goodDlls': {}, u'bash.installers.badDlls': {}})
+        monkeypatch.setattr(bass, u'settings', self.settings)
+        for attr in (u'_goodDlls', u'_badDlls', u'_global_skips',
+                     u'_global_start_skips', u'_global_skip_extensions',
+                     u'_skip_matchers', u'_dest_src_memo'):
+            monkeypatch.setattr(bain.Installer, attr,
+                                copy.copy(getattr(bain.Installer, attr)))
+        bain.Installer.init_global_skips()
+        bain.Installer.init_attributes_process()
+        self.memoized = []
+        memoize = bain.Installer._memoize_dest_src
+        def _memoize(installer, *args):
+            self.memoized.append(installer.archive)
+            return memoize(installer, *args)
+        monkeypatch.setattr(bain.Installer, u'_memoize_dest_src', _memoize)
+        self.simple = InstallerArchive(GPath(u'Simple.7z'))
+        self.simple.type = 1
+        self.complex = InstallerArchive(GPath(u'Complex.7z'))
+        self.complex.type = 2
+        self.complex.subNames = [u'', u'00 Core', u'01 Option']
+        self.complex.subActives = [True, True, False]
+        for inst in self.installers:
+            inst.espmNots.add(GPath(u'Skipped.esp'))
+        self._set_files(self.simple, _package_files)
+        self._set_files(self.complex, [_sep((sub, f)) for f in _package_files
+                                       for sub in self.complex.subNames[1:]])
+
+    @property
+    def installers(self): return self.simple, self.complex
+
+    @staticmethod
+    def _set_files(installer, rel_paths):
+        # replaced, not modified, as refreshBasic does
+        installer.fileSizeCrcs = [(f, len(f), crc32(f.encode(u'utf8')))
+                                  for f in rel_paths]
+
+    @staticmethod
+    def _refresh(installer):
+        dest_src = installer.refreshDataSizeCrc()
+        return (dict(dest_src), dict(installer.ci_dest_sizeCrc),
+                [getattr(installer, a) for a in installer._memo_attrs],
+                [set(getattr(installer, a)) for a in installer._memo_sets],
+                {k: list(v) for k, v in installer.espmMap.iteritems()})
+
+    def _check(self, memo_hit=False):
+        """Check that refreshing the installers gives the results of a full
+        scan - recalled from the memo if memo_hit is True."""
+        for inst in self.installers:
+            del self.memoized[:]
+            memoized = self._refresh(inst)
+            assert self.memoized == ([] if memo_hit else [inst.archive])
+            del bain.Installer._dest_src_memo[inst.archive]
+            assert memoized == self._refresh(inst)
+
+    def test_unchanged(self):
+        self._check()
+        self._check(memo_hit=True)
+        assert self.simple.ci_dest_sizeCrc # we are testing something
+
+    @pytest.mark.parametrize(u'setting, init_skips', _skip_settings)
+    def test_skip_toggled(self, setting, init_skips):
+        self._check()
+        for _flip in (0, 1):
+            key = u'bash.installers.' + setting
+            self.settings[key] = not self.settings[key]
+            if init_skips: bain.Installer.init_global_skips()
+            self._check()
+            self._check(memo_hit=True)
+
+    def test_files_changed(self):
+        self._check()
+        self._set_files(self.simple, _package_files[::2])
+        self._set_files(self.complex, [f for f, _s, _c in
+                                       self.complex.fileSizeCrcs[1::2]])
+        self._check()
+        # sizes and crcs too
+        for inst in self.installers:
+            inst.fileSizeCrcs = [(f, s + 1, c) for f, s, c
+                                 in inst.fileSizeCrcs]
+        self._check()
+
+    @pytest.mark.parametrize(u'attr, value', [
+        (u'overrideSkips', True), (u'skipVoices', True),
+        (u'hasExtraData', True), (u'espmNots', set()),
+        (u'remaps', {u'Plugin.esp': u'Renamed.esp'}),
+        (u'subActives', [True, False, True])])
+    def test_installer_changed(self, attr, value):
+        self._check()
+        for inst in self.installers:
+            setattr(inst, attr, copy.copy(value))
+        self._check()
+        self._check(memo_hit=True)
+
+    def test_evicted(self):
+        """Only the last few results are memoized."""
+        self._check()
+        for i in xrange(bain.Installer._dest_src_memo_size):
+            other = InstallerArchive(GPath(u'Other%d.7z' % i))
+            other.type = 1
+            self._set_files(other, _package_files[:3])
+            self._refresh(other)
+        self._check()
+
+# Installers data -------------------------------------------------------------
+@pytest.fixture
+def idata(tmpdir, monkeypatch):
+    """An empty InstallersData, with its dirs in tmpdir."""
+    game_dir = GPath(tmpdir.strpath)
+    for dir_key, rel_path in ((u'mods', u'Data'),
+                              (u'modsBash', u'Data Bash'),
+                              (u'installers', u'Installers'),
+                              (u'bainData', u'Installers Bash'),
+                              (u'converters', u'BCFs'),
+                              (u'dupeBCFs', u'Duplicate BCFs'),
+                              (u'corruptBCFs', u'Corrupt BCFs')):
+        monkeypatch.setitem(bass.dirs, dir_key, game_dir.join(rel_path))
+        bass.dirs[dir_key].makedirs()
+    # set when modInfos is created
+    monkeypatch.setattr(ModInfos, u'file_pattern', re.compile(u'(' + u'|'.join(
+        [re.escape(e) for e in bush.game.espm_extensions]) + u')$', re.I))
+    return InstallersData()
+
+def _set_installer(idata, name, dest_sizeCrc, order, is_active=True):
+    """Add or replace the installer name, installing dest_sizeCrc - as
+    refreshDataSizeCrc does, ci_dest_sizeCrc is replaced."""
+    installer = idata.get(GPath(name)) or InstallerArchive(GPath(name))
+    installer.ci_dest_sizeCrc = bolt.LowerDict(dest_sizeCrc)
+    installer.order, installer.is_active, installer.type = order, is_active, 1
+    idata[GPath(name)] = installer
+    return installer
+
+def _random_dests(rng, paths):
+    """Some of paths, mapped to one of a few (size, crc) pairs, so that
+    installers often provide the same file."""
+    return {p: rng.choice([(10, 0xAA), (10, 0xBB), (20, 0xCC)])
+            for p in rng.sample(paths, rng.randint(0, len(paths) // 2))}
+
+def _loose_conflicts(idata, src_installer, list_overrides, include_inactive,
+                     include_lower):
+    """The loose conflicts of src_installer, checking every file of every
+    installer - as find_conflicts did before the destinations index."""
+    srcOrder = src_installer.order
+    showInactive = list_overrides and include_inactive
+    showLower = list_overrides and include_lower
+    if list_overrides:
+        mismatched = set(src_installer.ci_dest_sizeCrc)
+    else:
+        mismatched = src_installer.underrides
+    if not mismatched: return [], []
+    src_sizeCrc = src_installer.ci_dest_sizeCrc
+    lower_loose, higher_loose = [], []
+    for package, installer in idata.sorted_pairs():
+        if installer.order == srcOrder or not (
+                showInactive or installer.is_active): continue
+        if not showLower and installer.order < srcOrder: continue
+        curConflicts = bolt.sortFiles(
+            [x for x, y in installer.ci_dest_sizeCrc.iteritems()
+             if x in mismatched and y != src_sizeCrc[x]])
+        if curConflicts:
+            if installer.order < srcOrder:
+                conflict_type = lower_loose
+            else:
+                conflict_type = higher_loose
+            conflict_type.append((installer, package.s, curConflicts))
+    return lower_loose, higher_loose
+
+class TestFindConflicts(object):
+    _paths = [os.path.join(u'meshes', u'Mesh%02d.nif' % i) for i in
+              xrange(20)] + [u'Plugin%02d.esp' % i for i in xrange(5)]
+
+    def _check(self, idata):
+        idata.refreshOrder()
+        idata.refreshNorm()
+        idata.refreshInstallersStatus()
+        for installer in idata.itervalues():
+            for list_overrides in (True, False):
+                for include_inactive in (True, False):
+                    for include_lower in (True, False):
+                        args = (list_overrides, include_inactive,
+                                include_lower)
+                        assert idata.find_conflicts(
+                            installer, None, None, *args,
+                            include_bsas=False) == _loose_conflicts(
+                            idata, installer, *args) + ([], [])
+
+    @pytest.mark.parametrize(u'seed', range(5))
+    def test_random_changes(self, idata, seed):
+        """Installers added, refreshed, (de)activated, reordered and
+        removed."""
+        rng = random.Random(seed)
+        for i in xrange(6):
+            _set_installer(idata, u'Package%02d.7z' % i,
+                           _random_dests(rng, self._paths), i)
+        self._check(idata)
+        for step in xrange(40):
+            names = [k.s for k in idata]
+            change = rng.randrange(5)
+            if change == 0 or not names: # add an installer
+                _set_installer(idata, u'New%02d.7z' % step,
+                               _random_dests(rng, self._paths),
+                               rng.randrange(20), rng.randrange(3) > 0)
+            elif change == 1: # refresh an installer, maybe unchanged
+                installer = idata[GPath(rng.choice(names))]
+                dests = dict(installer.ci_dest_sizeCrc) if rng.randrange(
+                    2) else _random_dests(rng, self._paths)
+                _set_installer(idata, installer.archive, dests,
+                               installer.order, installer.is_active)
+            elif change == 2: # (de)activate an installer
+                installer = idata[GPath(rng.choice(names))]
+                installer.is_active = not installer.is_active
+            elif change == 3: # swap the order of two installers
+                first, second = [idata[GPath(n)] for n in rng.sample(
+                    names, 2)] if len(names) > 1 else [idata[GPath(
+                    names[0])]] * 2
+                first.order, second.order = second.order, first.order
+            else: # remove an installer
+                del idata[GPath(rng.choice(names))]
+            # Data files to be underridden
+            idata.data_sizeCrcDate[rng.choice(self._paths)] = (
+                10, rng.choice([0xAA, 0xBB]), 1.0)
+            self._check(idata)
+
+def _status(idata):
+    """Return the status attributes of all installers in idata and the
+    underridden files."""
+    return bolt.LowerDict(idata.ci_underrides_sizeCrc), {
+        inst.archive: (inst.status, set(inst.underrides),
+                       set(inst.missingFiles), set(inst.mismatchedFiles),
+                       set(inst.mismatchedEspms), dict(inst.dirty_sizeCrc))
+        for inst in idata.itervalues()}
+
+def _full_status(idata):
+    """Recalculate the underridden files and the status of all installers
+    from scratch - as refreshNorm and refreshInstallersStatus did before they
+    only looked at the changed paths - and return them as _status does."""
+    norm_sizeCrc = bolt.LowerDict()
+    for installer in idata.sorted_values():
+        if installer.is_active: norm_sizeCrc.update(installer.ci_dest_sizeCrc)
+    underrides = bolt.LowerDict()
+    for path, sizeCrc in norm_sizeCrc.iteritems():
+        sizeCrcDate = idata.data_sizeCrcDate.get(path)
+        if sizeCrcDate and sizeCrc != sizeCrcDate[:2]:
+            underrides[path] = sizeCrcDate[:2]
+    incremental = idata.ci_underrides_sizeCrc
+    idata.ci_underrides_sizeCrc = underrides
+    try:
+        for installer in idata.itervalues():
+            installer.refreshStatus(idata)
+        return _status(idata)
+    finally:
+        idata.ci_underrides_sizeCrc = incremental
+
+class TestRefreshStatus(object):
+    """Only the installers owning the paths that changed get their status
+    recalculated - and it is the same as recalculating all of them."""
+    @pytest.fixture(autouse=True)
+    def _installers(self, idata, monkeypatch):
+        self.idata = idata
+        mesh, tex = os.path.join(u'meshes', u'a.nif'), os.path.join(
+            u'textures', u'a.dds')
+        self.paths = mesh, tex, u'Plugin.esp', u'Other.esp'
+        self.low = _set_installer(idata, u'Low.7z', {
+            mesh: (10, 0xAA), u'Plugin.esp': (5, 0x11)}, 0)
+        self.high = _set_installer(idata, u'High.7z', {
+            mesh: (10, 0xBB), tex: (7, 0x22)}, 1)
+        self.other = _set_installer(idata, u'Other.7z', {
+            u'Other.esp': (3, 0x33)}, 2)
+        self.inactive = _set_installer(idata, u'Inactive.7z', {
+            tex: (7, 0x44)}, 3, is_active=False)
+        # Other.7z also had the texture, which High.7z overwrote
+        self.other.dirty_sizeCrc[tex] = (7, 0x22)
+        for path, sizeCrcDate in ((mesh, (10, 0xAA, 1.0)),
+                                  (tex, (7, 0x22, 1.0)),
+                                  (u'Plugin.esp', (5, 0x11, 1.0))):
+            idata.data_sizeCrcDate[path] = sizeCrcDate
+        idata.refreshNorm()
+        idata.refreshInstallersStatus()
+        assert _status(idata) == _full_status(idata)
+        self.refreshed = []
+        refresh_status = bain.Installer.refreshStatus
+        def _refresh_status(installer, installersData):
+            self.refreshed.append(installer)
+            return refresh_status(installer, installersData)
+        monkeypatch.setattr(bain.Installer, u'refreshStatus', _refresh_status)
+
+    def _refresh(self, *expected):
+        del self.refreshed[:]
+        self.idata.refreshNorm()
+        self.idata.refreshInstallersStatus()
+        assert sorted(self.refreshed) == sorted(expected)
+        incremental = _status(self.idata)
+        assert incremental == _full_status(self.idata)
+
+    def test_unchanged(self):
+        self._refresh()
+
+    def test_data_file_changed(self):
+        self.idata.data_sizeCrcDate[self.paths[0]] = (10, 0xBB, 2.0)
+        self._refresh(self.low, self.high)
+        assert self.high.status == 30
+
+    def test_data_file_date_changed(self):
+        """Only the size and crc matter for the status."""
+        self.idata.data_sizeCrcDate[self.paths[0]] = (10, 0xAA, 2.0)
+        self._refresh()
+
+    def test_data_file_added(self):
+        self.idata.data_sizeCrcDate[self.paths[3]] = (3, 0x33, 1.0)
+        self._refresh(self.other)
+        assert self.other.status == 30
+
+    def test_data_file_removed(self):
+        """Including the installers the file is dirty for."""
+        del self.idata.data_sizeCrcDate[self.paths[1]]
+        self._refresh(self.high, self.inactive, self.other)
+        assert self.high.status == -10
+        assert not self.other.dirty_sizeCrc
+
+    def test_data_refreshed(self):
+        """Installer.final_update clears and refills data_sizeCrcDate."""
+        data_sizeCrcDate = self.idata.data_sizeCrcDate
+        refilled = dict(data_sizeCrcDate)
+        refilled[self.paths[2]] = (5, 0x12, 2.0)
+        data_sizeCrcDate.clear()
+        data_sizeCrcDate.update(refilled)
+        self._refresh(self.low)
+        assert self.low.status == 10 # a mismatched plugin
+
+    def test_installer_changed(self):
+        _set_installer(self.idata, u'Other.7z', {
+            u'Other.esp': (3, 0x33), self.paths[2]: (5, 0x11)}, 2)
+        self._refresh(self.other, self.low)
+
+    def test_installer_deactivated(self):
+        """The files of an installer that no longer wins may be underridden
+        now."""
+        self.high.is_active = False
+        self._refresh(self.low, self.high, self.inactive, self.other)
+        assert self.idata.ci_underrides_sizeCrc == {}
+
+    def test_deleted_installer(self):
+        """An installer deleted after its status was invalidated is not
+        refreshed."""
+        _set_installer(self.idata, u'Other.7z', {u'Other.esp': (4, 0x33)}, 2)
+        self.idata.refreshNorm()
+        del self.idata[GPath(u'Other.7z')]
+        self._refresh()
+        assert self.other not in self.idata._status_installers
+
+class TestPickle(object):
+    """Pickling installers - only done to export Installers.dat - writes
+    what previous versions expect, without touching the installers."""
+    @pytest.fixture(params=[InstallerArchive, InstallerProject])
+    def installer(self, request, idata):
+        installer = request.param(GPath(u'Package'))
+        files = [(os.path.join(u'meshes', u'a.nif'), 10, 0xAA),
+                 (u'Plugin.esp', 5, 0x11)]
+        installer.fileSizeCrcs = bain._FileSizeCrcs(files)
+        installer.dirty_sizeCrc[u'Plugin.esp'] = (5, 0x12)
+        if installer.is_project():
+            installer.src_sizeCrcDate.update(
+                (f, (s, c, 1.0)) for f, s, c in files)
+        idata[GPath(u'Package')] = installer
+        return installer
+
+    def _attrs(self, installer):
+        return (installer.fileSizeCrcs, installer.dirty_sizeCrc,
+                installer.src_sizeCrcDate)
+
+    def test_pickle(self, installer):
+        attrs = self._attrs(installer)
+        loaded = pickle.loads(pickle.dumps(installer, -1))
+        assert all(a is b for a, b in zip(self._attrs(installer), attrs))
+        assert isinstance(installer.fileSizeCrcs, bain._FileSizeCrcs)
+        assert list(loaded.fileSizeCrcs) == list(installer.fileSizeCrcs)
+        assert loaded.dirty_sizeCrc == installer.dirty_sizeCrc
+        assert loaded.src_sizeCrcDate == installer.src_sizeCrcDate
+
+    def test_previous_versions_format(self, installer):
+        state = dict(zip(installer.persistent, installer.__reduce__()[2]))
+        assert type(state[u'fileSizeCrcs']) is list
+        assert state[u'fileSizeCrcs'] == list(installer.fileSizeCrcs)
+        for attr in (u'dirty_sizeCrc', u'src_sizeCrcDate'):
+            assert type(state[attr]) is dict
+            assert all(type(k) is Path for k in state[attr])
+
+    def test_export_pickle(self, installer, idata):
+        attrs = self._attrs(installer)
+        idata.export_pickle()
+        assert all(a is b for a, b in zip(self._attrs(installer), attrs))
+
+# Installers.db ---------------------------------------------------------------
+def _mk_installers():
+    """Return an archive, a project and a marker, keyed by name - as loaded
+    by InstallersStore, so of the bosh classes."""
+    archive = BoshArchive(GPath(u'Archive.7z'))
+    archive.fileSizeCrcs = bain._FileSizeCrcs([
+        (os.path.join(u'meshes', u'a.nif'), 10, 0xAA),
+        (os.path.join(u'textures', u'\xfc\xf1\xee.dds'), 2 ** 33, 0xBB),
+        (u'Plugin.esp', 5, 0x11)])
+    archive.order, archive.is_active = 0, True
+    archive.comments = u'Some \u2603 comments'
+    archive.espmNots = {GPath(u'Plugin.esp')}
+    project = BoshProject(GPath(u'Project'))
+    project.fileSizeCrcs = bain._FileSizeCrcs([(u'Other.esp', 3, 0x33)])
+    project.src_sizeCrcDate = bolt.LowerDict(
+        [(u'Other.esp', (3, 0x33, 100.0))])
+    project.dirty_sizeCrc[u'Other.esp'] = (3, 0x34)
+    project.order = 1
+    marker = BoshMarker(GPath(u'==Last=='))
+    marker.order = 2
+    return {i.archive and GPath(i.archive): i for i in (
+        archive, project, marker)}
+
+def _state(installer):
+    """The persistent attributes of installer, comparable whatever the
+    types of the containers they were loaded in."""
+    state = []
+    for attr in installer.persistent:
+        value = getattr(installer, attr)
+        if attr == u'fileSizeCrcs':
+            value = list(value)
+        elif attr in (u'src_sizeCrcDate', u'dirty_sizeCrc'):
+            value = {(u'%s' % k).lower(): v for k, v in value.iteritems()}
+        state.append((attr, value))
+    return type(installer).__name__, state
+
+def _states(installers):
+    return {k: _state(v) for k, v in installers.iteritems()}
+
+def _src(project):
+    return [(u'%s' % k, v) for k, v in project.src_sizeCrcDate.iteritems()]
+
+_data_files = {os.path.join(u'meshes', u'a.nif'): (10, 0xAA, 1.5),
+               u'Plugin.esp': (5, 0x11, 2.5)}
+
+class TestInstallersStore(object):
+    @pytest.fixture(autouse=True)
+    def _store(self, idata):
+        self.db_path = bass.dirs[u'bainData'].join(u'Test.db')
+        self.store = InstallersStore(self.db_path)
+        self.installers = _mk_installers()
+        self.data_files = bain._TrackedSizeCrcDate(_data_files)
+        self.store.save(self.installers, self.data_files, (), full=True)
+
+    def _load(self):
+        """Load the store in a new InstallersStore - as on the next run."""
+        installers, data_files = InstallersStore(self.db_path).load()
+        return installers, dict(data_files)
+
+    def _save(self, dump_files_calls, monkeypatch):
+        """Save self.installers, asserting the number of installers whose
+        files are written."""
+        dumped = []
+        dump_files = InstallersStore._dump_files
+        def _dump_files(inst):
+            dumped.append(inst.archive)
+            return dump_files(inst)
+        monkeypatch.setattr(InstallersStore, u'_dump_files',
+                            staticmethod(_dump_files))
+        self.store.save(self.installers, self.data_files,
+                        self.data_files.pop_unsaved())
+        assert sorted(dumped) == sorted(dump_files_calls)
+
+    def test_round_trip(self):
+        installers, data_files = self._load()
+        project = installers[GPath(u'Project')]
+        assert callable(project._src_sizeCrcDate) # read on demand
+        assert _src(project) == [(u'Other.esp', (3, 0x33, 100.0))]
+        assert _states(installers) == _states(self.installers)
+        assert data_files == _data_files
+
+    def test_unreadable(self):
+        with self.db_path.open(u'wb') as out:
+            out.write(b'not a database' * 100)
+        assert InstallersStore(self.db_path).load() is None
+
+    def test_attributes_changed(self, monkeypatch):
+        self.installers[GPath(u'Archive.7z')].comments = u'Changed'
+        self.installers[GPath(u'==Last==')].order = 3
+        self._save([], monkeypatch)
+        assert _states(self._load()[0]) == _states(self.installers)
+
+    def test_files_changed(self, monkeypatch):
+        """Refreshing an installer replaces its fileSizeCrcs."""
+        project = self.installers[GPath(u'Project')]
+        project.fileSizeCrcs = bain._FileSizeCrcs([(u'Other.esp', 4, 0x44)])
+        project.src_sizeCrcDate = bolt.LowerDict(
+            [(u'Other.esp', (4, 0x44, 200.0))])
+        self._save([u'Project'], monkeypatch)
+        installers = self._load()[0]
+        assert _states(installers) == _states(self.installers)
+        assert _src(installers[GPath(u'Project')]) == [
+            (u'Other.esp', (4, 0x44, 200.0))]
+
+    def test_renamed_and_deleted(self, monkeypatch):
+        project = self.installers.pop(GPath(u'Project'))
+        project.archive = u'Renamed'
+        self.installers[GPath(u'Renamed')] = project
+        del self.installers[GPath(u'Archive.7z')]
+        self._save([u'Renamed'], monkeypatch)
+        installers = self._load()[0]
+        assert _states(installers) == _states(self.installers)
+        # the project cache was moved to the new row
+        assert _src(installers[GPath(u'Renamed')]) == [
+            (u'Other.esp', (3, 0x33, 100.0))]
+
+    def test_data_files_changed(self, monkeypatch):
+        self.data_files.pop_unsaved()
+        self.data_files[u'Plugin.esp'] = (5, 0x11, 3.5) # date only
+        del self.data_files[os.path.join(u'meshes', u'a.nif')]
+        self.data_files[u'New.esp'] = (1, 0x01, 4.5)
+        self._save([], monkeypatch)
+        assert self._load()[1] == {u'Plugin.esp': (5, 0x11, 3.5),
+                                   u'New.esp': (1, 0x01, 4.5)}
+
+class TestInstallersDataLoad(object):
+    """Loading InstallersData from Installers.db, or migrating it from the
+    Installers.dat pickle - which is also what export_pickle writes."""
+    def _fill(self, idata):
+        for name, installer in _mk_installers().iteritems():
+            idata[name] = installer
+        idata.data_sizeCrcDate.update(_data_files)
+        idata.hasChanged = True
+
+    def _loaded(self):
+        loaded = InstallersData()
+        loaded._InstallersData__load(bolt.Progress())
+        return loaded
+
+    def test_saved(self, idata):
+        self._fill(idata)
+        idata.save()
+        loaded = self._loaded()
+        assert _states(loaded._data) == _states(idata._data)
+        assert dict(loaded.data_sizeCrcDate) == dict(idata.data_sizeCrcDate)
+
+    def test_migrated_from_pickle(self, idata):
+        self._fill(idata)
+        idata.export_pickle()
+        assert not idata._store.exists()
+        migrated = self._loaded()
+        assert _states(migrated._data) == _states(idata._data)
+        assert dict(migrated.data_sizeCrcDate) == dict(
+            idata.data_sizeCrcDate)
+        # and saved in full to Installers.db on the next save
+        migrated.hasChanged = True
+        migrated.save()
+        loaded = self._loaded()
+        assert _states(loaded._data) == _states(idata._data)
+        assert dict(loaded.data_sizeCrcDate) == dict(idata.data_sizeCrcDate)
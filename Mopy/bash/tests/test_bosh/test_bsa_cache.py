@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import marshal
+import os
+import random
+
+import pytest
+
+from ...bolt import GPath
+from ...bosh._bsa_cache import encode_assets, decode_assets, BsaAssetsCache
+
+_sep = os.sep.join
+
+@pytest.mark.parametrize(u'assets', [
+    set(),
+    {u''},
+    {u'a.nif'},
+    {_sep((u'meshes', u'armor', u'cuirass.nif')),
+     _sep((u'meshes', u'armor', u'cuirass_1.nif')),
+     _sep((u'meshes', u'armor')), _sep((u'meshes', u'armor2', u'a.nif')),
+     _sep((u'meshes', u'b.nif')), _sep((u'textures', u'armor', u'a.dds'))},
+    {_sep((u'textures', u'ünïcödé', u'日本語.dds')),
+     _sep((u'textures', u'ünïcödé', u'日本.dds')),
+     _sep((u'textures', u'ünïcode.dds'))},
+    # prefixes longer than the 16 bits their lengths are stored in
+    {u'a' * 70000 + u'b', u'a' * 70000 + u'c', u'a' * 70000},
+], ids=[u'empty', u'empty_path', u'single', u'nested', u'unicode', u'long'])
+def test_round_trip(assets):
+    encoded = encode_assets(assets)
+    assert decode_assets(*encoded) == assets
+    # what ends up in the cache file
+    assert decode_assets(*marshal.loads(marshal.dumps(encoded))) == assets
+
+def test_round_trip_random():
+    rng = random.Random(42)
+    parts = [u'meshes', u'textures', u'armor', u'a', u'ab', u'ä', u'x.nif',
+             u'x.dds', u'.dds']
+    for _i in xrange(200):
+        assets = {_sep(rng.choice(parts) for _j in xrange(rng.randint(1, 5)))
+                  for _k in xrange(rng.randint(0, 50))}
+        assert decode_assets(*encode_assets(assets)) == assets
+
+class _BsaInfo(object):
+    """The BSAInfo attributes the cache uses."""
+    def __init__(self, name, fsize=1000, mtime=1500000000.0):
+        self.name = GPath(name)
+        self.fsize = fsize
+        self._file_mod_time = mtime
+
+class TestBsaAssetsCache(object):
+    _assets = {_sep((u'meshes', u'a.nif')), _sep((u'textures', u'a.dds'))}
+
+    @pytest.fixture(autouse=True)
+    def _cache_path(self, tmpdir):
+        self.cache_path = GPath(tmpdir.join(u'BSA Assets.dat').strpath)
+
+    def _cache(self): return BsaAssetsCache(self.cache_path)
+
+    def test_missing(self):
+        assert self._cache().get(_BsaInfo(u'A.bsa')) is None
+
+    def test_saved(self):
+        cache, bsa = self._cache(), _BsaInfo(u'A.bsa')
+        cache.put(bsa, self._assets)
+        assert cache.get(bsa) == self._assets
+        cache.save()
+        # BSA names are case insensitive
+        assert self._cache().get(_BsaInfo(u'a.BSA')) == self._assets
+
+    def test_unchanged_not_saved(self):
+        cache, bsa = self._cache(), _BsaInfo(u'A.bsa')
+        cache.put(bsa, self._assets)
+        cache.save()
+        self.cache_path.remove()
+        cache = self._cache()
+        cache.put(bsa, self._assets) # not cached, it was deleted
+        cache.save()
+        mtime = self.cache_path.mtime
+        cache = self._cache()
+        cache.put(bsa, {u'ignored'}) # cached already
+        assert cache.get(bsa) == self._assets
+        cache.save()
+        assert self.cache_path.mtime == mtime
+
+    @pytest.mark.parametrize(u'stat_change', [{u'fsize': 1001},
+                                              {u'mtime': 1500000001.0}])
+    def test_stale(self, stat_change):
+        """Entries of BSAs whose size or modification time changed are
+        ignored - and replaced when the BSA is parsed again."""
+        cache = self._cache()
+        cache.put(_BsaInfo(u'A.bsa'), self._assets)
+        cache.save()
+        cache = self._cache()
+        changed = _BsaInfo(u'A.bsa', **stat_change)
+        assert cache.get(changed) is None
+        cache.put(changed, {u'new.nif'})
+        assert cache.get(changed) == {u'new.nif'}
+        assert cache.get(_BsaInfo(u'A.bsa')) is None
+        cache.save()
+        assert self._cache().get(changed) == {u'new.nif'}
+
+    @pytest.mark.parametrize(u'contents', [b'', b'garbage',
+        marshal.dumps(u'garbage'), marshal.dumps((2, {})),
+        marshal.dumps((1, {u'a.bsa': (1000, 1500000000.0, b'', u'')}))[:-3]])
+    def test_unreadable(self, contents):
+        """Corrupt caches and caches written by other versions are
+        ignored."""
+        with self.cache_path.open(u'wb') as out:
+            out.write(contents)
+        cache, bsa = self._cache(), _BsaInfo(u'A.bsa')
+        assert cache.get(bsa) is None
+        cache.put(bsa, self._assets)
+        cache.save()
+        assert self._cache().get(bsa) == self._assets
+
+    def test_prune(self):
+        cache, a, b = self._cache(), _BsaInfo(u'A.bsa'), _BsaInfo(u'B.bsa')
+        cache.put(a, self._assets)
+        cache.put(b, {u'b.nif'})
+        cache.owners({a: self._assets, b: {u'b.nif'}}, [u'b.nif'])
+        cache.prune({u'a.bsa'})
+        assert cache.owners({}, [u'b.nif']) == {}
+        cache.save()
+        cache = self._cache()
+        assert cache.get(a) == self._assets
+        assert cache.get(b) is None
+
+class TestOwners(object):
+    """Check BsaAssetsCache.owners against a brute force scan of the asset
+    sets."""
+    @staticmethod
+    def _owners(bsa_assets, assets):
+        result = {}
+        for bsa, b_assets in bsa_assets.iteritems():
+            owned = b_assets & set(assets)
+            if owned: result[bsa] = owned
+        return result
+
+    def _check(self, cache, bsa_assets, assets):
+        assert cache.owners(bsa_assets, assets) == self._owners(bsa_assets,
+                                                                assets)
+
+    def test_bsa_changed(self):
+        cache = BsaAssetsCache(None)
+        a, b = _BsaInfo(u'A.bsa'), _BsaInfo(u'B.bsa')
+        bsa_assets = {a: frozenset([u'x.nif', u'y.nif']),
+                      b: frozenset([u'y.nif', u'z.nif'])}
+        queried = [u'x.nif', u'y.nif', u'z.nif', u'w.nif']
+        self._check(cache, bsa_assets, queried)
+        # A changed - the index is updated for the new asset set
+        bsa_assets[a] = frozenset([u'w.nif', u'y.nif'])
+        self._check(cache, bsa_assets, queried)
+        # B was deactivated, its assets are not reported even if indexed
+        self._check(cache, {a: bsa_assets[a]}, queried)
+        # and reactivated after it changed
+        bsa_assets[b] = frozenset([u'x.nif'])
+        self._check(cache, bsa_assets, queried)
+
+    @pytest.mark.parametrize(u'seed', range(5))
+    def test_random_changes(self, seed):
+        rng = random.Random(seed)
+        paths = [u'%s.nif' % i for i in xrange(30)]
+        bsas = [_BsaInfo(u'%s.bsa' % i) for i in xrange(6)]
+        bsa_assets = {}
+        cache = BsaAssetsCache(None)
+        for _i in xrange(50):
+            bsa = rng.choice(bsas)
+            if rng.random() < 0.2: bsa_assets.pop(bsa, None)
+            else:
+                bsa_assets[bsa] = frozenset(rng.sample(paths, rng.randint(
+                    0, 10)))
+            self._check(cache, bsa_assets, rng.sample(paths, 10))
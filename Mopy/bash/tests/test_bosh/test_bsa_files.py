@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import os
+
+import pytest
+
+from ...bosh import bsa_files
+from ...bosh.bsa_files import get_bsa_type, BA2, BSA, OblivionBsa, \
+    SkyrimSeBsa
+
+# Archive paths -> contents - compressible and random data, files in nested
+# folders and audio, which is always stored uncompressed
+_assets = {
+    u'meshes\\Armor\\Cuirass.nif': b'NIF' * 4000,
+    u'meshes\\armor\\gauntlets.NIF': os.urandom(3000),
+    u'textures\\armor\\cuirass.dds': b'DDS ' + b'\x00' * 5000,
+    u'textures\\clutter\\empty.dds': b'',
+    u'sound\\voice\\packed.esp\\imperial\\line.fuz': os.urandom(2000),
+    u'interface\\books\\note.xml': b'<note>' + b'text ' * 300 + b'</note>',
+}
+
+def _lower_paths(asset_paths):
+    """Return asset_paths lower cased, with the platform's separators - as
+    in ABsa.assets."""
+    return {a.lower().replace(u'\\', os.sep) for a in asset_paths}
+
+@pytest.fixture(params=[u'Oblivion', u'Skyrim', u'Skyrim Special Edition',
+                        u'Fallout4'])
+def bsa_type(request, monkeypatch):
+    """The archive types of the games pack_archive supports."""
+    # get_bsa_type switches the hashes to 32 bits for Fallout 4 - undo that
+    # for the other games
+    monkeypatch.setattr(bsa_files._HashedRecord, u'formats',
+                        bsa_files._HashedRecord.formats)
+    return get_bsa_type(request.param)
+
+@pytest.fixture(params=[True, False], ids=[u'compressed', u'uncompressed'])
+def packed(request, bsa_type, tmpdir):
+    """Pack _assets into an archive of bsa_type and return its path."""
+    sources = {}
+    for i, (asset, contents) in enumerate(sorted(_assets.iteritems())):
+        src = tmpdir.join(u'Source', u'%d.bin' % i)
+        src.write_binary(contents, ensure=True)
+        sources[asset] = src.strpath
+    archive_path = tmpdir.join(u'Packed' + (
+        u'.ba2' if bsa_type is BA2 else u'.bsa')).strpath
+    bsa_type.pack_archive(archive_path, sources, compress=request.param)
+    return archive_path
+
+def test_get_bsa_type():
+    assert get_bsa_type(u'Oblivion') is OblivionBsa
+    assert get_bsa_type(u'Skyrim') is BSA
+    assert get_bsa_type(u'Skyrim Special Edition') is SkyrimSeBsa
+
+class TestPackArchive(object):
+    def test_can_pack(self, bsa_type):
+        assert bsa_type.can_pack()
+
+    def test_version(self, bsa_type, packed):
+        assert bsa_type(packed).inspect_version() == bsa_type._pack_version
+
+    def test_assets(self, bsa_type, packed):
+        assert bsa_type(packed).assets == _lower_paths(_assets)
+
+    def test_hashed_lookup(self, bsa_type, packed):
+        """All assets are found by the hashes of their paths."""
+        packed_bsa = bsa_type(packed)
+        folder_files = packed_bsa._map_files_to_folders(
+            a.lower() for a in _assets)
+        folder_to_assets = packed_bsa._map_hashed_assets(folder_files)
+        assert folder_to_assets is not None
+        assert {f: {n for n, _rec in recs} for f, recs in
+                folder_to_assets.iteritems()} == folder_files
+
+    def test_missing_asset(self, bsa_type, packed):
+        """An asset that is not in the archive fails the hashed lookup."""
+        packed_bsa = bsa_type(packed)
+        assert packed_bsa._map_hashed_assets(packed_bsa._map_files_to_folders(
+            [u'meshes\\armor\\missing.nif'])) is None
+
+    @pytest.mark.parametrize(u'max_hashed', [256, 0],
+                             ids=[u'hashed', u'full_load'])
+    def test_extract(self, bsa_type, packed, tmpdir, monkeypatch, max_hashed):
+        """Extracting all assets gives back their contents - looking up their
+        records by hash and by loading all the records."""
+        monkeypatch.setattr(bsa_type, u'_max_hashed_assets', max_hashed)
+        dest_dir = tmpdir.join(u'Extracted')
+        bsa_type(packed).extract_assets(_assets, dest_dir.strpath)
+        # BA2s keep the case of the paths, BSAs lower case them
+        extracted = {f.relto(dest_dir).lower(): f.read_binary() for f in
+                     dest_dir.visit(lambda f: f.isfile())}
+        assert extracted == {a.lower().replace(u'\\', os.sep): c for a, c
+                             in _assets.iteritems()}
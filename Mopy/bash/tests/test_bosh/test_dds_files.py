@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import io
+import os
+import struct
+
+import pytest
+
+from ...bosh.bsa_files import BA2
+from ...bosh.dds_files import DDSFile, DDSHeaderInfo, DDS_HEADERS_SIZE, \
+    TextureReport, mk_dxgi_fmt, scan_loose_textures, _dxgi_by_name
+from ...exception import DDSError
+
+class _TexRecord(object):
+    """The attributes of a BA2 texture record BA2._build_dds_header uses."""
+    def __init__(self, fmt_name, width, height, num_mips=1, cube_maps=0):
+        self.dxgi_format = _dxgi_by_name[u'DXGI_FORMAT_' + fmt_name]
+        self.width, self.height = width, height
+        self.num_mips, self.cube_maps = num_mips, cube_maps
+
+def _headers(fmt_name, width, height, use_legacy_formats=True, **rec_attrs):
+    """Build the headers of a texture of the specified format, the way they
+    are built for textures in DX10 BA2s."""
+    dds_file = DDSFile(u'')
+    BA2._build_dds_header(dds_file, _TexRecord(fmt_name, width, height,
+                                               **rec_attrs))
+    if not use_legacy_formats:
+        _dxgi_by_name[u'DXGI_FORMAT_' + fmt_name].setup_file(dds_file)
+    return dds_file.dump_file()
+
+def _loaded(dds_headers):
+    dds_file = DDSFile(u'')
+    dds_file.load_headers(io.BytesIO(dds_headers))
+    return dds_file
+
+def _mips_size(block_size, width, height, num_mips):
+    """The size of the mips of a block compressed texture, the hard way."""
+    total = 0
+    for _mip in xrange(num_mips):
+        total += (-(-width // 4)) * (-(-height // 4)) * block_size
+        width, height = max(1, width // 2), max(1, height // 2)
+    return total
+
+class TestEstimateVram(object):
+    @pytest.mark.parametrize(u'fmt_name,block_size', [
+        (u'BC1_UNORM', 8), (u'BC3_UNORM', 16), (u'BC5_UNORM', 16),
+        (u'BC7_UNORM', 16)])
+    @pytest.mark.parametrize(u'width,height,num_mips', [
+        (1, 1, 1), (4, 4, 1), (256, 256, 9), (512, 128, 10), (30, 6, 5)])
+    def test_block_compressed(self, fmt_name, block_size, width, height,
+                              num_mips):
+        for use_legacy in (True, False):
+            dds_file = _loaded(_headers(fmt_name, width, height,
+                use_legacy_formats=use_legacy, num_mips=num_mips))
+            assert dds_file.is_compressed
+            assert dds_file.estimate_vram() == _mips_size(
+                block_size, width, height, num_mips)
+
+    def test_uncompressed(self):
+        dds_file = _loaded(_headers(u'B8G8R8A8_UNORM', 64, 32, num_mips=7))
+        assert not dds_file.dds_header.ddspf.needs_dxt10
+        assert not dds_file.is_compressed
+        assert dds_file.estimate_vram() == 4 * sum(
+            max(1, 64 >> m) * max(1, 32 >> m) for m in xrange(7))
+
+    def test_cubemap(self):
+        # a DXT10 cubemap, as built from a BA2 record...
+        dds_file = _loaded(_headers(u'BC7_UNORM', 128, 128, num_mips=8,
+                                    cube_maps=2049))
+        assert dds_file.dds_dxt10.misc_flag & 0x4
+        assert dds_file.estimate_vram() == 6 * _mips_size(16, 128, 128, 8)
+        # ...and a legacy one, flagged in dwCaps2
+        dds_file = _loaded(_headers(u'BC1_UNORM', 128, 128, num_mips=8,
+                                    cube_maps=2049))
+        assert not dds_file.dds_header.ddspf.needs_dxt10
+        assert dds_file.estimate_vram() == 6 * _mips_size(8, 128, 128, 8)
+
+    def test_array(self):
+        dds_file = DDSFile(u'')
+        BA2._build_dds_header(dds_file, _TexRecord(u'BC7_UNORM', 64, 64,
+                                                   num_mips=7))
+        dds_file.dds_dxt10.array_size = 3
+        dds_file = _loaded(dds_file.dump_file())
+        assert dds_file.estimate_vram() == 3 * _mips_size(16, 64, 64, 7)
+
+    def test_volume(self):
+        dds_file = DDSFile(u'')
+        BA2._build_dds_header(dds_file, _TexRecord(u'R8G8B8A8_UNORM', 16, 8,
+                                                   num_mips=5))
+        dds_file.dds_header.dw_depth = 4
+        dds_file.dds_header.dw_caps2.DDSCAPS2_VOLUME = True
+        dds_file = _loaded(dds_file.dump_file())
+        # the depth is halved with each mip too
+        assert dds_file.estimate_vram() == 4 * (
+            16 * 8 * 4 + 8 * 4 * 2 + 4 * 2 * 1 + 2 * 1 * 1 + 1 * 1 * 1)
+
+    @pytest.mark.parametrize(u'fmt_name,width,height,expected', [
+        # width * (height + 2 * ((height + 1) // 2))
+        (u'V208', 8, 8, 8 * 16), (u'V208', 6, 5, 6 * 11),
+        # width * (height + 4 * (height // 2))
+        (u'V408', 8, 8, 8 * 24), (u'V408', 6, 5, 6 * 13)])
+    def test_video_formats(self, fmt_name, width, height, expected):
+        """Regression test - the V208/V408 pitch functions did not take
+        the bpp argument all other pitch functions take."""
+        dds_headers = _headers(fmt_name, width, height)
+        dds_file = _loaded(dds_headers)
+        assert dds_file.dxgi_format is _dxgi_by_name[u'DXGI_FORMAT_' +
+                                                     fmt_name]
+        assert dds_file.dds_header.dw_pitch_or_linear_size == width
+        assert dds_file.estimate_vram() == expected
+        assert DDSHeaderInfo(u'v.dds', dds_headers).vram_size == expected
+
+class TestLegacyFormats(object):
+    @staticmethod
+    def _fourcc_headers(four_cc, width=16, height=16):
+        dds_file = DDSFile(u'')
+        BA2._build_dds_header(dds_file, _TexRecord(u'BC1_UNORM', width,
+                                                   height))
+        dds_file.dds_header.ddspf.pf_four_cc = four_cc
+        return dds_file.dump_file()
+
+    @pytest.mark.parametrize(u'four_cc,fmt_name', [
+        (b'DXT1', u'BC1_UNORM'), (b'DXT2', u'BC2_UNORM'),
+        (b'DXT3', u'BC2_UNORM'), (b'DXT4', u'BC3_UNORM'),
+        (b'DXT5', u'BC3_UNORM'), (b'ATI1', u'BC4_UNORM'),
+        (b'BC4U', u'BC4_UNORM'), (b'ATI2', u'BC5_UNORM'),
+        (b'BC5U', u'BC5_UNORM'),
+        (b'\x24\x00\x00\x00', u'R16G16B16A16_UNORM'),
+        (b'\x6f\x00\x00\x00', u'R16_FLOAT'),
+        (b'\x70\x00\x00\x00', u'R16G16_FLOAT'),
+        (b'\x71\x00\x00\x00', u'R16G16B16A16_FLOAT'),
+        (b'\x72\x00\x00\x00', u'R32_FLOAT'),
+        (b'\x73\x00\x00\x00', u'R32G32_FLOAT'),
+        (b'\x74\x00\x00\x00', u'R32G32B32A32_FLOAT')])
+    def test_fourcc(self, four_cc, fmt_name):
+        dds_file = _loaded(self._fourcc_headers(four_cc))
+        assert dds_file.format_name == fmt_name
+        assert dds_file.dxgi_format is _dxgi_by_name[u'DXGI_FORMAT_' +
+                                                     fmt_name]
+
+    def test_unknown_fourcc(self):
+        dds_file = _loaded(self._fourcc_headers(b'ABCD', 8, 8))
+        assert dds_file.dxgi_format is None
+        assert dds_file.format_name == u"'ABCD'"
+        assert not dds_file.is_compressed
+
+    def test_rgb24(self):
+        """24 bit RGB has no DXGI equivalent - the bit count is used."""
+        dds_file = DDSFile(u'')
+        BA2._build_dds_header(dds_file, _TexRecord(u'B8G8R8X8_UNORM', 16, 8,
+                                                   num_mips=2))
+        ddspf = dds_file.dds_header.ddspf
+        ddspf.pf_rgb_bit_count = 24
+        ddspf.pf_r_bit_mask, ddspf.pf_g_bit_mask, ddspf.pf_b_bit_mask = (
+            0xFF0000, 0x00FF00, 0x0000FF)
+        dds_file = _loaded(dds_file.dump_file())
+        assert dds_file.dxgi_format is None
+        assert dds_file.format_name == u'RGB24'
+        assert dds_file.estimate_vram() == 3 * (16 * 8 + 8 * 4)
+
+class TestLoadHeaders(object):
+    def test_round_trip(self):
+        dds_headers = _headers(u'BC7_UNORM', 512, 256, num_mips=10)
+        assert len(dds_headers) == DDS_HEADERS_SIZE
+        dds_file = _loaded(dds_headers + b'ignored texture data')
+        assert dds_file.dds_header.dw_width == 512
+        assert dds_file.dds_header.dw_height == 256
+        assert dds_file.dds_header.dw_mip_map_count == 10
+        assert dds_file.dump_file() == dds_headers
+        # legacy files have no DXT10 header
+        assert len(_headers(u'BC1_UNORM', 16, 16)) == DDS_HEADERS_SIZE - 20
+
+    @pytest.mark.parametrize(u'size', [0, 3, 4, 50, 127, 128,
+                                       DDS_HEADERS_SIZE - 1])
+    def test_truncated(self, size):
+        with pytest.raises(DDSError):
+            _loaded(_headers(u'BC7_UNORM', 16, 16)[:size])
+
+    @pytest.mark.parametrize(u'offset,value', [
+        (0, b'DDS!'), # magic
+        (4, struct.pack(u'=I', 123)), # header size
+        (76, struct.pack(u'=I', 31)), # pixel format size
+        (128, struct.pack(u'=I', 0xFFFF))]) # DXGI format
+    def test_invalid(self, offset, value):
+        dds_headers = _headers(u'BC7_UNORM', 16, 16)
+        dds_headers = dds_headers[:offset] + value + dds_headers[
+            offset + len(value):]
+        with pytest.raises(DDSError):
+            _loaded(dds_headers)
+        info = DDSHeaderInfo(u'bad.dds', dds_headers)
+        assert info.error
+
+    def test_mk_dxgi_fmt(self):
+        bc7 = _dxgi_by_name[u'DXGI_FORMAT_BC7_UNORM']
+        assert mk_dxgi_fmt(bc7.fmt_index) is bc7
+        with pytest.raises(DDSError):
+            mk_dxgi_fmt(0xFFFF)
+
+def test_scan_loose_textures(tmpdir):
+    textures = {
+        os.path.join(u'textures', u'a.dds'): _headers(u'BC7_UNORM', 64, 64,
+            num_mips=7) + b'\x00' * 1000,
+        os.path.join(u'textures', u'b', u'c.dds'): _headers(u'BC1_UNORM', 8,
+                                                            4),
+        u'truncated.dds': b'DDS ',
+    }
+    for rel_path, contents in textures.iteritems():
+        tmpdir.join(rel_path).write_binary(contents, ensure=True)
+    rel_paths = sorted(textures) + [u'missing.dds']
+    infos = scan_loose_textures(tmpdir.strpath, rel_paths)
+    assert [i.dds_path for i in infos] == rel_paths
+    a, c, truncated, missing = [infos[rel_paths.index(p)] for p in (
+        os.path.join(u'textures', u'a.dds'),
+        os.path.join(u'textures', u'b', u'c.dds'), u'truncated.dds',
+        u'missing.dds')]
+    assert (a.format_name, a.width, a.height, a.mip_count, a.vram_size,
+            a.is_compressed, a.error) == (u'BC7_UNORM', 64, 64, 7,
+                                          _mips_size(16, 64, 64, 7), True,
+                                          None)
+    assert (c.format_name, c.vram_size, c.error) == (u'BC1_UNORM', 16, None)
+    assert truncated.error.startswith(u'Truncated header')
+    assert missing.error
+
+class TestTextureReport(object):
+    @staticmethod
+    def _info(dds_path, fmt_name, width, height, **rec_attrs):
+        return DDSHeaderInfo(dds_path, _headers(fmt_name, width, height,
+                                                **rec_attrs))
+
+    def test_render(self):
+        report = TextureReport()
+        report.add_package(u'Package A', [
+            self._info(u'big.dds', u'B8G8R8A8_UNORM', 4096, 1024),
+            self._info(u'compressed.dds', u'BC7_UNORM', 4096, 4096),
+            self._info(u'small.dds', u'B8G8R8A8_UNORM', 16, 16),
+            DDSHeaderInfo(u'bad.dds', b'DDS '),
+        ])
+        report.add_package(u'Package B', [
+            self._info(u'tiny.dds', u'BC1_UNORM', 4, 4)])
+        lines = report.render(top_count=2).splitlines()
+        assert lines == [
+            u'=== Package A',
+            u'Textures: 4, estimated VRAM: 32 MB',
+            u'  B8G8R8A8_UNORM: 2 (16 MB)',
+            u'  BC7_UNORM: 1 (16 MB)',
+            u'Biggest:',
+            u'  big.dds: 4096x1024 B8G8R8A8_UNORM, 1 mips, 16 MB',
+            u'  compressed.dds: 4096x4096 BC7_UNORM, 1 mips, 16 MB',
+            u'Uncompressed, 4096 or larger:',
+            u'  big.dds: 4096x1024 B8G8R8A8_UNORM, 1 mips, 16 MB',
+            u'Malformed:',
+            u'  bad.dds: %s' % DDSHeaderInfo(u'bad.dds', b'DDS ').error,
+            u'',
+            u'=== Package B',
+            u'Textures: 1, estimated VRAM: 0 KB',
+            u'  BC1_UNORM: 1 (0 KB)',
+            u'Biggest:',
+            u'  tiny.dds: 4x4 BC1_UNORM, 1 mips, 0 KB',
+            u'',
+            u'Total estimated VRAM: 32 MB',
+        ]
+
+    def test_single_package(self):
+        report = TextureReport()
+        report.add_package(u'Package', [])
+        assert report.render() == (u'=== Package\nTextures: 0, estimated '
+                                   u'VRAM: 0 KB\n\n')
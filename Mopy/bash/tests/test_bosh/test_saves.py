@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import array
+import io
+import random
+from collections import Counter
+
+import lz4.block
+import pytest
+
+from ...bolt import GPath, pack_byte, pack_float, pack_int, pack_short, \
+    structs_cache
+from ...bosh._saves import SaveFile
+from ...bosh.save_headers import SkyrimSaveHeader
+from ...exception import SaveHeaderError, StateError
+
+# Synthetic Oblivion save -----------------------------------------------------
+def _pack(out, fmt, *args):
+    out.write(structs_cache[fmt].pack(*args))
+
+def _pack_str8(out, val):
+    pack_byte(out, len(val) + 1)
+    out.write(val + b'\x00')
+
+# Created items - (signature, full name, count), enough potions and spells
+# to be bloat, but not the rest
+_created = [(b'ALCH', b'Potion', 120), (b'SPEL', b'Spell', 60),
+            (b'ALCH', b'Rare Potion', 10), (b'WEAP', b'Sword', 3)]
+# The irefs of the save - 0 is a null ref
+_fids = [0x00000014, 0, 0x0001A2B3, 0, 0x00C0FFEE, 0x00000007]
+
+def _created_items():
+    """Return the created items of the synthetic save, as (signature, fid,
+    full name) tuples."""
+    items, fid = [], 0xFF000800
+    for rec_sig, full, count in _created:
+        for _i in xrange(count):
+            items.append((rec_sig, fid, full))
+            fid += 1
+    return items
+
+def _change_records():
+    """Return the change records of the synthetic save - one per created
+    item, some refs to the masters, to null refs and to other created refs
+    (kind 49) and changes of the masters' records."""
+    records = []
+    for i, (rec_sig, fid, _full) in enumerate(_created_items()):
+        # every seventh is a created ref to a null ref as well
+        rec_kind = 49 if not i % 7 else 2 if rec_sig == b'SPEL' else 7
+        records.append((fid, rec_kind, 2, 0, structs_cache[u'2I'].pack(0, 1)))
+    for i in xrange(40):
+        # a created ref (flag 2) - its base iref follows the flags
+        iref = (i % len(_fids)) if i % 5 else 0xFF000900 + i
+        records.append((0xFF001000 + i, 49, 2 if i % 3 else 0, 0,
+                        structs_cache[u'2I'].pack(0, iref) + b'\xAB' * i))
+    for i in xrange(30):
+        records.append((0x00001000 + i, 1 + i % 4, i, 0, b'\x00' * (i * 3)))
+    return records
+
+def _write_save(save_path):
+    with open(save_path, u'wb') as out:
+        out.write(b'TES4SAVEGAME')
+        pack_byte(out, 0) # major_version
+        pack_byte(out, 125) # minor_version
+        out.write(b'\x00' * 16) # exe_time
+        pack_int(out, 125) # header_version
+        pack_int(out, 0) # header_size, not checked
+        pack_int(out, 7) # saveNum
+        _pack_str8(out, b'Bench')
+        pack_short(out, 12) # pcLevel
+        _pack_str8(out, b'Imperial City')
+        pack_float(out, 3.5) # gameDays
+        pack_int(out, 1000) # gameTicks
+        out.write(b'\x00' * 16) # gameTime
+        pack_int(out, 4 * 2 * 3 + 8) # ssSize
+        pack_int(out, 4) # ssWidth
+        pack_int(out, 2) # ssHeight
+        out.write(b'\x7f' * 4 * 2 * 3) # the screenshot
+        pack_byte(out, 2) # masters
+        _pack_str8(out, b'Oblivion.esm')
+        _pack_str8(out, b'Bench.esp')
+        records = _change_records()
+        _pack(out, u'2I', 0, len(records)) # fids pointer (not checked)
+        out.write(b'\x11' * 32) # pre-globals
+        pack_short(out, 2) # globals
+        _pack(out, u'If', 1, 2.0)
+        _pack(out, u'If', 3, 4.0)
+        for i in xrange(4): # pre-created - class, processes etc.
+            pack_short(out, i + 8)
+            out.write(b'\x22' * (i + 8))
+        out.write(b'\x00' * 4)
+        created = _created_items()
+        pack_int(out, len(created))
+        for rec_sig, fid, full in created:
+            data = b'FULL' + structs_cache[u'H'].pack(len(full) + 1) + \
+                   full + b'\x00'
+            _pack(out, u'=4s4I', rec_sig, len(data), 0, fid, 0)
+            out.write(data)
+        for i in xrange(4): # pre-records - quickkeys, reticule etc.
+            pack_short(out, i + 4)
+            out.write(b'\x33' * (i + 4))
+        for rec_id, rec_kind, rec_flags, version, data in records:
+            _pack(out, u'=IBIBH', rec_id, rec_kind, rec_flags, version,
+                  len(data))
+            out.write(data)
+        pack_int(out, 5) # temp effects
+        out.write(b'\x44' * 5)
+        pack_int(out, len(_fids))
+        array.array(u'I', _fids).tofile(out)
+        pack_int(out, 2) # worldspaces
+        array.array(u'I', [0x3C, 0x1000]).tofile(out)
+
+class _SaveInfo(object):
+    """What SaveFile needs of a SaveInfo."""
+    def __init__(self, save_path):
+        self.abs_path = GPath(save_path)
+        self.name = self.abs_path.tail
+        self.fsize = self.abs_path.psize
+
+    def getPath(self): return self.abs_path
+
+class _ListRecords(list):
+    """The change records as a list of (rec_id, rec_kind, flags, version,
+    data) tuples, written out one by one - as SaveFile kept them before
+    they were indexed over a memory map."""
+    def rec_ids(self):
+        return (record[0] for record in self)
+
+    def dump(self, out):
+        for rec_id, rec_kind, rec_flags, version, data in self:
+            _pack(out, u'=IBIBH', rec_id, rec_kind, rec_flags, version,
+                  len(data))
+            out.write(data)
+
+    def close(self): pass
+
+@pytest.fixture
+def save_path(tmpdir):
+    save_path = tmpdir.join(u'Bench.ess').strpath
+    _write_save(save_path)
+    return save_path
+
+@pytest.fixture
+def load_save(save_path):
+    """Return a function loading the synthetic save - the saves it loaded
+    release their memory maps on teardown."""
+    loaded = []
+    def _load():
+        save_file = SaveFile(_SaveInfo(save_path))
+        save_file.load()
+        loaded.append(save_file)
+        return save_file
+    yield _load
+    for save_file in loaded:
+        save_file.records.close()
+
+def _list_save(load_save):
+    """Load the save, keeping the change records as a list."""
+    save_file = load_save()
+    save_file.records = _ListRecords(save_file.records)
+    return save_file
+
+def _written(save_file, out_path):
+    save_file.save(GPath(out_path))
+    with open(out_path, u'rb') as ins:
+        return ins.read()
+
+# Change records --------------------------------------------------------------
+class TestChangeRecords(object):
+    def test_load(self, load_save):
+        save_file = load_save()
+        assert list(save_file.records) == _change_records()
+        assert list(save_file.records.rec_ids()) == [
+            r[0] for r in _change_records()]
+        assert [(fid, rec_sig, save_file.created[i].getSubString(b'FULL'))
+                for i, (rec_sig, fid, _full) in enumerate(_created_items())
+                ] == [(c.fid, c._rec_sig, c.getSubString(b'FULL')) for c in
+                      save_file.created]
+
+    def test_headers(self, load_save):
+        save_file = load_save()
+        save_file.records[3] = (0xFF000803, 7, 5, 1, b'set')
+        headers = [(rec_id, rec_kind, rec_flags, siz,
+                    bytes(buff[pos:pos + siz])) for
+                   rec_id, rec_kind, rec_flags, siz, buff, pos in
+                   save_file.records.headers()]
+        assert headers == [(r[0], r[1], r[2], len(r[4]), r[4]) for r in
+                           save_file.records]
+
+    def test_unchanged(self, load_save, save_path, tmpdir):
+        """Writing an unchanged save gives the same bytes as writing the
+        records one by one, and as the save itself."""
+        out_path = tmpdir.join(u'Out.ess').strpath
+        written = _written(load_save(), out_path)
+        assert written == _written(_list_save(load_save),
+                                   tmpdir.join(u'List.ess').strpath)
+        with open(save_path, u'rb') as ins:
+            save_bytes = ins.read()
+        # the header size and the fids pointer get updated
+        assert len(written) == len(save_bytes)
+
+    def test_edited(self, load_save, tmpdir):
+        """Setting, appending and deleting records and keeping only some of
+        them gives the same bytes as doing that to a list of records."""
+        save_file, list_save = load_save(), _list_save(load_save)
+        for edited in (save_file, list_save):
+            # edit a record in the middle of a run of unchanged ones
+            edited.setRecord((0xFF001005, 49, 2, 3, b'edited data'))
+            # append new ones
+            for i in xrange(3):
+                edited.setRecord((0x00F00000 + i, 8, 0, 0, b'new%d' % i))
+            # delete a record after the edited one and the first record
+            for fid in (0xFF001007, _change_records()[0][0]):
+                assert edited.removeRecord(fid)
+        assert len(save_file.records) == len(_change_records()) + 1
+        # keep every other record but the last ones
+        kept = [i for i in xrange(len(save_file.records)) if i % 2 or i > 250]
+        save_file.records.retain(kept)
+        list_save.records = _ListRecords(list_save.records[i] for i in kept)
+        assert list(save_file.records) == list(list_save.records)
+        out_path = tmpdir.join(u'Out.ess').strpath
+        assert _written(save_file, out_path) == _written(
+            list_save, tmpdir.join(u'List.ess').strpath)
+        # and the written save loads with those records
+        written = SaveFile(_SaveInfo(out_path))
+        written.load()
+        try:
+            assert list(written.records) == list(list_save.records)
+        finally:
+            written.records.close()
+
+    def test_save_over_original(self, load_save, save_path):
+        save_file = load_save()
+        with pytest.raises(StateError):
+            save_file.save(GPath(save_path))
+
+# Bloating --------------------------------------------------------------------
+def _full(citem):
+    if u'full' in citem.__class__.__slots__:
+        return citem.full
+    return citem.getSubString(b'FULL')
+
+def _is_null_ref(save_file, record):
+    rec_id, rec_kind, rec_flags, _version, data = record
+    if rec_kind == 49 and rec_id >> 24 == 0xFF and rec_flags & 2:
+        iref, = structs_cache[u'I'].unpack(data[4:8])
+        return iref >> 24 != 0xFF and save_file.fids[iref] == 0
+    return False
+
+def _find_bloating(save_file):
+    """What findBloating did before the single pass analysis - count the
+    created items and the null refs in two passes."""
+    created_counts = Counter()
+    for citem in save_file.created:
+        full = _full(citem)
+        if full:
+            created_counts[(citem._rec_sig, full)] += 1
+    for k in list(created_counts):
+        if created_counts[k] < (50, 100)[k[0] == b'ALCH']:
+            del created_counts[k]
+    return created_counts, sum(_is_null_ref(save_file, r) for r in
+                               save_file.records)
+
+def _remove_bloating(save_file, uncreate_keys, remove_null_refs):
+    """What removeBloating did before the single pass analysis."""
+    num_uncreated = num_uncre_changed = num_unnulled = 0
+    uncreated, kept = set(), []
+    for citem in save_file.created:
+        full = _full(citem)
+        if full and (citem._rec_sig, full) in uncreate_keys:
+            uncreated.add(citem.fid)
+            num_uncreated += 1
+        else:
+            kept.append(citem)
+    save_file.created = kept
+    kept = []
+    for record in save_file.records:
+        if record[0] in uncreated:
+            num_uncre_changed += 1
+        elif remove_null_refs and _is_null_ref(save_file, record):
+            num_unnulled += 1
+        else:
+            kept.append(record)
+    save_file.records = _ListRecords(kept)
+    save_file.fid_recNum = None
+    return num_uncreated, num_uncre_changed, num_unnulled
+
+class TestBloating(object):
+    def test_find_bloating(self, load_save):
+        created_counts, null_refs = load_save().findBloating()
+        assert (created_counts, null_refs) == _find_bloating(
+            _list_save(load_save))
+        assert created_counts == {(b'ALCH', b'Potion'): 120,
+                                  (b'SPEL', b'Spell'): 60}
+        assert null_refs
+
+    @pytest.mark.parametrize(u'remove_null_refs', [True, False])
+    @pytest.mark.parametrize(u'uncreate', [u'all', u'one', u'none'])
+    @pytest.mark.parametrize(u'edit', [False, True],
+                             ids=[u'analyzed', u'edited'])
+    def test_remove_bloating(self, load_save, tmpdir, remove_null_refs,
+                             uncreate, edit):
+        """Removing the bloat findBloating found gives the same counts and
+        the same save as the two pass removal - also if the change records
+        were edited in between, so the analysis is stale."""
+        save_file, list_save = load_save(), _list_save(load_save)
+        created_counts, _null_refs = save_file.findBloating()
+        uncreate_keys = {u'all': set(created_counts),
+                         u'one': {(b'SPEL', b'Spell')},
+                         u'none': set()}[uncreate]
+        if edit:
+            for edited in (save_file, list_save):
+                assert edited.removeRecord(0xFF000800)
+                edited.setRecord((0xFF000900, 49, 2, 0,
+                                  structs_cache[u'2I'].pack(0, 3)))
+        assert save_file.removeBloating(uncreate_keys, remove_null_refs) == \
+               _remove_bloating(list_save, uncreate_keys, remove_null_refs)
+        assert [c.fid for c in save_file.created] == [
+            c.fid for c in list_save.created]
+        assert list(save_file.records) == list(list_save.records)
+        assert _written(save_file, tmpdir.join(u'Out.ess').strpath) == \
+               _written(list_save, tmpdir.join(u'List.ess').strpath)
+
+# LZ4 compressed SSE headers --------------------------------------------------
+def _lsic(length):
+    """Encode the part of a literal/match length that did not fit in the
+    token, see SkyrimSaveHeader._lz4_parse_head."""
+    return b'\xff' * ((length - 15) // 255) + bytearray([(length - 15) % 255])
+
+def _lz4_block(sequences, last_literals):
+    """Build an LZ4 block from (literals, offset, match length) sequences -
+    the offsets and lengths are not checked, so invalid blocks can be built
+    too."""
+    comp = bytearray()
+    for literals, offset, match_length in sequences + [(last_literals, None,
+                                                         None)]:
+        token = min(len(literals), 15) << 4
+        if match_length is not None:
+            token |= min(match_length - 4, 15)
+        comp.append(token)
+        if len(literals) >= 15: comp += _lsic(len(literals))
+        comp += literals
+        if match_length is None: break
+        comp += structs_cache[u'H'].pack(offset)
+        if match_length - 4 >= 15: comp += _lsic(match_length - 4)
+    return bytes(comp)
+
+def _lz4_naive(comp):
+    """Decompress an LZ4 block a byte at a time."""
+    ins, out = io.BytesIO(comp), bytearray()
+    def _length(nibble):
+        if nibble != 15: return nibble
+        while True:
+            byte = ord(ins.read(1))
+            nibble += byte
+            if byte != 255: return nibble
+    while True:
+        token = ord(ins.read(1))
+        out += ins.read(_length(token >> 4))
+        if ins.tell() == len(comp): return bytes(out)
+        offset = structs_cache[u'H'].unpack(ins.read(2))[0]
+        for _i in xrange(_length(token & 0b1111) + 4):
+            out.append(out[-offset])
+
+def _random_head(rng):
+    """Return a random LZ4 block starting with an SSE masters table - a
+    byte, the size of the table and the table itself - and its size."""
+    masters_size = rng.choice((0, rng.randint(1, 40), rng.randint(100, 2000),
+                               rng.randint(60000, 80000)))
+    out = bytearray(rng.choice(b'\x01\x02\x03'))
+    out += structs_cache[u'I'].pack(masters_size)
+    literals = out + bytearray(rng.choice(b'ab.esm') for _i in xrange(
+        rng.randint(0, 20)))
+    out = bytearray(literals)
+    sequences = []
+    while len(out) < masters_size + 5 + rng.randint(0, 100):
+        offset = rng.randint(1, min(len(out), 0xFFFF))
+        # short, overlapping (longer than the offset) and long LSIC matches
+        match_length = rng.choice((4, rng.randint(4, 18), max(4, offset + 1),
+                                   rng.randint(19, 600), 300 + 255 * 3))
+        sequences.append((bytes(literals), offset, match_length))
+        for _i in xrange(match_length):
+            out.append(out[-offset])
+        literals = bytearray(rng.choice(b'abcdefgh.esmp') for _i in xrange(
+            rng.choice((0, rng.randint(1, 14), rng.randint(15, 300)))))
+        out += literals
+    # the spec requires the last 5 bytes to be literals
+    last_literals = bytes(literals) + b'tail!' * rng.randint(1, 4)
+    comp = _lz4_block(sequences, last_literals)
+    return comp, masters_size + 5
+
+class TestLz4Head(object):
+    @staticmethod
+    def _check_head(head, comp, needed):
+        """Check that head is a prefix of the decompressed comp that contains
+        at least its first needed bytes."""
+        full = _lz4_naive(comp)
+        assert len(head) >= needed
+        assert head == full[:len(head)]
+
+    @pytest.mark.parametrize(u'seed', range(40))
+    def test_random_blocks(self, seed):
+        rng = random.Random(seed)
+        comp, needed = _random_head(rng)
+        full = _lz4_naive(comp)
+        # the lz4 module agrees with the naive decompression
+        assert lz4.block.decompress(comp, uncompressed_size=len(full)) == full
+        self._check_head(SkyrimSaveHeader._lz4_parse_head(io.BytesIO(comp)
+            ).getvalue(), comp, needed)
+        for chunk_size in (1, 7, rng.randint(8, 1000), 0x10000):
+            self._check_head(SkyrimSaveHeader._lz4_decompress_head(
+                io.BytesIO(comp), len(comp), chunk_size).getvalue(), comp,
+                needed)
+        self._check_head(SkyrimSaveHeader._sse_light_decompress_lz4(
+            io.BytesIO(comp), len(comp), len(full)).getvalue(), comp, needed)
+
+    @pytest.mark.parametrize(u'seed', range(20))
+    def test_compressed(self, seed):
+        """Blocks written by the lz4 module, as SSE saves are."""
+        rng = random.Random(seed)
+        masters = b''.join(b'%s%03d.esp' % (rng.choice((b'a', b'bb', b'ccc')),
+            rng.randint(0, 100)) for _i in xrange(rng.randint(0, 300)))
+        data = b'\x02' + structs_cache[u'I'].pack(len(masters)) + masters + \
+               bytes(bytearray(rng.getrandbits(8) for _i in xrange(
+                   rng.randint(0, 3000)))) + b'\x00' * rng.randint(0, 5000)
+        comp = lz4.block.compress(data, store_size=False,
+            mode=rng.choice((u'default', u'fast', u'high_compression')))
+        needed = len(masters) + 5
+        assert _lz4_naive(comp) == data
+        for head in (SkyrimSaveHeader._lz4_parse_head(io.BytesIO(comp)),
+                     SkyrimSaveHeader._lz4_decompress_head(
+                         io.BytesIO(comp), len(comp), rng.randint(1, 5000))):
+            head = head.getvalue()
+            assert len(head) >= needed and data.startswith(head)
+
+    @pytest.mark.parametrize(u'seed', range(20))
+    def test_literal_ends(self, seed):
+        """Every cut _lz4_literal_ends yields that the lz4 module accepts
+        decompresses to a prefix of the data of the promised size."""
+        rng = random.Random(seed)
+        comp, needed = _random_head(rng)
+        full = _lz4_naive(comp)
+        cuts = list(SkyrimSaveHeader._lz4_literal_ends(bytearray(comp),
+                                                       needed))
+        assert cuts and cuts[-1] == (len(comp), len(full))
+        for cut, size in cuts:
+            assert size >= needed
+            assert _lz4_naive(comp[:cut]) == full[:size]
+        # cuts of a truncated block stop before the data runs out
+        short = bytearray(comp[:rng.randint(0, len(comp) - 1)])
+        assert all(cut <= len(short) for cut, _size in
+                   SkyrimSaveHeader._lz4_literal_ends(short, needed))
+
+    def test_overlapping(self):
+        """Matches longer than their offset repeat the last offset bytes."""
+        head = b'\x01' + structs_cache[u'I'].pack(600)
+        comp = _lz4_block([(head + b'ab', 2, 300), (b'xyz', 1, 296)],
+                          b'!' * 12)
+        expected = head + b'ab' * 151 + b'xyz' + b'z' * 296 + b'!' * 12
+        assert _lz4_naive(comp) == expected
+        for head in (SkyrimSaveHeader._lz4_parse_head(io.BytesIO(comp)),
+                     SkyrimSaveHeader._lz4_decompress_head(io.BytesIO(comp),
+                                                           len(comp), 5)):
+            head = head.getvalue()
+            assert len(head) >= 605 and expected.startswith(head)
+
+    @pytest.mark.parametrize(u'offset', [0, 10, 0xFFFF])
+    def test_invalid_offset(self, offset):
+        """Matches starting before the data are rejected, by the lz4 module
+        and the python fallback."""
+        comp = _lz4_block([(b'\x01' + structs_cache[u'I'].pack(100) + b'abcd',
+                            offset, 200)], b'!' * 12)
+        with pytest.raises(SaveHeaderError):
+            SkyrimSaveHeader._lz4_parse_head(io.BytesIO(comp))
+        with pytest.raises(SaveHeaderError):
+            SkyrimSaveHeader._lz4_decompress_head(io.BytesIO(comp), len(comp))
+        with pytest.raises(SaveHeaderError):
+            SkyrimSaveHeader._sse_light_decompress_lz4(io.BytesIO(comp),
+                                                       len(comp), 300)
+
+    @pytest.mark.parametrize(u'seed', range(10))
+    def test_truncated(self, seed):
+        """Blocks that end before the masters table does can't be
+        decompressed."""
+        rng = random.Random(seed)
+        comp, needed = _random_head(rng)
+        while len(_lz4_naive(comp)) > needed:
+            comp, needed = _random_head(rng)
+            if needed > 100: comp = comp[:-rng.randint(1, 3)]
+        comp = comp[:rng.randint(0, len(comp) - 1)]
+        with pytest.raises(SaveHeaderError):
+            SkyrimSaveHeader._lz4_decompress_head(io.BytesIO(comp), len(comp))
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import marshal
+
+import pytest
+
+from ... import bosh
+from ...bolt import GPath
+from ...bosh import SaveInfo
+from ...bosh._saves_cache import SaveHeadersCache
+from ...bosh.save_headers import OblivionSaveHeader
+from .test_saves import _write_save
+
+@pytest.fixture
+def save_path(tmpdir):
+    save_path = GPath(tmpdir.join(u'Bench.ess').strpath)
+    _write_save(save_path.s)
+    return save_path
+
+def _state(header):
+    """The attributes of header, as read from the save."""
+    state = {}
+    for attr in header._cached_attrs():
+        try:
+            state[attr] = getattr(header, attr)
+        except AttributeError:
+            continue
+    return state
+
+def _marshalled(cached):
+    """What the cache file returns for the output of dump_cache."""
+    return marshal.loads(marshal.dumps(cached, 2))
+
+class TestFromCache(object):
+    def test_equal(self, save_path):
+        header = OblivionSaveHeader(save_path)
+        rebuilt = OblivionSaveHeader.from_cache(save_path, _marshalled(
+            header.dump_cache()))
+        assert _state(rebuilt) == _state(header)
+        assert len(header.masters) == 2
+        assert rebuilt.masters == header.masters
+        assert all(isinstance(m, type(header.masters[0]))
+                   for m in rebuilt.masters)
+        assert rebuilt._image_offset == header._image_offset
+        assert rebuilt.image_parameters == header.image_parameters
+        assert not rebuilt.image_loaded and not rebuilt.has_thumbnail
+
+    def test_thumbnail(self, save_path):
+        header = OblivionSaveHeader(save_path)
+        thumbnail = header.thumbnail_parameters
+        rebuilt = OblivionSaveHeader.from_cache(save_path, _marshalled(
+            header.dump_cache()))
+        assert rebuilt.has_thumbnail
+        assert rebuilt.thumbnail_parameters == thumbnail
+
+class _SaveInfo(object):
+    """What SaveHeadersCache needs of a SaveInfo."""
+    def __init__(self, save_path, fsize=None, mtime=None):
+        self.name = save_path.tail
+        self.fsize = save_path.psize if fsize is None else fsize
+        self._file_mod_time = save_path.mtime if mtime is None else mtime
+        self.header = OblivionSaveHeader(save_path)
+
+class TestSaveHeadersCache(object):
+    @pytest.fixture(autouse=True)
+    def _cache_path(self, tmpdir):
+        self.cache_path = GPath(tmpdir.join(u'Save Headers.dat').strpath)
+
+    def _cache(self): return SaveHeadersCache(self.cache_path)
+
+    def test_saved(self, save_path):
+        cache, save_info = self._cache(), _SaveInfo(save_path)
+        assert cache.get(save_info) is None
+        cache.put(save_info)
+        cache.save()
+        # save names are case insensitive
+        upper = _SaveInfo(save_path)
+        upper.name = GPath(save_path.stail.upper())
+        cached = self._cache().get(upper)
+        assert cached == _marshalled(save_info.header.dump_cache())
+
+    def test_thumbnail_added(self, save_path):
+        cache, save_info = self._cache(), _SaveInfo(save_path)
+        cache.put(save_info)
+        cache.save()
+        mtime = self.cache_path.mtime
+        cache = self._cache()
+        cache.put(save_info) # no-op, cached already
+        cache.save()
+        assert self.cache_path.mtime == mtime
+        save_info.header.thumbnail_parameters
+        cache.put(save_info)
+        cache.save()
+        assert self._cache().get(save_info)[1] is not None
+
+    @pytest.mark.parametrize(u'stat_change', [{u'fsize': 1},
+                                              {u'mtime': 1500000000.0}])
+    def test_stale(self, save_path, stat_change):
+        cache = self._cache()
+        cache.put(_SaveInfo(save_path))
+        cache.save()
+        assert self._cache().get(_SaveInfo(save_path, **stat_change)) is None
+
+    @pytest.mark.parametrize(u'contents', [b'', b'garbage',
+        marshal.dumps(u'garbage'), marshal.dumps((1, {})),
+        marshal.dumps((2, {u'bench.ess': (1, 2.0, {}, None)}))[:-3]])
+    def test_unreadable(self, save_path, contents):
+        with self.cache_path.open(u'wb') as out:
+            out.write(contents)
+        cache, save_info = self._cache(), _SaveInfo(save_path)
+        assert cache.get(save_info) is None
+        cache.put(save_info)
+        cache.save()
+        assert self._cache().get(save_info) is not None
+
+    def test_prune(self, save_path, tmpdir):
+        other_path = GPath(tmpdir.join(u'Other.ess').strpath)
+        _write_save(other_path.s)
+        cache = self._cache()
+        cache.put(_SaveInfo(save_path))
+        cache.put(_SaveInfo(other_path))
+        cache.prune({u'other.ess'})
+        cache.save()
+        cache = self._cache()
+        assert cache.get(_SaveInfo(save_path)) is None
+        assert cache.get(_SaveInfo(other_path)) is not None
+
+class _SaveInfos(object):
+    """What SaveInfo.readHeader needs of SaveInfos."""
+    def __init__(self, headers_cache):
+        self.headers_cache = headers_cache
+
+class TestReadHeader(object):
+    @pytest.fixture(autouse=True)
+    def _save_infos(self, tmpdir, monkeypatch):
+        self.headers_cache = SaveHeadersCache(GPath(tmpdir.join(
+            u'Save Headers.dat').strpath))
+        monkeypatch.setattr(bosh, u'saveInfos', _SaveInfos(
+            self.headers_cache))
+        self.parsed = []
+        read_save_header = OblivionSaveHeader.read_save_header
+        def _read_save_header(header, *args, **kwargs):
+            self.parsed.append(header._save_path)
+            return read_save_header(header, *args, **kwargs)
+        monkeypatch.setattr(OblivionSaveHeader, u'read_save_header',
+                            _read_save_header)
+
+    def test_cached(self, save_path):
+        parsed_info = SaveInfo(save_path, load_cache=True)
+        assert self.parsed == [save_path]
+        cached_info = SaveInfo(save_path, load_cache=True)
+        assert self.parsed == [save_path]
+        assert _state(cached_info.header) == _state(parsed_info.header)
+        assert cached_info.masterNames == parsed_info.masterNames
+
+    def test_stale(self, save_path):
+        SaveInfo(save_path, load_cache=True)
+        save_path.mtime = 1500000000
+        SaveInfo(save_path, load_cache=True)
+        assert self.parsed == [save_path] * 2
+
+    @pytest.mark.parametrize(u'corrupt_entry', [
+        lambda e: e[:2] + (None, None),
+        lambda e: e[:2] + ({}, None),
+        lambda e: e[:2] + ({u'ssWidth': 4}, None),
+        lambda e: e[:2] + (e[2], (4, 2)),
+        lambda e: e[:2] + (dict(e[2], masters=[]), None, None),
+        lambda e: e[:2] + (dict(e[2], masters=5), None),
+        lambda e: e[:2] + ([(u'masters', [])], None),
+        lambda e: e[:2] + (dict(e[2], masters=[1]), None),
+        lambda e: e[:2],
+    ])
+    def test_corrupt_entry(self, save_path, corrupt_entry):
+        """Cached headers that can't be rebuilt are read from the save."""
+        parsed_info = SaveInfo(save_path, load_cache=True)
+        entries = self.headers_cache._entries
+        entries[u'bench.ess'] = corrupt_entry(entries[u'bench.ess'])
+        save_info = SaveInfo(save_path, load_cache=True)
+        assert self.parsed == [save_path] * 2
+        assert _state(save_info.header) == _state(parsed_info.header)
+        # the bad entry was replaced
+        SaveInfo(save_path, load_cache=True)
+        assert self.parsed == [save_path] * 2
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import os
+import shutil
+
+import pytest
+
+from .. import env
+from ..bolt import GPath, Progress
+
+# Files of a package - in nested folders, empty and a few MB big
+_files = {os.path.join(u'meshes', u'bench%02d' % (i % 4), u'mesh%03d.nif' % i):
+          os.urandom(i * 1000) for i in xrange(40)}
+_files[os.path.join(u'textures', u'big.dds')] = os.urandom(3 * 1048576 + 7)
+
+class _RecordingProgress(Progress):
+    def __init__(self):
+        super(_RecordingProgress, self).__init__()
+        self.states = []
+
+    def _do_progress(self, state, message):
+        self.states.append(state)
+
+class TestCopyFiles(object):
+    @pytest.fixture(autouse=True)
+    def _package(self, tmpdir):
+        self.src_dir = GPath(tmpdir.join(u'Package').strpath)
+        self.dest_dir = GPath(tmpdir.join(u'Data').strpath)
+        self.serial_dir = GPath(tmpdir.join(u'Serial').strpath)
+        for rel_path, contents in _files.iteritems():
+            self.src_dir.join(rel_path).head.makedirs()
+            with self.src_dir.join(rel_path).open(u'wb') as out:
+                out.write(contents)
+        self.rel_paths = sorted(_files)
+        self.sources = [self.src_dir.join(p) for p in self.rel_paths]
+        self.dests = [self.dest_dir.join(p) for p in self.rel_paths]
+
+    def _serial(self):
+        """Copy the files one by one - what shellCopy amounts to - and return
+        the contents and modification times of the copies."""
+        for rel_path in self.rel_paths:
+            dest = self.serial_dir.join(rel_path)
+            dest.head.makedirs()
+            shutil.copy2(self.src_dir.join(rel_path).s, dest.s)
+        return self._copied(self.serial_dir)
+
+    def _copied(self, root):
+        copied = {}
+        for rel_path in self.rel_paths:
+            with root.join(rel_path).open(u'rb') as ins:
+                # setting the mtime may lose a few ns
+                copied[rel_path] = (ins.read(),
+                                    round(root.join(rel_path).mtime, 3))
+        return copied
+
+    def test_copy(self):
+        progress = _RecordingProgress()
+        failed, linked = env.copy_files(self.sources, self.dests,
+                                        progress=progress)
+        assert failed == linked == []
+        assert self._copied(self.dest_dir) == self._serial()
+        assert {p: c for p, (c, _m) in self._copied(
+            self.dest_dir).iteritems()} == _files
+        # progress is reported per byte, empty files counting as one
+        assert progress.full == sum(len(c) + 1 for c in _files.itervalues())
+        assert progress.states == sorted(progress.states)
+        assert progress.states[-1] == 1.0
+
+    def test_move(self):
+        serial = self._serial()
+        failed, linked = env.copy_files(self.sources, self.dests, move=True)
+        assert failed == linked == []
+        assert self._copied(self.dest_dir) == serial
+        assert not any(s.exists() for s in self.sources)
+
+    def test_overwrite(self):
+        """Existing files are replaced - if one is a link, the file it links
+        to is left alone."""
+        linked_to = self.dest_dir.head.join(u'Linked.nif')
+        with linked_to.open(u'wb') as out: out.write(b'linked')
+        self.dests[0].head.makedirs()
+        os.symlink(linked_to.s, self.dests[0].s)
+        self.dests[1].head.makedirs()
+        with self.dests[1].open(u'wb') as out: out.write(b'old')
+        assert env.copy_files(self.sources, self.dests) == ([], [])
+        assert self._copied(self.dest_dir) == self._serial()
+        assert not os.path.islink(self.dests[0].s)
+        with linked_to.open(u'rb') as ins: assert ins.read() == b'linked'
+
+    @pytest.mark.parametrize(u'move', [False, True])
+    def test_failed(self, move):
+        """Files that can't be copied are returned, for the caller to retry
+        them via the shell, the rest are copied."""
+        blocked_dir = os.path.join(u'meshes', u'bench01')
+        self.dest_dir.join(u'meshes').makedirs()
+        # a file where a folder should be
+        with self.dest_dir.join(blocked_dir).open(u'wb'): pass
+        missing = self.src_dir.join(u'Missing.esp')
+        sources = self.sources + [missing]
+        dests = self.dests + [self.dest_dir.join(u'Missing.esp')]
+        failed, linked = env.copy_files(sources, dests, move=move)
+        blocked = [p for p in self.rel_paths if p.startswith(blocked_dir)]
+        assert failed == [(self.src_dir.join(p), self.dest_dir.join(p))
+                          for p in blocked] + [(missing, dests[-1])]
+        assert linked == []
+        copied = [p for p in self.rel_paths if p not in blocked]
+        for rel_path in copied:
+            with self.dest_dir.join(rel_path).open(u'rb') as ins:
+                assert ins.read() == _files[rel_path]
+        # moved files are gone, the failed ones are left in place
+        assert all(self.src_dir.join(p).exists() for p in blocked)
+        assert all(self.src_dir.join(p).exists() != move for p in copied)
+
+    def test_no_clone(self, monkeypatch):
+        """If the file can't be cloned it's copied."""
+        cloned = []
+        def _clone_file(src_file, dest_file):
+            cloned.append(dest_file.name)
+            return False
+        monkeypatch.setattr(env, u'clone_file', _clone_file)
+        assert env.copy_files(self.sources, self.dests) == ([], [])
+        assert sorted(cloned) == sorted(d.s for d in self.dests)
+        assert self._copied(self.dest_dir) == self._serial()
+
+    def test_clone(self, monkeypatch):
+        """If the file was cloned it's not copied again."""
+        serial = self._serial()
+        def _clone_file(src_file, dest_file):
+            dest_file.write(src_file.read())
+            return True
+        monkeypatch.setattr(env, u'clone_file', _clone_file)
+        def _copyfileobj(*args):
+            raise AssertionError(u'Cloned file copied')
+        monkeypatch.setattr(env.shutil, u'copyfileobj', _copyfileobj)
+        assert env.copy_files(self.sources, self.dests) == ([], [])
+        assert self._copied(self.dest_dir) == serial
+
+    @pytest.mark.skipif(os.name == u'nt', reason=u'Block cloning is not '
+                                                 u'supported on Windows')
+    def test_clone_file(self, tmpdir):
+        """Reflinking is only supported by some filesystems - where it
+        isn't, nothing is written."""
+        src, dest = tmpdir.join(u'src.bin'), tmpdir.join(u'dest.bin')
+        src.write_binary(_files[self.rel_paths[-1]])
+        with open(src.strpath, u'rb') as ins:
+            with open(dest.strpath, u'wb') as out:
+                cloned = env.clone_file(ins, out)
+        assert dest.read_binary() == (src.read_binary() if cloned else b'')
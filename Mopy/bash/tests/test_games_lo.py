@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+import cPickle as pickle
+import random
+
+import pytest
+
+from .. import load_order
+from .._games_lo import FixInfo, Game, TextfileGame, TimestampGame
+from ..bolt import GPath
+from ..load_order import LoadOrder, lo_entry, _LoHistory
+
+_master = GPath(u'Oblivion.esm')
+
+class _FakeModInfo(object):
+    """Just what TimestampGame needs to calculate and set the load order -
+    counts the times the mod was restamped."""
+    def __init__(self, mtime, is_master=False):
+        self.mtime = mtime
+        self.is_master = is_master
+        self.restamps = 0
+
+    def has_esm_flag(self): return self.is_master
+
+    def setmtime(self, set_time=0.0, crc_changed=False):
+        self.mtime = set_time
+        self.restamps += 1
+
+class _FakeModInfos(dict):
+    masterName = _master
+
+def _timestamp_game(mtimes):
+    """Return a TimestampGame over the game master and a plugin per mtime in
+    mtimes - Plugin0000.esp having the first one and so on."""
+    mod_infos = _FakeModInfos({_master: _FakeModInfo(0.0, is_master=True)})
+    for i, mtime in enumerate(mtimes):
+        mod_infos[GPath(u'Plugin%04d.esp' % i)] = _FakeModInfo(mtime)
+    return TimestampGame(mod_infos, GPath(u'plugins.txt'))
+
+def _persist(game, lord):
+    """Persist lord, then return the load order calculated from the new
+    mtimes and the number of files restamped."""
+    for info in game.mod_infos.itervalues(): info.restamps = 0
+    game._persist_load_order(lord, [])
+    return (game._fetch_load_order(None, None),
+            sum(info.restamps for info in game.mod_infos.itervalues()))
+
+class TestTimestampGamePersist(object):
+    def _game_lo(self, mtimes):
+        game = _timestamp_game(mtimes)
+        return game, game._fetch_load_order(None, None)
+
+    def test_unchanged(self):
+        game, lo = self._game_lo([1000.0 + 60 * i for i in xrange(100)])
+        assert _persist(game, lo) == (lo, 0)
+
+    def test_move_to_top(self):
+        """Moving the last of 1500 plugins right after the master must
+        only restamp that plugin."""
+        game, lo = self._game_lo([1000.0 + 60 * i for i in xrange(1500)])
+        lord = [lo[0], lo[-1]] + lo[1:-1]
+        assert _persist(game, lord) == (lord, 1)
+
+    def test_move_to_bottom(self):
+        game, lo = self._game_lo([1000.0 + 60 * i for i in xrange(1500)])
+        lord = lo[:1] + lo[2:] + [lo[1]]
+        assert _persist(game, lord) == (lord, 1)
+
+    def test_move_block(self):
+        game, lo = self._game_lo([1000.0 + 60 * i for i in xrange(300)])
+        lord = lo[:10] + lo[200:205] + lo[10:200] + lo[205:]
+        assert _persist(game, lord) == (lord, 5)
+
+    def test_swap(self):
+        game, lo = self._game_lo([1000.0 + 60 * i for i in xrange(300)])
+        lord = list(lo)
+        lord[50], lord[250] = lord[250], lord[50]
+        assert _persist(game, lord) == (lord, 2)
+
+    def test_conflicts(self):
+        """Plugins with the same mtime are restamped, bar one."""
+        game, lo = self._game_lo([1000.0, 2000.0, 2000.0, 2000.0, 3000.0])
+        assert _persist(game, lo) == (lo, 2)
+        assert len({game.mod_infos[m].mtime for m in lo}) == len(lo)
+
+    def test_no_gap(self):
+        """Plugins one second apart leave no gap to move a plugin into - the
+        ones after it are respaced, the ones before it are not touched."""
+        game, lo = self._game_lo([1000.0 + i for i in xrange(100)])
+        lord = lo[:50] + [lo[-1]] + lo[50:-1] # the master and 49 plugins
+        assert _persist(game, lord) == (lord, 51)
+        assert all(game.mod_infos[m].restamps == 0 for m in lo[:50])
+
+def _textfile_game(tmpdir, lo, masters=()):
+    """Return a TextfileGame over the plugins in lo - the ones in masters
+    having the master flag set - with lo written to its loadorder.txt."""
+    mod_infos = _FakeModInfos({GPath(m): _FakeModInfo(0.0, is_master=(
+        m == _master or m in masters)) for m in lo})
+    game = TextfileGame(mod_infos, GPath(tmpdir.join(u'plugins.txt').strpath),
+                        GPath(tmpdir.join(u'loadorder.txt').strpath))
+    game._persist_load_order([GPath(m) for m in lo], None)
+    return game
+
+def _fetch(game, active):
+    return [m.s for m in game._fetch_load_order(None, [
+        GPath(m) for m in active])]
+
+class TestTextfileGameDesync(object):
+    """The order of the active plugins in plugins.txt wins over the one in
+    loadorder.txt."""
+    _lo = [_master.s, u'A.esp', u'i1.esp', u'B.esp', u'i2.esp', u'C.esp']
+
+    def test_synced(self, tmpdir):
+        game = _textfile_game(tmpdir, self._lo)
+        assert _fetch(game, [_master.s, u'A.esp', u'C.esp']) == self._lo
+
+    def test_moved_below(self, tmpdir):
+        """Plugins active after one that loads later are moved right below
+        it - the inactive ones stay put."""
+        game = _textfile_game(tmpdir, self._lo)
+        assert _fetch(game, [_master.s, u'B.esp', u'A.esp']) == [
+            _master.s, u'i1.esp', u'B.esp', u'A.esp', u'i2.esp', u'C.esp']
+        assert _fetch(game, [_master.s, u'C.esp', u'B.esp', u'A.esp']) == [
+            _master.s, u'i1.esp', u'i2.esp', u'C.esp', u'B.esp', u'A.esp']
+
+    def test_reversed(self, tmpdir):
+        lo = [_master.s] + [u'Plugin%04d.esp' % i for i in xrange(1000)]
+        game = _textfile_game(tmpdir, lo)
+        assert _fetch(game, [_master.s] + lo[:0:-1]) == [_master.s] + lo[
+            :0:-1]
+
+    def test_not_in_lo(self, tmpdir):
+        game = _textfile_game(tmpdir, self._lo)
+        assert _fetch(game, [_master.s, u'Missing.esp', u'C.esp',
+                             u'A.esp']) == [_master.s, u'i1.esp', u'B.esp',
+                                            u'i2.esp', u'C.esp', u'A.esp']
+
+class TestFixLoadOrder(object):
+    def test_added(self, tmpdir):
+        """New masters go at the end of the masters block, new plugins at the
+        end of the load order."""
+        lo = [_master.s, u'M1.esm', u'M2.esm', u'A.esp', u'B.esp', u'C.esp']
+        game = _textfile_game(tmpdir, lo, masters={u'M1.esm', u'M2.esm'})
+        lord = [GPath(m) for m in lo if m not in (u'M2.esm', u'B.esp')]
+        fix_lo = FixInfo()
+        game._fix_load_order(lord, fix_lo)
+        assert [m.s for m in lord] == [_master.s, u'M1.esm', u'M2.esm',
+                                       u'A.esp', u'C.esp', u'B.esp']
+        assert fix_lo.lo_added == {GPath(u'M2.esm'), GPath(u'B.esp')}
+
+    def test_duplicates(self):
+        plugins = [GPath(m) for m in (u'A.esp', u'B.esp', u'A.esp', u'C.esp',
+                                      u'B.esp', u'A.esp')]
+        assert Game._check_for_duplicates(plugins) == {GPath(u'A.esp'),
+                                                       GPath(u'B.esp')}
+        assert plugins == [GPath(u'A.esp'), GPath(u'B.esp'), GPath(u'C.esp')]
+
+# Load order history ----------------------------------------------------------
+def _random_lord(rng, lord, mods):
+    """Return lord with a random change - mods moved, (de)activated, added
+    or removed - or unchanged."""
+    lo, active = list(lord.loadOrder), set(lord.active)
+    change = rng.randrange(7)
+    if change == 0 and len(lo) > 1: # move a mod
+        lo.insert(rng.randrange(len(lo)), lo.pop(rng.randrange(len(lo))))
+    elif change == 1 and len(lo) > 4: # move a block of mods
+        start = rng.randrange(len(lo) - 3)
+        block = lo[start:start + rng.randint(2, 3)]
+        del lo[start:start + len(block)]
+        insert_at = rng.randrange(len(lo) + 1)
+        lo[insert_at:insert_at] = block
+    elif change == 2 and lo: # (de)activate some mods
+        active.symmetric_difference_update(rng.sample(lo, min(len(lo), 3)))
+    elif change == 3: # add a mod, maybe active
+        new = [m for m in mods if m not in lo]
+        if new:
+            mod = rng.choice(new)
+            lo.insert(rng.randrange(len(lo) + 1), mod)
+            if rng.randrange(2): active.add(mod)
+    elif change == 4 and lo: # remove a mod
+        mod = lo.pop(rng.randrange(len(lo)))
+        active.discard(mod)
+    elif change == 5: # shuffle the load order
+        rng.shuffle(lo)
+    return LoadOrder(lo, active)
+
+def _lord_tuple(entry):
+    return entry.date, entry.lord.loadOrder, entry.lord.activeOrdered
+
+class TestLoHistory(object):
+    """Random set load order, undo, redo and persist operations give the
+    same history as the list of lo_entry tuples it replaced."""
+    _mods = [GPath(u'Plugin%02d.esp' % i) for i in xrange(20)]
+
+    def _check(self, history, saved, index):
+        assert len(history) == len(saved)
+        assert _lord_tuple(history[index]) == _lord_tuple(saved[index])
+
+    @pytest.mark.parametrize(u'seed', range(8))
+    @pytest.mark.parametrize(u'keep_max', [4, 9, 256])
+    def test_random_operations(self, monkeypatch, seed, keep_max):
+        rng = random.Random(seed)
+        history, saved, current = _LoHistory(), [], -1
+        lord, date = LoadOrder(self._mods[:8], self._mods[:3]), 0
+        for _step in xrange(400):
+            date += 1
+            operation = rng.randrange(10)
+            if operation < 4 or current < 0: # set the load order
+                lord = _random_lord(rng, lord, self._mods)
+                current += 1
+                history.insert(current, lo_entry(date, lord))
+                saved.insert(current, lo_entry(date, lord))
+            elif operation < 8: # undo or redo
+                index_move = (-1, 1)[operation % 2]
+                if not 0 <= current + index_move < len(saved): continue
+                current += index_move
+                self._check(history, saved, current)
+                lord = history[current].lord
+                if rng.randrange(4): continue
+                # partially undone or redone - as in _update_cache
+                lord = _random_lord(rng, lord, self._mods)
+                current = max(0, current + index_move)
+                history.insert(current, lo_entry(date, lord))
+                saved.insert(current, lo_entry(date, lord))
+            elif operation == 8: # persist and load, trimmed to keep_max
+                start, stop = 0, len(saved)
+                if len(saved) > keep_max:
+                    monkeypatch.setattr(load_order, u'_current_list_index',
+                                        current)
+                    x, y = load_order._keep_max(keep_max, len(saved))
+                    start, stop, current = current - x, current + y, x
+                history = _LoHistory.from_dump(pickle.loads(pickle.dumps(
+                    history.dump(start, stop), pickle.HIGHEST_PROTOCOL)))
+                saved = saved[start:stop]
+                assert len(saved) <= keep_max
+            else: # read a random load order
+                self._check(history, saved, rng.randrange(len(saved)))
+            self._check(history, saved, current)
+        assert [_lord_tuple(e) for e in history] == [
+            _lord_tuple(e) for e in saved]
+
+    def test_from_entries(self):
+        rng = random.Random(0)
+        saved, lord = [], LoadOrder(self._mods[:8], self._mods[:3])
+        for date in xrange(50):
+            lord = _random_lord(rng, lord, self._mods)
+            saved.append(lo_entry(date, lord))
+        history = _LoHistory.from_entries(saved)
+        assert [_lord_tuple(e) for e in history] == [
+            _lord_tuple(e) for e in saved]
+        # and backwards, walking the diffs from the last one
+        assert [_lord_tuple(history[i]) for i in xrange(49, -1, -1)] == [
+            _lord_tuple(e) for e in reversed(saved)]
+
+    def test_empty(self):
+        history = _LoHistory.from_dump(_LoHistory().dump())
+        assert len(history) == 0
+        with pytest.raises(IndexError):
+            history[0]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+
+"""This script times copying the files of a synthetic package to a Data
+folder the way BAIN installs them - serially via shutil.copy2, which is what
+the shell copies amount to, and over the worker pool of env.copy_files,
+copying, moving out of a temp dir and linking. The package and the Data
+folder are created in a temporary directory (see --dir) - note that the
+timings depend on its filesystem and on the OS caches being warm."""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import gettext
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+import utils
+
+LOGGER = logging.getLogger(__name__)
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+MOPY_PATH = os.path.abspath(os.path.join(SCRIPTS_PATH, u'..', u'Mopy'))
+sys.path.append(MOPY_PATH)
+
+gettext.NullTranslations().install(unicode=True)
+from bash import bolt, env
+
+SIZES = (100, 400, 1600)
+FILE_SIZE_KB = 256
+
+def _mk_package(package_dir, count, file_size):
+    """Write count files of file_size random bytes to package_dir, spread
+    over a few folders like the assets of a mod, and return their paths
+    relative to package_dir."""
+    rel_paths = []
+    for i in xrange(count):
+        rel_path = os.path.join(u'meshes', u'bench%02d' % (i % 16),
+                                u'mesh%05d.nif' % i)
+        src = os.path.join(package_dir, rel_path)
+        if not os.path.isdir(os.path.dirname(src)):
+            os.makedirs(os.path.dirname(src))
+        with open(src, u'wb') as out:
+            out.write(os.urandom(file_size))
+        rel_paths.append(rel_path)
+    return rel_paths
+
+def _timed(func, repeat, setup=None):
+    """Return the best of repeat runs of func, in milliseconds - setup, if
+    given, is called untimed before each run."""
+    best = None
+    for _i in xrange(repeat):
+        if setup is not None: setup()
+        start = default_timer()
+        func()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def _bench_copy(count, file_size, repeat, work_dir):
+    """Time installing count files of file_size bytes each and return the
+    timings, in milliseconds, keyed by operation."""
+    bench_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        package_dir = os.path.join(bench_dir, u'Package')
+        temp_dir = os.path.join(bench_dir, u'Temp')
+        data_dir = os.path.join(bench_dir, u'Data')
+        rel_paths = _mk_package(package_dir, count, file_size)
+        sources = [bolt.GPath(os.path.join(package_dir, p)) for p in
+                   rel_paths]
+        unpacked = [bolt.GPath(os.path.join(temp_dir, p)) for p in rel_paths]
+        dests = [bolt.GPath(os.path.join(data_dir, p)) for p in rel_paths]
+        def clean_data():
+            shutil.rmtree(data_dir, ignore_errors=True)
+        def copy2():
+            for src, dest in zip(sources, dests):
+                if not os.path.isdir(dest.head.s): os.makedirs(dest.head.s)
+                shutil.copy2(src.s, dest.s)
+        def copy_files(move=False, link=False):
+            srcs = unpacked if move else sources
+            failed, _linked = env.copy_files(srcs, dests, move=move,
+                                             link=link)
+            if failed:
+                raise RuntimeError(u'Failed to copy some files, see the log')
+        def unpack():
+            clean_data()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            shutil.copytree(package_dir, temp_dir)
+        timings = {
+            u'copy2': _timed(copy2, repeat, setup=clean_data),
+            u'copy_files': _timed(copy_files, repeat, setup=clean_data),
+            u'move': _timed(lambda: copy_files(move=True), repeat,
+                            setup=unpack),
+            u'link': _timed(lambda: copy_files(link=True), repeat,
+                            setup=clean_data),
+        }
+        return timings
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+_OPERATIONS = (u'copy2', u'copy_files', u'move', u'link')
+
+def main(verbosity=logging.INFO, sizes=SIZES, file_size_kb=FILE_SIZE_KB,
+         repeat=5, work_dir=None):
+    utils.setup_log(LOGGER, verbosity=verbosity)
+    LOGGER.info(u'{:>7}{:>10}'.format(u'files', u'MB') + u''.join(
+        u'{:>12}'.format(op) for op in _OPERATIONS) + u'  (ms, best of {}, '
+        u'{} workers)'.format(repeat, bolt.worker_count()))
+    for size in sizes:
+        timings = _bench_copy(size, file_size_kb * 1024, repeat, work_dir)
+        LOGGER.info(u'{:>7}{:>10.1f}'.format(size, size * file_size_kb /
+                                              1024) +
+                    u''.join(u'{:>12.2f}'.format(timings[op])
+                             for op in _OPERATIONS))
+
+if __name__ == u'__main__':
+    argparser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    utils.setup_common_parser(argparser)
+    argparser.add_argument(
+        u'-s',
+        u'--sizes',
+        type=int,
+        nargs=u'+',
+        default=SIZES,
+        help=u'The numbers of files to install '
+             u'[default: {}].'.format(u' '.join(map(str, SIZES))),
+    )
+    argparser.add_argument(
+        u'-k',
+        u'--file-size',
+        type=int,
+        default=FILE_SIZE_KB,
+        help=u'The size of each file, in KB [default: {}].'.format(
+            FILE_SIZE_KB),
+    )
+    argparser.add_argument(
+        u'-r',
+        u'--repeat',
+        type=int,
+        default=5,
+        help=u'How many times to run each operation, keeping the fastest '
+             u'[default: 5].',
+    )
+    argparser.add_argument(
+        u'-d',
+        u'--dir',
+        default=None,
+        help=u'The directory to create the package and Data folder in - '
+             u'ideally on the drive the game is installed to [default: the '
+             u'system temp directory].',
+    )
+    parsed_args = argparser.parse_args()
+    main(parsed_args.verbosity, parsed_args.sizes, parsed_args.file_size,
+         parsed_args.repeat, parsed_args.dir)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+
+"""This script times how BAIN decides which files of a synthetic Oblivion
+package of increasing size get installed - matching the paths against the
+compiled skips regex, a full refreshDataSizeCrc and a memoized one. The
+package only exists in memory. Distant LOD, LOD meshes and LOD textures
+(but not normals) are skipped, and one of the package's plugins is
+deselected so its voices get skipped too - half of the files in all."""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import gettext
+import logging
+import os
+import sys
+from timeit import default_timer
+
+import utils
+
+LOGGER = logging.getLogger(__name__)
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+MOPY_PATH = os.path.abspath(os.path.join(SCRIPTS_PATH, u'..', u'Mopy'))
+sys.path.append(MOPY_PATH)
+
+# the game modules translate strings on import
+gettext.NullTranslations().install(unicode=True)
+from bash import bass, bolt, bush
+# bosh needs the game on import
+bush._supportedGames()
+bush.foundGames[u'Oblivion'] = bolt.GPath(u'Oblivion')
+bush.detect_and_set_game(gname=u'Oblivion')
+from bash.bosh import bain
+
+SIZES = (10000, 50000, 200000)
+
+_SETTINGS = {
+    u'bash.installers.allowOBSEPlugins': True,
+    u'bash.installers.autoRefreshBethsoft': False,
+    u'bash.installers.badDlls': {},
+    u'bash.installers.goodDlls': {},
+    u'bash.installers.redirect_scripts': True,
+    u'bash.installers.renameStrings': True,
+    u'bash.installers.skipDistantLOD': True,
+    u'bash.installers.skipDocs': False,
+    u'bash.installers.skipImages': False,
+    u'bash.installers.skipLandscapeLODMeshes': True,
+    u'bash.installers.skipLandscapeLODNormals': False,
+    u'bash.installers.skipLandscapeLODTextures': True,
+    u'bash.installers.skipScreenshots': True,
+    u'bash.installers.skipScriptSources': False,
+    u'bash.installers.skipTESVBsl': False,
+}
+
+def _setup_bain():
+    """Set BAIN's settings and global skips."""
+    bass.settings = _SETTINGS
+    bass.dirs[u'mods'] = bolt.GPath(u'Oblivion').join(u'Data')
+    # what Installer.init_bain_dirs does for packages
+    bain.Installer.dataDirsPlus |= bush.game.Bain.data_dirs
+    bain.Installer.init_global_skips()
+    bain.Installer.init_attributes_process()
+
+# (folder, file name) formats of the files in the package
+_file_kinds = [(os.path.join(*parts[:-1]), parts[-1]) for parts in (
+    (u'meshes', u'armor', u'bench{:02d}', u'mesh{:06d}.nif'),
+    (u'textures', u'armor', u'bench{:02d}', u'texture{:06d}.dds'),
+    (u'textures', u'landscapelod', u'generated', u'lod{:06d}.dds'),
+    (u'textures', u'landscapelod', u'generated', u'lod{:06d}_fn.dds'),
+    (u'sound', u'voice', u'Bench.esp', u'imperial', u'line{:06d}.mp3'),
+    (u'sound', u'voice', u'Skipped.esp', u'imperial', u'line{:06d}.mp3'),
+    (u'distantlod', u'bench{:06d}.lod'),
+    (u'meshes', u'landscape', u'lod', u'bench{:06d}.nif'),
+)]
+
+def _mk_installer(size):
+    """Return a simple package with size files - meshes and textures,
+    voices and LOD files, some of them skipped - two of them plugins, one
+    of which is deselected."""
+    files = [(u'Bench.esp', 1024, 0), (u'Skipped.esp', 1024, 1)]
+    for i in xrange(size - 2):
+        folder, file_name = _file_kinds[i % len(_file_kinds)]
+        files.append((os.path.join(folder.format(i % 64),
+                                   file_name.format(i)), 4096, i))
+    installer = bain.InstallerArchive(bolt.GPath(u'Bench.7z'))
+    installer.fileSizeCrcs = bain._FileSizeCrcs(files)
+    installer.type = 1
+    installer.espmNots = {bolt.GPath(u'Skipped.esp')}
+    return installer
+
+def _timed(func, repeat, setup=None):
+    """Return the best of repeat runs of func, in milliseconds - setup, if
+    given, is called untimed before each run."""
+    best = None
+    for _i in xrange(repeat):
+        if setup is not None: setup()
+        start = default_timer()
+        func()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def _bench_installer(size, repeat):
+    """Time deciding which of the files of a package of size files get
+    installed and return the timings, in milliseconds, keyed by operation,
+    and the number of files installed."""
+    installer = _mk_installer(size)
+    lower_paths = [full.lower() for full, _size, _crc in
+                   installer.fileSizeCrcs]
+    def skips():
+        skip_match, _skip_ext = installer._init_skips()
+        return [f for f in lower_paths if not skip_match(f)]
+    def invalidate():
+        bain.Installer._skips_generation += 1
+    timings = {
+        u'skips': _timed(skips, repeat),
+        u'refresh': _timed(installer.refreshDataSizeCrc, repeat,
+                           setup=invalidate),
+        u'memoized': _timed(installer.refreshDataSizeCrc, repeat),
+    }
+    return timings, len(installer.ci_dest_sizeCrc)
+
+_OPERATIONS = (u'skips', u'refresh', u'memoized')
+
+def main(verbosity=logging.INFO, sizes=SIZES, repeat=5):
+    utils.setup_log(LOGGER, verbosity=verbosity)
+    _setup_bain()
+    LOGGER.info(u'{:>9}{:>11}'.format(u'files', u'installed') + u''.join(
+        u'{:>12}'.format(op) for op in _OPERATIONS) + u'  (ms, best of '
+        u'{})'.format(repeat))
+    for size in sizes:
+        timings, installed = _bench_installer(size, repeat)
+        LOGGER.info(u'{:>9}{:>11}'.format(size, installed) + u''.join(
+            u'{:>12.2f}'.format(timings[op]) for op in _OPERATIONS))
+
+if __name__ == u'__main__':
+    argparser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    utils.setup_common_parser(argparser)
+    argparser.add_argument(
+        u'-s',
+        u'--sizes',
+        type=int,
+        nargs=u'+',
+        default=SIZES,
+        help=u'The numbers of files in the package '
+             u'[default: {}].'.format(u' '.join(map(str, SIZES))),
+    )
+    argparser.add_argument(
+        u'-r',
+        u'--repeat',
+        type=int,
+        default=5,
+        help=u'How many times to run each operation, keeping the fastest '
+             u'[default: 5].',
+    )
+    parsed_args = argparser.parse_args()
+    main(parsed_args.verbosity, parsed_args.sizes, parsed_args.repeat)
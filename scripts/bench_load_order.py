@@ -0,0 +1,217 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+
+"""This script times the load order handling of the timestamp, textfile and
+asterisk games against synthetic plugin lists of increasing size. Plugins
+only exist in memory, plugins.txt and loadorder.txt are written to a
+temporary directory."""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import gettext
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+import utils
+
+LOGGER = logging.getLogger(__name__)
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+MOPY_PATH = os.path.abspath(os.path.join(SCRIPTS_PATH, u'..', u'Mopy'))
+sys.path.append(MOPY_PATH)
+
+# the game modules translate strings on import
+gettext.NullTranslations().install(unicode=True)
+from bash import bolt, load_order
+from bash._games_lo import AsteriskGame, FixInfo, TextfileGame, TimestampGame
+
+SIZES = (250, 1000, 2500, 5000)
+
+class _BenchModInfo(object):
+    """Just what the games need of a ModInfo."""
+    __slots__ = (u'mtime', u'_ext', u'_is_master')
+
+    def __init__(self, name, mtime, is_master):
+        self.mtime = mtime
+        self._ext = name.cext
+        self._is_master = is_master
+
+    def has_esm_flag(self): return self._is_master
+    def get_extension(self): return self._ext
+    def is_esl(self): return self._ext == u'.esl'
+
+    def setmtime(self, set_time=0.0, crc_changed=False):
+        self.mtime = set_time
+
+class _BenchModInfos(dict):
+    def __init__(self, master_name):
+        super(_BenchModInfos, self).__init__()
+        self.masterName = master_name
+
+def _mk_mod_infos(master_name, size, with_esls):
+    """Return mod infos for the game master and size plugins - a tenth of
+    them masters and, if with_esls, a third of the rest light plugins - and
+    their load order, the masters' block first."""
+    mod_infos = _BenchModInfos(master_name)
+    mod_infos[master_name] = _BenchModInfo(master_name, 0.0, True)
+    lord = [master_name]
+    for i in xrange(size):
+        if i < size // 10:
+            name, is_master = u'Master%04d.esm' % i, True
+        else:
+            is_master = False
+            name = (u'Light%04d.esl' if with_esls and i % 3 == 0 else
+                    u'Plugin%04d.esp') % i
+        name = bolt.GPath(name)
+        mod_infos[name] = _BenchModInfo(name, 1000.0 + 60 * i, is_master)
+        lord.append(name)
+    return mod_infos, lord
+
+def _mk_game(game_type, size, game_dir):
+    """Return a game of game_type over size plugins, their load order having
+    been persisted, the load order and the active plugins - the masters,
+    the first 200 regular plugins and all the light ones."""
+    game_dir = bolt.GPath(game_dir)
+    plugins_txt = game_dir.join(u'plugins.txt')
+    if game_type is TimestampGame:
+        mod_infos, lord = _mk_mod_infos(bolt.GPath(u'Oblivion.esm'), size,
+                                        with_esls=False)
+        game = TimestampGame(mod_infos, plugins_txt)
+    elif game_type is TextfileGame:
+        mod_infos, lord = _mk_mod_infos(bolt.GPath(u'Skyrim.esm'), size,
+                                        with_esls=False)
+        game = TextfileGame(mod_infos, plugins_txt,
+                            game_dir.join(u'loadorder.txt'))
+    else:
+        mod_infos, lord = _mk_mod_infos(bolt.GPath(u'Fallout4.esm'), size,
+                                        with_esls=True)
+        game = AsteriskGame(mod_infos, plugins_txt)
+    active, regular = [], 0
+    for mod in lord:
+        minf = mod_infos[mod]
+        if game.in_master_block(minf) or minf.is_esl():
+            active.append(mod)
+        elif regular < 200:
+            active.append(mod)
+            regular += 1
+    game.set_load_order(lord, active)
+    return game, lord, active
+
+def _timed(func, repeat, setup=None):
+    """Return the best of repeat runs of func, in milliseconds - setup, if
+    given, is called untimed before each run."""
+    best = None
+    for _i in xrange(repeat):
+        if setup is not None: setup()
+        start = default_timer()
+        func()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def _bench_game(game_type, size, repeat):
+    """Time the load order operations of game_type over size plugins and
+    return the timings, in milliseconds, keyed by operation."""
+    game_dir = tempfile.mkdtemp()
+    try:
+        game, lord, active = _mk_game(game_type, size, game_dir)
+        timings = {}
+        # read and validate plugins.txt/loadorder.txt or the mtimes
+        timings[u'fetch'] = _timed(
+            lambda: game.get_load_order(None, None, FixInfo()), repeat)
+        # a tenth of the plugins, masters among them, were just installed
+        missing = set(lord[1::10])
+        def fix_added():
+            game._fix_load_order([x for x in lord if x not in missing],
+                                 FixInfo())
+        timings[u'fix added'] = _timed(fix_added, repeat)
+        # move the last plugin after the masters and back
+        first_esp = game._index_of_first_esp(lord)
+        moved = lord[:first_esp] + lord[-1:] + lord[first_esp:-1]
+        def reorder():
+            game.set_load_order(list(moved), None, lord, active)
+            game.set_load_order(list(lord), None, moved, active)
+        timings[u'reorder'] = _timed(reorder, repeat) / 2
+        # rebuild the load order cache and sort all plugins into load order
+        unordered = lord[::-1] + [bolt.GPath(u'Ghost%04d.esp' % i) for i in
+                                  xrange(size // 100)]
+        def cache():
+            load_order.cached_lord = load_order.LoadOrder(lord, active)
+            load_order.get_ordered(unordered)
+        timings[u'cache'] = _timed(cache, repeat)
+        if game_type is TextfileGame:
+            # plugins.txt lists the active plugins in reverse load order
+            desynced = active[:0:-1]
+            game._write_plugins_txt(desynced, desynced)
+            timings[u'desync'] = _timed(
+                lambda: game.get_load_order(None, None, FixInfo()), repeat,
+                setup=lambda: game._persist_load_order(lord, lord))
+        return timings
+    finally:
+        shutil.rmtree(game_dir, ignore_errors=True)
+
+_OPERATIONS = (u'fetch', u'fix added', u'reorder', u'cache', u'desync')
+
+def main(verbosity=logging.INFO, sizes=SIZES, repeat=5):
+    utils.setup_log(LOGGER, verbosity=verbosity)
+    LOGGER.info(u'{:<14}{:>7}'.format(u'game', u'mods') + u''.join(
+        u'{:>12}'.format(op) for op in _OPERATIONS) + u'  (ms, best of '
+        u'{})'.format(repeat))
+    for game_type in (TimestampGame, TextfileGame, AsteriskGame):
+        for size in sizes:
+            timings = _bench_game(game_type, size, repeat)
+            LOGGER.info(u'{:<14}{:>7}'.format(game_type.__name__, size) +
+                        u''.join(u'{:>12.2f}'.format(timings[op])
+                                 if op in timings else u'{:>12}'.format(u'-')
+                                 for op in _OPERATIONS))
+
+if __name__ == u'__main__':
+    argparser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    utils.setup_common_parser(argparser)
+    argparser.add_argument(
+        u'-s',
+        u'--sizes',
+        type=int,
+        nargs=u'+',
+        default=SIZES,
+        help=u'The numbers of plugins to time the games against '
+             u'[default: {}].'.format(u' '.join(map(str, SIZES))),
+    )
+    argparser.add_argument(
+        u'-r',
+        u'--repeat',
+        type=int,
+        default=5,
+        help=u'How many times to run each operation, keeping the fastest '
+             u'[default: 5].',
+    )
+    parsed_args = argparser.parse_args()
+    main(parsed_args.verbosity, parsed_args.sizes, parsed_args.repeat)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+
+"""This script times reading the header of synthetic zlib and LZ4
+compressed Skyrim SE saves of increasing size and rewriting their masters,
+as renaming or remapping masters does. The saves are written to a temporary
+directory - their bodies are a quarter random data, so they compress about
+as well as real saves."""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import gettext
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+from timeit import default_timer
+
+import lz4.block
+
+import utils
+
+LOGGER = logging.getLogger(__name__)
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+MOPY_PATH = os.path.abspath(os.path.join(SCRIPTS_PATH, u'..', u'Mopy'))
+sys.path.append(MOPY_PATH)
+
+# the game modules translate strings on import
+gettext.NullTranslations().install(unicode=True)
+from bash import bolt, bush
+from bash.bolt import pack_byte, pack_float, pack_int, pack_short
+# bosh needs the game on import
+bush._supportedGames()
+bush.foundGames[u'Skyrim Special Edition'] = bolt.GPath(u'Skyrim')
+bush.detect_and_set_game(gname=u'Skyrim Special Edition')
+from bash.bosh.save_headers import SkyrimSaveHeader
+
+SIZES = (16, 64, 256)
+_COMPRESS_TYPES = ((1, u'zlib'), (2, u'lz4'))
+_MASTERS = [u'Skyrim.esm', u'Update.esm', u'Dawnguard.esm'] + [
+    u'Plugin%03d.esp' % i for i in xrange(200)]
+_ESL_MASTERS = [u'Light%03d.esl' % i for i in xrange(100)]
+
+def _pack_str16(out, val):
+    val = val.encode(u'ascii')
+    pack_short(out, len(val))
+    out.write(val)
+
+def _mk_body(body_size):
+    """Return the decompressed body of a save - the form version, the
+    masters and the file location table, padded to body_size bytes."""
+    body = io.BytesIO()
+    pack_byte(body, 78) # form version - 78 has the ESL masters block
+    masters_size = 3 + sum(len(m) + 2 for m in _MASTERS + _ESL_MASTERS)
+    pack_int(body, masters_size)
+    pack_byte(body, len(_MASTERS))
+    for master in _MASTERS: _pack_str16(body, master)
+    pack_short(body, len(_ESL_MASTERS))
+    for master in _ESL_MASTERS: _pack_str16(body, master)
+    table_pos = body.tell() + 24
+    for i in xrange(6): # the offsets in the file location table
+        pack_int(body, table_pos + i * 1024)
+    # a quarter of each MB random, the rest repeating
+    chunk = os.urandom(0x40000) + b'SAVEDATA' * 0x18000
+    while body.tell() < body_size:
+        body.write(chunk[:body_size - body.tell()])
+    return body.getvalue()
+
+def _write_save(save_path, body_size, compress_type):
+    """Write a Skyrim SE save whose body is compressed with compress_type
+    (1 for zlib, 2 for lz4) and decompresses to body_size bytes."""
+    header = io.BytesIO()
+    pack_int(header, 12) # version
+    pack_int(header, 1) # saveNumber
+    _pack_str16(header, u'Bench')
+    pack_int(header, 10) # pcLevel
+    _pack_str16(header, u'Whiterun')
+    _pack_str16(header, u'1.02.03')
+    _pack_str16(header, u'NordRace')
+    pack_short(header, 0) # pcSex
+    pack_float(header, 0.0) # pcExp
+    pack_float(header, 100.0) # pcLvlExp
+    header.write(b'\x00' * 8) # filetime
+    pack_int(header, 320) # ssWidth
+    pack_int(header, 192) # ssHeight
+    pack_short(header, compress_type)
+    body = _mk_body(body_size)
+    if compress_type == 1:
+        compressed = zlib.compress(body, 1)
+    else:
+        compressed = lz4.block.compress(body, store_size=False)
+    with open(save_path, u'wb') as out:
+        out.write(SkyrimSaveHeader.save_magic)
+        pack_int(out, header.tell())
+        out.write(header.getvalue())
+        out.write(b'\x7f' * 320 * 192 * 4) # the screenshot
+        pack_int(out, len(body))
+        pack_int(out, len(compressed))
+        out.write(compressed)
+
+def _timed(func, repeat, setup=None):
+    """Return the best of repeat runs of func, in milliseconds - setup, if
+    given, is called untimed before each run."""
+    best = None
+    for _i in xrange(repeat):
+        if setup is not None: setup()
+        start = default_timer()
+        func()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def _bench_save(size_mb, compress_type, repeat):
+    """Time reading the header of and rewriting the masters of a save whose
+    body is size_mb MB, compressed with compress_type, and return the
+    timings, in milliseconds, keyed by operation."""
+    save_dir = tempfile.mkdtemp()
+    try:
+        save_path = bolt.GPath(save_dir).join(u'Bench.ess')
+        out_path = bolt.GPath(save_dir).join(u'Renamed.ess')
+        _write_save(save_path.s, size_mb * 0x100000, compress_type)
+        timings = {u'header': _timed(lambda: SkyrimSaveHeader(save_path),
+                                     repeat)}
+        header = SkyrimSaveHeader(save_path)
+        renamed = [bolt.GPath(u'Renamed%03d.esp' % i) if m.cext == u'.esp'
+                   else m for i, m in enumerate(header.masters)]
+        def write_masters():
+            header.masters = list(renamed)
+            with save_path.open(u'rb') as ins:
+                with out_path.open(u'wb') as out:
+                    header.writeMasters(ins, out)
+        timings[u'writeMasters'] = _timed(write_masters, repeat)
+        if SkyrimSaveHeader(out_path).masters != renamed:
+            raise RuntimeError(u'The masters were not rewritten correctly')
+        return timings
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+_OPERATIONS = (u'header', u'writeMasters')
+
+def main(verbosity=logging.INFO, sizes=SIZES, repeat=3):
+    utils.setup_log(LOGGER, verbosity=verbosity)
+    LOGGER.info(u'{:<7}{:>7}'.format(u'comp', u'MB') + u''.join(
+        u'{:>14}'.format(op) for op in _OPERATIONS) + u'  (ms, best of '
+        u'{})'.format(repeat))
+    for compress_type, compress_name in _COMPRESS_TYPES:
+        for size in sizes:
+            timings = _bench_save(size, compress_type, repeat)
+            LOGGER.info(u'{:<7}{:>7}'.format(compress_name, size) + u''.join(
+                u'{:>14.2f}'.format(timings[op]) for op in _OPERATIONS))
+
+if __name__ == u'__main__':
+    argparser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    utils.setup_common_parser(argparser)
+    argparser.add_argument(
+        u'-s',
+        u'--sizes',
+        type=int,
+        nargs=u'+',
+        default=SIZES,
+        help=u'The decompressed sizes of the save bodies, in MB '
+             u'[default: {}].'.format(u' '.join(map(str, SIZES))),
+    )
+    argparser.add_argument(
+        u'-r',
+        u'--repeat',
+        type=int,
+        default=3,
+        help=u'How many times to run each operation, keeping the fastest '
+             u'[default: 3].',
+    )
+    parsed_args = argparser.parse_args()
+    main(parsed_args.verbosity, parsed_args.sizes, parsed_args.repeat)